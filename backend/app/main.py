@@ -5,7 +5,7 @@ from dotenv import load_dotenv
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 import google.cloud.logging
 
 root_dir = Path(__file__).parent.parent.parent
@@ -30,8 +30,10 @@ from app.routers import (
     auth_router, recommendation_router, simulate_router, run_cycle_router, public_router, user_management_router, config_router, alerts_router, chatbot_router
 )
 
+from app.utils.serialization import FastJSONResponse
+
 # ----- Initialize FastAPI -----
-app = FastAPI(title="XementAI Backend")
+app = FastAPI(title="XementAI Backend", default_response_class=FastJSONResponse)
 
 # ----- Logging Setup -----
 logging.basicConfig(
@@ -57,6 +59,14 @@ app.add_middleware(
     expose_headers=["*"],
 )
 
+# ----- Compression, metrics and tracing -----
+from app.middleware.compression import CompressionMiddleware
+from app.middleware.metrics import MetricsMiddleware
+from app.middleware.tracing import TracingMiddleware
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(TracingMiddleware)
+app.add_middleware(MetricsMiddleware)
+
 # ----- Global Error Handler -----
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
@@ -105,6 +115,20 @@ async def startup_event():
     logger.info(f"Port: {os.getenv('PORT', '8000')}")
     logger.info("=" * 50)
 
+    from app.services import recipient_directory, alert_index, session_tokens, local_replica, warmup
+    from app.utils.security import start_pool
+    start_pool()
+    recipient_directory.start()
+    local_replica.start()
+    alert_index.start()
+    session_tokens.start()
+    warmup.start()
+
+@app.on_event("shutdown")
+def shutdown_event():
+    from app.utils.security import shutdown_pool
+    shutdown_pool()
+
 @app.get("/")
 def root():
     logger.info("Health check endpoint called")
@@ -118,3 +142,30 @@ def root():
 def health_check():
     """Health check endpoint for Cloud Run"""
     return {"status": "healthy", "service": "xement-ai-backend"}
+
+@app.get("/ready")
+def readiness_check():
+    """Readiness for Cloud Run startup probes: 503 until warm-up finishes or hits its deadline"""
+    from app.services import warmup
+    status = warmup.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    """Request, outbound call and cache metrics in Prometheus text format"""
+    from app.utils import metrics
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/health/dependencies")
+def dependency_health():
+    """Circuit state, in-flight calls and latency of outbound AI dependencies"""
+    from app.utils.resilience import dependency_stats
+    from app.utils import providers
+    from app.services.bigquery_service import cache_stats
+    from app.services import local_replica
+    return {
+        "dependencies": dependency_stats(),
+        "providers_loaded_ms": providers.loaded(),
+        "bigquery_cache": cache_stats(),
+        "local_replica": local_replica.status(),
+    }
@@ -1,14 +1,30 @@
+import os
+import hmac
 from fastapi import Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from app.services.firestore_service import fs_client, verify_token
+from app.services import session_tokens
 
-async def require_auth(request: Request):
-    """Verify token and return user data from Firestore"""
+# Shared secret Cloud Scheduler sends in X-Scheduler-Secret on maintenance jobs
+SCHEDULER_SECRET = os.getenv("SCHEDULER_SECRET", "")
+
+def _bearer_token(request: Request) -> str:
     header = request.headers.get("Authorization")
     if not header or not header.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Missing auth token")
-    token = header.split(" ", 1)[1]
+    return header.split(" ", 1)[1]
+
+async def _verify(token: str):
+    """Signed tokens are verified locally; opaque tokens issued before the migration still hit auth_tokens."""
+    if session_tokens.is_signed_token(token):
+        return session_tokens.verify_signed_token(token)
+    return await run_in_threadpool(verify_token, token)
+
+async def require_auth(request: Request):
+    """Verify token and return its user data"""
+    token = _bearer_token(request)
     try:
-        token_data = verify_token(token)
+        token_data = await _verify(token)
         if not token_data:
             raise HTTPException(status_code=401, detail="Invalid or expired token")
         return token_data
@@ -19,27 +35,36 @@ async def require_auth(request: Request):
 
 async def require_admin(request: Request):
     """Middleware to require admin role"""
-    header = request.headers.get("Authorization")
-    if not header or not header.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Missing auth token")
-    token = header.split(" ", 1)[1]
+    token = _bearer_token(request)
     try:
-        token_data = verify_token(token)
+        token_data = await _verify(token)
         if not token_data:
             raise HTTPException(status_code=401, detail="Invalid or expired token")
-        
-        user_id = token_data.get("user_id")
-        
-        user_doc = fs_client.collection("users").document(user_id).get()
-        if not user_doc.exists:
-            raise HTTPException(status_code=403, detail="User not found")
-        
-        user_data = user_doc.to_dict()
-        if user_data.get("role") != "admin":
+
+        if token_data.get("jti"):
+            # Signed role is authoritative: role changes revoke the user's tokens
+            role = token_data.get("role")
+        else:
+            user_id = token_data.get("user_id")
+            user_doc = await run_in_threadpool(fs_client.collection("users").document(user_id).get)
+            if not user_doc.exists:
+                raise HTTPException(status_code=403, detail="User not found")
+            role = user_doc.to_dict().get("role")
+
+        if role != "admin":
             raise HTTPException(status_code=403, detail="Admin access required")
-        
+
         return token_data
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=401, detail=f"Invalid token: {e}")
+
+async def require_scheduler_or_admin(request: Request):
+    """Allow Cloud Scheduler jobs carrying SCHEDULER_SECRET; anyone else must be an admin"""
+    provided = request.headers.get("X-Scheduler-Secret")
+    if SCHEDULER_SECRET and provided:
+        if hmac.compare_digest(provided.encode("utf-8"), SCHEDULER_SECRET.encode("utf-8")):
+            return {"scheduler": True}
+        raise HTTPException(status_code=403, detail="Invalid scheduler secret")
+    return await require_admin(request)
@@ -0,0 +1,125 @@
+import os
+import gzip
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is in requirements.txt
+    brotli = None
+
+# Smaller bodies fit in a packet or two; compressing them costs more CPU than it saves
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+COMPRESSIBLE_TYPES = (b"application/json", b"text/", b"application/javascript")
+
+
+def accepted_encodings(accept_encoding: str) -> set:
+    """Codings the client accepts with a non-zero q value."""
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if coding and quality > 0:
+            accepted.add(coding.strip())
+    return accepted
+
+
+def choose_encoding(accept_encoding: str):
+    accepted = accepted_encodings(accept_encoding)
+    if brotli is not None and ("br" in accepted or "*" in accepted):
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def add_vary(headers: list, field: bytes = b"Accept-Encoding") -> list:
+    """Add `field` to the response's Vary header, merging with an existing one."""
+    for index, (name, value) in enumerate(headers):
+        if name.lower() != b"vary":
+            continue
+        listed = {part.strip().lower() for part in value.split(b",")}
+        if field.lower() in listed or b"*" in listed:
+            return headers
+        headers = list(headers)
+        headers[index] = (name, value + b", " + field)
+        return headers
+    return list(headers) + [(b"vary", field)]
+
+
+class CompressionMiddleware:
+    """
+    Plain ASGI middleware that compresses complete JSON/text responses of at
+    least COMPRESSION_MIN_BYTES with brotli or gzip, whichever the client
+    prefers of those it accepts (brotli first). Streamed responses and
+    bodies that already carry a Content-Encoding pass through untouched.
+    Every response that would have been compressed for some client carries
+    `Vary: Accept-Encoding`, compressed or not, so shared caches keep the
+    variants apart.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        encoding = choose_encoding(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        held = {}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                held["start"] = message
+                return
+            if message["type"] != "http.response.body" or "start" not in held:
+                await send(message)
+                return
+
+            start = held.pop("start")
+            body = message.get("body", b"")
+            response_headers = list(start.get("headers", []))
+            names = {name.lower(): value for name, value in response_headers}
+            content_type = names.get(b"content-type", b"")
+
+            if (
+                message.get("more_body")
+                or len(body) < COMPRESSION_MIN_BYTES
+                or b"content-encoding" in names
+                or not content_type.startswith(COMPRESSIBLE_TYPES)
+            ):
+                await send(start)
+                await send(message)
+                return
+
+            response_headers = add_vary(response_headers)
+            if encoding is None:
+                await send({**start, "headers": response_headers})
+                await send(message)
+                return
+
+            compressed = compress(body, encoding)
+            response_headers = [(n, v) for n, v in response_headers if n.lower() != b"content-length"]
+            response_headers += [
+                (b"content-encoding", encoding.encode("latin-1")),
+                (b"content-length", str(len(compressed)).encode("latin-1")),
+            ]
+            await send({**start, "headers": response_headers})
+            await send({**message, "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
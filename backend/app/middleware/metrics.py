@@ -0,0 +1,40 @@
+import time
+from app.utils import metrics
+
+
+class MetricsMiddleware:
+    """
+    Plain ASGI middleware (no BaseHTTPMiddleware body buffering) that times
+    each HTTP request by its route template, e.g. /alerts/{alert_id}, and
+    tags outbound calls made while serving it with the router name.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope.get("path", "")
+        router = path.strip("/").split("/", 1)[0] or "root"
+        token = metrics.current_router.set(router)
+        status_holder = {"status": 500}
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder["status"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            # Unmatched paths share one label so scanners can't blow up cardinality
+            route_label = getattr(route, "path", None) or "unmatched"
+            metrics.http_request_duration.observe(
+                time.perf_counter() - started, scope["method"], route_label, str(status_holder["status"])
+            )
+            metrics.current_router.reset(token)
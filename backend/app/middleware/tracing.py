@@ -0,0 +1,31 @@
+from app.utils import tracing
+
+
+class TracingMiddleware:
+    """
+    Plain ASGI middleware that traces each HTTP request when TRACING_ENABLED
+    is set, adds the finished spans as a Server-Timing header and hands the
+    trace to the exporter once the response is sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not tracing.TRACING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        trace, token = tracing.start_trace(f'{scope["method"]} {scope.get("path", "")}')
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", tracing.server_timing(trace).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            tracing.end_trace(trace, token)
@@ -3,10 +3,15 @@ from app.middleware.auth import require_auth
 from app.services.anomaly_detector import (
     run_scheduled_anomaly_detection,
     get_recent_alerts,
-    acknowledge_alert
+    get_alert,
+    acknowledge_alert,
+    bulk_acknowledge_alerts
 )
+from app.services.alert_summary import get_alert_summary
 from app.services.email_service import send_test_email
-from typing import Optional
+from app.utils.serialization import FastJSONResponse
+from datetime import datetime
+from typing import List, Optional
 from pydantic import BaseModel
 
 router = APIRouter(prefix="/alerts", tags=["Alerts"])
@@ -17,6 +22,14 @@ class AcknowledgeAlertRequest(BaseModel):
     acknowledged_by: str
 
 
+class BulkAcknowledgeRequest(BaseModel):
+    acknowledged_by: str
+    alert_ids: Optional[List[str]] = None
+    plant_id: Optional[str] = None
+    severity: Optional[str] = None
+    before: Optional[datetime] = None
+
+
 class TestEmailRequest(BaseModel):
     recipient: str
 
@@ -25,22 +38,42 @@ class TestEmailRequest(BaseModel):
 def get_alerts(
     limit: int = 50,
     severity: Optional[str] = None,
+    cursor: Optional[str] = None,
     user=Depends(require_auth)
 ):
     """
-    Get recent alerts from Firestore.
+    Get recent alerts from Firestore as lightweight summaries.
     
     Query Parameters:
-    - limit: Number of alerts to fetch (default: 50)
+    - limit: Number of alerts to fetch (default: 50, max: 200)
     - severity: Filter by severity ('critical', 'warning', or None for all)
+    - cursor: `next_cursor` from the previous page to fetch older alerts
+    
+    The full plant state snapshot is available from GET /alerts/{alert_id}.
     """
     try:
-        alerts = get_recent_alerts(limit=limit, severity=severity)
-        return {
+        page = get_recent_alerts(limit=min(limit, 200), severity=severity, cursor=cursor)
+        return FastJSONResponse({
             "success": True,
-            "count": len(alerts),
-            "alerts": alerts
-        }
+            "count": len(page["alerts"]),
+            "alerts": page["alerts"],
+            "next_cursor": page["next_cursor"]
+        })
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/summary")
+def get_summary(user=Depends(require_auth)):
+    """
+    Get unacknowledged alert counts per severity and plant, plus the id and
+    time of the latest alert. Reads a single summary document, so it is
+    cheap enough for badge and notification polling.
+    """
+    try:
+        return {"success": True, "summary": get_alert_summary()}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -59,6 +92,32 @@ def acknowledge(
     return result
 
 
+@router.post("/acknowledge/bulk")
+def acknowledge_bulk(
+    request: BulkAcknowledgeRequest,
+    user=Depends(require_auth)
+):
+    """
+    Acknowledge many alerts at once using Firestore batched writes.
+    
+    Pass either `alert_ids`, or a filter over open alerts made of any of
+    `plant_id`, `severity` and `before` (alerts older than this timestamp).
+    Returns a status for every alert id touched.
+    """
+    if not request.alert_ids and not (request.plant_id or request.severity or request.before):
+        raise HTTPException(status_code=400, detail="Provide alert_ids or at least one filter")
+    result = bulk_acknowledge_alerts(
+        acknowledged_by=request.acknowledged_by,
+        alert_ids=request.alert_ids,
+        plant_id=request.plant_id,
+        severity=request.severity,
+        before=request.before
+    )
+    if not result["success"]:
+        raise HTTPException(status_code=500, detail=result.get("error"))
+    return result
+
+
 @router.post("/check-now")
 def check_anomalies_now(
     background_tasks: BackgroundTasks,
@@ -100,3 +159,20 @@ def test_email(
     if not result["success"]:
         raise HTTPException(status_code=500, detail=result["message"])
     return result
+
+
+@router.get("/{alert_id}")
+def get_alert_detail(
+    alert_id: str,
+    user=Depends(require_auth)
+):
+    """
+    Get a single alert including the full plant state captured when it fired.
+    """
+    try:
+        alert = get_alert(alert_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if not alert:
+        raise HTTPException(status_code=404, detail="Alert not found")
+    return {"success": True, "alert": alert}
@@ -1,14 +1,16 @@
 from fastapi import APIRouter, HTTPException, Depends
 from app.models.user_model import UserLogin
 from app.services.auth_service import login_user
-from app.services.firestore_service import verify_token, fs_client
-from app.middleware.auth import require_auth
+from app.services.firestore_service import verify_token, fs_client, TOKENS_COLLECTION
+from app.services import session_tokens
+from app.services.token_sweeper import sweep_expired_tokens, get_sweep_status
+from app.middleware.auth import require_auth, require_scheduler_or_admin
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
 @router.post("/login")
-def login(credentials: UserLogin):
-    return login_user(credentials)
+async def login(credentials: UserLogin):
+    return await login_user(credentials)
 
 @router.get("/me")
 def get_current_user(user=Depends(require_auth)):
@@ -22,5 +24,24 @@ def get_current_user(user=Depends(require_auth)):
 
 @router.post("/logout")
 def logout(user=Depends(require_auth)):
-    """Logout endpoint - Firebase handles token invalidation on client side"""
+    """Logout endpoint - revokes the presented token"""
+    if user.get("jti"):
+        session_tokens.revoke_token(user)
+    else:
+        fs_client.collection(TOKENS_COLLECTION).document(user["token"]).delete()
     return {"message": "Logged out successfully", "email": user.get("email")}
+
+@router.post("/tokens/sweep")
+def sweep_tokens(caller=Depends(require_scheduler_or_admin)):
+    """
+    Endpoint for Cloud Scheduler to delete expired tokens from auth_tokens.
+    Runs in bounded batches; an incomplete run is resumed by the next call.
+    The scheduler job sends SCHEDULER_SECRET in X-Scheduler-Secret; admins
+    can also trigger a run with their bearer token.
+    """
+    return sweep_expired_tokens()
+
+@router.get("/tokens/sweep")
+def sweep_status(user=Depends(require_auth)):
+    """Progress and totals of the expired token sweeper"""
+    return get_sweep_status()
@@ -1,7 +1,9 @@
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
+from typing import Dict, Optional
 from app.middleware.auth import require_auth
 from app.services.chatbot_service import process_chat_message
+from app.services import intent_router, response_cache
 import logging
 
 logger = logging.getLogger("xement-ai")
@@ -10,15 +12,16 @@ router = APIRouter(prefix="/chatbot", tags=["Chatbot"])
 
 class ChatRequest(BaseModel):
     message: str
-    user_id: str
+    user_id: Optional[str] = None  # ignored; memory is keyed on the authenticated user
     user_name: str = "User"
-    context: dict = {}
+    context: dict = {}  # optional: conversation_id, reset_memory
 
 class ChatResponse(BaseModel):
     response: str
     model: str = "gemini"
     context_used: bool = False
     timestamp: str
+    prompt_tokens: Optional[Dict[str, int]] = None
 
 @router.post("", response_model=ChatResponse)
 async def chat(request: ChatRequest, current_user=Depends(require_auth)):
@@ -29,14 +32,19 @@ async def chat(request: ChatRequest, current_user=Depends(require_auth)):
     - Uses Gemini AI for natural language understanding
     - Fetches relevant context from BigQuery (latest KPIs, anomalies, etc.)
     - Returns AI-generated response
+    - Keeps per-user conversation memory; pass `context.conversation_id` to
+      run separate threads and `context.reset_memory` to start over
     """
+    # The body user_id is client-controlled (the frontend sends the email) and is never trusted
+    user_id = current_user["user_id"]
+
     try:
-        logger.info(f"Chat request from user: {request.user_id}")
+        logger.info(f"Chat request from user: {user_id}")
         
-        # Process message with AI service
+        # Process message with AI service; memory is keyed on the token's user only
         response_data = await process_chat_message(
             message=request.message,
-            user_id=request.user_id,
+            user_id=user_id,
             user_name=request.user_name,
             context=request.context
         )
@@ -58,3 +66,14 @@ async def chatbot_health():
         "service": "chatbot",
         "ai_model": "gemini-pro"
     }
+
+@router.get("/stats")
+async def chatbot_stats(current_user=Depends(require_auth)):
+    """
+    Chat traffic report since the instance started: share of messages answered
+    locally vs by Gemini with average latency per path, and response cache hits
+    """
+    return {
+        "routing": intent_router.get_stats(),
+        "response_cache": response_cache.get_stats()
+    }
@@ -1,51 +1,94 @@
 from fastapi import APIRouter, HTTPException
 from google.cloud import bigquery
+from app.services.bigquery_service import run_query
+from app.services import local_replica
 from app.models.plant_model import PlantState
+from app.utils import metrics
+from app.utils.serialization import FastJSONResponse
 import datetime
+import threading
+import os
 
-def build_aggregated_query(period: str, plant: str = "all") -> str:
+REFINEMENT_TABLE = "`xement-ai.xement_ai_dataset.xement_ai_refinement_data`"
+
+# Period bounds are computed here and snapped to this bucket, so every request
+# within a bucket sends identical query text and parameters and BigQuery can
+# answer repeats from its result cache (CURRENT_TIMESTAMP() would disable it).
+# Rows stamped between now and the bucket end are clamped to now on output
+PERIOD_BUCKET_SECONDS = int(os.getenv("PERIOD_BUCKET_SECONDS", "300"))
+
+PERIOD_LOOKBACK = {
+    "lastHour": datetime.timedelta(hours=1),
+    "currentShift": datetime.timedelta(hours=8),
+    "thisWeek": datetime.timedelta(days=7),
+}
+
+AGGREGATION_TYPES = {
+    "today": "daily_avg",
+    "currentShift": "shift_avg",
+    "thisWeek": "weekly_avg",
+}
+
+
+def period_bounds(period: str, now: datetime.datetime = None):
     """
-    Builds a dynamic SQL query that aggregates KPI values based on the selected time period.
+    Return (start, end) for a period: `end` is the next bucket boundary after
+    now (exclusive), `start` is None for an unbounded lower end.
     """
-    base_table = "`xement-ai.xement_ai_dataset.xement_ai_refinement_data`"
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    epoch = int(now.timestamp())
+    end = datetime.datetime.fromtimestamp(
+        epoch - epoch % PERIOD_BUCKET_SECONDS + PERIOD_BUCKET_SECONDS, datetime.timezone.utc
+    )
+    if period == "today":
+        start = now.astimezone(datetime.timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        return start, min(end, start + datetime.timedelta(days=1))
+    if period in PERIOD_LOOKBACK:
+        return end - PERIOD_LOOKBACK[period], end
+    return None, end
 
-    where = ["timestamp <= CURRENT_TIMESTAMP()"]
+
+def _period_filter(period: str, plant: str, now: datetime.datetime = None):
+    """WHERE clause and query parameters for a period and plant ('all' for every plant)."""
+    start, end = period_bounds(period, now)
+    clauses = ["timestamp < @end"]
+    params = [bigquery.ScalarQueryParameter("end", "TIMESTAMP", end)]
+    if start is not None:
+        clauses.append("timestamp >= @start")
+        params.append(bigquery.ScalarQueryParameter("start", "TIMESTAMP", start))
     if plant != "all":
-        where.append(f"plant_id = '{plant}'")
+        clauses.append("plant_id = @plant")
+        params.append(bigquery.ScalarQueryParameter("plant", "STRING", plant))
+    return " AND ".join(clauses), params
 
-    where_clause = " AND ".join(where)
 
-    if period == "lastHour":
-        return f"""
-            SELECT *
-            FROM {base_table}
-            WHERE {where_clause}
-            ORDER BY timestamp DESC
-            LIMIT 1
-        """
+def latest_row_query(plant: str = "all", period: str = None, now: datetime.datetime = None):
+    """Newest reading within the period (or ever, for period=None) as (query, job_config)."""
+    where_clause, params = _period_filter(period, plant, now)
+    query = f"""
+        SELECT *
+        FROM {REFINEMENT_TABLE}
+        WHERE {where_clause}
+        ORDER BY timestamp DESC
+        LIMIT 1
+    """
+    return query, bigquery.QueryJobConfig(query_parameters=params)
 
-    # Daily, shift, weekly aggregates
-    if period == "today":
-        period_filter = "DATE(timestamp) = CURRENT_DATE()"
-        aggregation_type = "daily_avg"
-    elif period == "currentShift":
-        period_filter = "timestamp >= TIMESTAMP_SUB(CURRENT_TIMESTAMP(), INTERVAL 8 HOUR)"
-        aggregation_type = "shift_avg"
-    elif period == "thisWeek":
-        period_filter = "timestamp >= TIMESTAMP_SUB(CURRENT_TIMESTAMP(), INTERVAL 7 DAY)"
-        aggregation_type = "weekly_avg"
-    else:
-        # fallback to latest
-        return f"""
-            SELECT *
-            FROM {base_table}
-            WHERE {where_clause}
-            ORDER BY timestamp DESC
-            LIMIT 1
-        """
+
+def build_aggregated_query(period: str, plant: str = "all", now: datetime.datetime = None):
+    """
+    Builds a parameterized SQL query that aggregates KPI values for the selected
+    time period. Returns (query, job_config).
+    """
+    if period not in AGGREGATION_TYPES:
+        # lastHour, and unknown periods, return the latest reading
+        return latest_row_query(plant, period if period == "lastHour" else None, now)
+
+    where_clause, params = _period_filter(period, plant, now)
+    params.append(bigquery.ScalarQueryParameter("aggregation_type", "STRING", AGGREGATION_TYPES[period]))
 
     # Aggregation query
-    return f"""
+    query = f"""
         SELECT
           AVG(energy_use) AS energy_use,
           AVG(grinding_efficiency) AS grinding_efficiency,
@@ -58,18 +101,113 @@ def build_aggregated_query(period: str, plant: str = "all") -> str:
           MAX(timestamp) AS last_record_time,
           MIN(timestamp) AS period_start,
           COUNT(*) AS record_count,
-          '{aggregation_type}' AS aggregation_type,
-          (SELECT fuel_type 
-           FROM (SELECT fuel_type, COUNT(*) as count 
-                 FROM `xement-ai.xement_ai_dataset.xement_ai_refinement_data` 
-                 WHERE {' AND '.join(where + [period_filter])}
-                 GROUP BY fuel_type 
-                 ORDER BY count DESC 
-                 LIMIT 1)) as fuel_type,
+          @aggregation_type AS aggregation_type,
+          APPROX_TOP_COUNT(fuel_type, 1)[SAFE_OFFSET(0)].value AS fuel_type,
           LOGICAL_OR(anomaly_flag) as has_anomaly
-        FROM {base_table}
-        WHERE {where_clause} AND {period_filter}
+        FROM {REFINEMENT_TABLE}
+        WHERE {where_clause}
     """
+    return query, bigquery.QueryJobConfig(query_parameters=params)
+
+VALID_PLANTS = ['PlantA', 'PlantB', 'PlantC']
+MAX_BATCH_PLANTS = 50
+# How far back the batch query looks for each plant's latest reading, so it
+# only scans that many daily partitions
+BATCH_LATEST_LOOKBACK = datetime.timedelta(days=7)
+
+# Batch results, from BigQuery or the local replica, are cached as a unit per
+# (plants, period, bucket); entries from earlier buckets are dropped since
+# their bounds can't be requested again
+_batch_lock = threading.Lock()
+_batch_cache = {}
+
+
+def build_batch_query(plants: list, period: str, now: datetime.datetime = None):
+    """
+    One query for the latest reading and the period aggregates of every plant
+    in `plants`. Returns (query, job_config, bucket end).
+    """
+    start, end = period_bounds(period, now)
+    params = [
+        bigquery.ArrayQueryParameter("plants", "STRING", plants),
+        bigquery.ScalarQueryParameter("end", "TIMESTAMP", end),
+        bigquery.ScalarQueryParameter("start", "TIMESTAMP", start),
+        bigquery.ScalarQueryParameter("since", "TIMESTAMP", min(start, end - BATCH_LATEST_LOOKBACK)),
+    ]
+    query = f"""
+        WITH scoped AS (
+          SELECT *
+          FROM {REFINEMENT_TABLE}
+          WHERE plant_id IN UNNEST(@plants) AND timestamp >= @since AND timestamp < @end
+        ),
+        latest AS (
+          SELECT *
+          FROM scoped
+          WHERE TRUE
+          QUALIFY ROW_NUMBER() OVER (PARTITION BY plant_id ORDER BY timestamp DESC) = 1
+        ),
+        aggregates AS (
+          SELECT
+            plant_id,
+            AVG(energy_use) AS energy_use,
+            AVG(grinding_efficiency) AS grinding_efficiency,
+            AVG(kiln_temp) AS kiln_temp,
+            AVG(product_quality_index) AS product_quality_index,
+            AVG(emissions_CO2) AS emissions,
+            AVG(alt_fuel_pct) AS alt_fuel_pct,
+            AVG(clinker_rate) AS clinker_rate,
+            AVG(feed_rate) AS production_volume,
+            MAX(timestamp) AS last_record_time,
+            MIN(timestamp) AS period_start,
+            COUNT(*) AS record_count,
+            APPROX_TOP_COUNT(fuel_type, 1)[SAFE_OFFSET(0)].value AS fuel_type,
+            LOGICAL_OR(anomaly_flag) AS has_anomaly
+          FROM scoped
+          WHERE timestamp >= @start
+          GROUP BY plant_id
+        )
+        SELECT latest.plant_id, latest, aggregates
+        FROM latest
+        LEFT JOIN aggregates USING (plant_id)
+    """
+    return query, bigquery.QueryJobConfig(query_parameters=params), end
+
+
+def _local_state(period: str, plant: str, now: datetime.datetime):
+    """/latest_state rows from the local replica, or None when BigQuery has to answer."""
+    start, end = period_bounds(period, now)
+    if period in AGGREGATION_TYPES:
+        if not local_replica.covers(start):
+            return None
+        row = local_replica.aggregate(plant, start, end)
+        row["aggregation_type"] = AGGREGATION_TYPES[period]
+        return [row]
+    if period == "lastHour" and local_replica.covers(start):
+        rows = local_replica.rows(plant, start, end, 1)
+        if rows:
+            return rows
+    # Any replicated reading is newer than everything outside the replicated window
+    if local_replica.covers(end):
+        return local_replica.rows(plant, None, end, 1) or None
+    return None
+
+
+def _local_batch(plant_ids: list, start, end) -> dict:
+    batch = {}
+    for plant_id in plant_ids:
+        latest = local_replica.rows(plant_id, None, end, 1)
+        if latest:
+            batch[plant_id] = {"latest": latest[0], "aggregates": local_replica.aggregate(plant_id, start, end)}
+    return batch
+
+
+def _clamp_future(data: dict, keys, current_time: datetime.datetime) -> dict:
+    """Replace timestamps ahead of the server clock with the current time."""
+    for key in keys:
+        if data.get(key) is not None and data[key] > current_time:
+            data[key] = current_time.isoformat()
+    return data
+
 
 router = APIRouter(prefix="", tags=["Public"])
 
@@ -87,26 +225,20 @@ def get_latest_state(plant: str = "all", period: str = "lastHour"):
     - For other periods: Aggregated statistics (averages) for the selected period
     """
     try:
-        client = bigquery.Client()
-        
-        query = build_aggregated_query(period, plant)
-        rows = list(client.query(query))
+        now = datetime.datetime.now(datetime.timezone.utc)
+        rows = _local_state(period, plant, now)
+        if local_replica.LOCAL_REPLICA_ENABLED:
+            metrics.cache_result("local_replica", rows is not None)
+
+        if rows is None:
+            query, job_config = build_aggregated_query(period, plant, now)
+            # Over the byte budget, a period aggregate downgrades to the latest reading
+            rows = run_query(query, "latest_state", job_config=job_config,
+                             fallback=latest_row_query(plant, "lastHour", now))
         
         if not rows:
-            base_table = "`xement-ai.xement_ai_dataset.xement_ai_refinement_data`"
-            fallback_query = f"""
-                SELECT *
-                FROM {base_table}
-                {'WHERE plant_id = @plant' if plant != 'all' else ''}
-                ORDER BY timestamp DESC
-                LIMIT 1
-            """
-            job_config = bigquery.QueryJobConfig(
-                query_parameters=[
-                    bigquery.ScalarQueryParameter("plant", "STRING", plant)
-                ] if plant != 'all' else None
-            )
-            rows = list(client.query(fallback_query, job_config=job_config))
+            fallback_query, fallback_config = latest_row_query(plant, None, now)
+            rows = run_query(fallback_query, "latest_state_fallback", job_config=fallback_config)
             
             if not rows:
                 raise HTTPException(status_code=404, detail="No plant state data available")
@@ -128,7 +260,7 @@ def get_latest_state(plant: str = "all", period: str = "lastHour"):
         if 'period_start' in state_data and state_data['period_start'] > current_time:
             state_data['period_start'] = current_time.isoformat()
         
-        return state_data
+        return FastJSONResponse(state_data)
         
     except HTTPException:
         raise
@@ -139,6 +271,77 @@ def get_latest_state(plant: str = "all", period: str = "lastHour"):
         )
 
 
+@router.get("/latest_state/batch")
+def get_latest_state_batch(plants: str = ",".join(VALID_PLANTS), period: str = "today"):
+    """
+    Public endpoint: Latest reading and period aggregates for several plants
+    from a single BigQuery job.
+
+    Parameters:
+    - plants: Comma-separated plant IDs (default: every known plant)
+    - period: 'lastHour', 'today' (default), 'currentShift' or 'thisWeek'
+
+    Returns a map of plant ID to {"latest": row, "aggregates": stats}; plants
+    without data map to null.
+    """
+    try:
+        plant_ids = sorted({p.strip() for p in plants.split(",") if p.strip()})
+        if not plant_ids:
+            raise HTTPException(status_code=400, detail="At least one plant is required")
+        if len(plant_ids) > MAX_BATCH_PLANTS:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_PLANTS} plants per request")
+        if period not in PERIOD_LOOKBACK and period not in AGGREGATION_TYPES:
+            period = "lastHour"
+
+        now = datetime.datetime.now(datetime.timezone.utc)
+        query, job_config, end = build_batch_query(plant_ids, period, now)
+        key = (tuple(plant_ids), period, end)
+        start, _ = period_bounds(period, now)
+
+        with _batch_lock:
+            cached = _batch_cache.get(key)
+        metrics.cache_result("plant_batch", cached is not None)
+        if cached is None:
+            if local_replica.covers(start):
+                cached = _local_batch(plant_ids, start, end)
+            else:
+                rows = run_query(query, "latest_state_batch", job_config=job_config)
+                cached = {row["plant_id"]: {"latest": dict(row["latest"]),
+                                            "aggregates": dict(row["aggregates"]) if row["aggregates"] else None}
+                          for row in rows}
+            with _batch_lock:
+                for stale in [k for k in _batch_cache if k[2] < end]:
+                    del _batch_cache[stale]
+                _batch_cache[key] = cached
+
+        current_time = datetime.datetime.now(datetime.timezone.utc)
+        result = {}
+        for plant_id in plant_ids:
+            entry = cached.get(plant_id)
+            if entry is None:
+                result[plant_id] = None
+                continue
+            result[plant_id] = {
+                "latest": _clamp_future(dict(entry["latest"]), ("timestamp",), current_time),
+                "aggregates": _clamp_future(dict(entry["aggregates"]), ("last_record_time", "period_start"), current_time)
+                if entry["aggregates"] else None,
+            }
+
+        return FastJSONResponse({
+            "period": period,
+            "source_table": "xement_ai_refinement_data",
+            "plants": result,
+        })
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to fetch plant states: {str(e)}"
+        )
+
+
 @router.get("/history")
 def get_history(limit: int = 50, plant: str = "PlantA", period: str = "lastHour"):
     """
@@ -152,35 +355,29 @@ def get_history(limit: int = 50, plant: str = "PlantA", period: str = "lastHour"
     try:
         limit = min(limit, 1000)
         
-        valid_plants = ['PlantA', 'PlantB', 'PlantC']
-        if plant not in valid_plants:
+        if plant not in VALID_PLANTS:
             plant = 'PlantA'
             
-        client = bigquery.Client()
-        where_clauses = [
-            "timestamp <= CURRENT_TIMESTAMP()", 
-            f"plant_id = '{plant}'"
-        ]
-
-        if period == "lastHour":
-            where_clauses.append("timestamp >= TIMESTAMP_SUB(CURRENT_TIMESTAMP(), INTERVAL 1 HOUR)")
-        elif period == "currentShift":
-            where_clauses.append("timestamp >= TIMESTAMP_SUB(CURRENT_TIMESTAMP(), INTERVAL 8 HOUR)")
-        elif period == "today":
-            where_clauses.append("DATE(timestamp) = CURRENT_DATE()")
-        elif period == "thisWeek":
-            where_clauses.append("timestamp >= TIMESTAMP_SUB(CURRENT_TIMESTAMP(), INTERVAL 7 DAY)")
-
-        where_clause = " AND ".join(where_clauses)
-
-        query = f"""
-            SELECT * 
-            FROM `xement-ai.xement_ai_dataset.xement_ai_refinement_data`
-            WHERE {where_clause}
-            ORDER BY timestamp DESC
-            LIMIT {limit}
-        """
-        rows = list(client.query(query))
+        now = datetime.datetime.now(datetime.timezone.utc)
+
+        def history_query(history_period):
+            where_clause, params = _period_filter(history_period, plant, now)
+            query = f"""
+                SELECT * 
+                FROM {REFINEMENT_TABLE}
+                WHERE {where_clause}
+                ORDER BY timestamp DESC
+                LIMIT {limit}
+            """
+            return query, bigquery.QueryJobConfig(query_parameters=params)
+
+        start, end = period_bounds(period, now)
+        if local_replica.covers(start):
+            rows = local_replica.rows(plant, start, end, limit)
+        else:
+            query, job_config = history_query(period)
+            # Over the byte budget, longer periods downgrade to the last hour
+            rows = run_query(query, "history", job_config=job_config, fallback=history_query("lastHour"))
         
         if not rows:
             raise HTTPException(status_code=404, detail="No historical data available")
@@ -192,6 +389,8 @@ def get_history(limit: int = 50, plant: str = "PlantA", period: str = "lastHour"
             if 'timestamp' in row_data and row_data['timestamp'] > current_time:
                 row_data['timestamp'] = current_time.isoformat()
             history_data.append(row_data)
-        return history_data
+        return FastJSONResponse(history_data)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch history: {str(e)}")
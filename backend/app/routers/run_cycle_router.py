@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException
-from google.cloud import bigquery
+from app.services.bigquery_service import run_query, latest_state_table
+from app.utils import metrics, tracing
 from datetime import datetime
 from app.models.plant_model import PlantState
 from app.services.firestore_service import fs_client
@@ -91,26 +92,28 @@ def run_cycle(user=Depends(require_auth)):
     5. Log results in Firestore
     """
 
-    client = bigquery.Client()
-    query = """
+    query = f"""
         SELECT * 
-        FROM `xement-ai.xement_ai_dataset.serve_latest`
+        FROM `{latest_state_table()}`
         ORDER BY timestamp DESC
         LIMIT 1
     """
 
     try:
-        rows = list(client.query(query))
+        with tracing.span("run_cycle.bigquery_fetch"):
+            rows = run_query(query, "serve_latest")
         if not rows:
             raise HTTPException(status_code=404, detail="No plant state available")
         state = PlantState(**dict(rows[0])).dict()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"BigQuery fetch failed: {str(e)}")
 
-    anomaly = check_anomalies(state)
+    with tracing.span("run_cycle.anomaly_check"):
+        anomaly = check_anomalies(state)
 
     try:
-        gemini_output = get_recommendation(state)
+        with tracing.span("run_cycle.gemini"):
+            gemini_output = get_recommendation(state)
         if not isinstance(gemini_output, dict):
             gemini_output = {"recommendations": []}
     except Exception as e:
@@ -121,7 +124,8 @@ def run_cycle(user=Depends(require_auth)):
         vertex_input_modified[rec.get("parameter")] = rec.get("new_value")
 
     try:
-        verified_saving = verify_energy_saving(state, vertex_input_modified)
+        with tracing.span("run_cycle.vertex_verify"):
+            verified_saving = verify_energy_saving(state, vertex_input_modified)
     except Exception:
         verified_saving = None
 
@@ -135,7 +139,8 @@ def run_cycle(user=Depends(require_auth)):
             "anomaly": anomaly,
             "recommendation": gemini_output,
         }
-        fs_client.collection("plant_cycles").add(doc_data)
+        with tracing.span("run_cycle.firestore_write"), metrics.timed("firestore", "plant_cycles.add"):
+            fs_client.collection("plant_cycles").add(doc_data)
         firestore_written = True
     except Exception as e:
         firestore_written = False
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException
-from google.cloud import bigquery
+from app.services.bigquery_service import run_query, latest_state_table
 from app.models.plant_model import PlantState
 from app.services.fuel_simulator import simulate_fuel_mix
 from app.middleware.auth import require_auth
@@ -9,11 +9,10 @@ router = APIRouter(prefix="/simulate_fuel", tags=["Simulation"])
 @router.get("/")
 def simulate_fuel(user=Depends(require_auth)):
     try:
-        client = bigquery.Client()
-        rows = list(client.query("""
-            SELECT * FROM `xement-ai.xement_ai_dataset.serve_latest`
+        rows = run_query(f"""
+            SELECT * FROM `{latest_state_table()}`
             ORDER BY timestamp DESC LIMIT 1
-        """))
+        """, "serve_latest")
         if not rows:
             raise HTTPException(status_code=404, detail="No data found in BigQuery")
 
@@ -1,4 +1,5 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends, Query, status
 from app.models.user_model import UserSignup, UserUpdate
 from app.services.user_management_service import (
     get_all_users,
@@ -6,15 +7,35 @@ from app.services.user_management_service import (
     update_user,
     delete_user,
     get_user_by_id,
+    backfill_search_fields,
 )
 from app.middleware.auth import require_auth, require_admin
 
 router = APIRouter(prefix="/admin/users", tags=["User Management"])
 
 @router.get("")
-def list_users(user=Depends(require_admin)):
-    """Get all users - Admin only"""
-    return get_all_users()
+def list_users(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    search: Optional[str] = None,
+    search_by: str = "email",
+    user=Depends(require_admin)
+):
+    """
+    List users one page at a time - Admin only
+
+    Query Parameters:
+    - limit: Users per page (default: 50, max: 200)
+    - cursor: `next_cursor` from the previous page
+    - search: Case-insensitive prefix to match
+    - search_by: 'email' (default) or 'name'
+    """
+    return get_all_users(limit=limit, cursor=cursor, search=search, search_by=search_by)
+
+@router.post("/backfill-search")
+def backfill_search(user=Depends(require_admin)):
+    """Add search fields to users created before prefix search - Admin only"""
+    return backfill_search_fields()
 
 @router.post("")
 def create_new_user(user_data: UserSignup, current_user=Depends(require_admin)):
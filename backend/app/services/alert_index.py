@@ -0,0 +1,254 @@
+"""
+In-memory mirror of the alerts collection, fed by Firestore snapshot listeners.
+
+Two listeners are kept: one on the newest ALERT_INDEX_WINDOW alerts (for the
+recent alerts list and single-alert reads) and one on the newest
+ALERT_INDEX_OPEN_LIMIT unacknowledged alerts (for the chatbot and the
+detector). Readers get copies ordered by time or severity without touching
+Firestore; they fall back to a query when the index is not ready.
+
+Listeners deliver whole documents, so open alerts are projected to
+OPEN_ALERT_FIELDS as they arrive (the embedded plant_state snapshot is not
+kept), and both mirrors apply each snapshot's document changes
+incrementally. `version()` only moves when the open alerts' ids, severities,
+anomalies or timestamps change, so cache keys built on it survive
+unrelated writes.
+"""
+import os
+import time
+import logging
+import threading
+from datetime import datetime, timezone
+
+from app.services.firestore_service import fs_client
+
+logger = logging.getLogger(__name__)
+
+ALERT_INDEX_WINDOW = int(os.getenv("ALERT_INDEX_WINDOW", "500"))
+ALERT_INDEX_OPEN_LIMIT = int(os.getenv("ALERT_INDEX_OPEN_LIMIT", "1000"))
+ALERT_INDEX_ENABLED = os.getenv("ALERT_INDEX_ENABLED", "true").lower() == "true"
+# Minimum gap between attempts to (re)attach the listeners
+ALERT_INDEX_RETRY_SECONDS = int(os.getenv("ALERT_INDEX_RETRY_SECONDS", "60"))
+SEVERITY_RANK = {"critical": 0, "warning": 1}
+
+OPEN_ALERT_FIELDS = ("timestamp", "severity", "anomalies", "plant_id", "notified", "acknowledged")
+# Fields whose change alters what callers keyed on version() would show
+_VERSIONED_FIELDS = ("timestamp", "severity", "anomalies")
+
+_lock = threading.Lock()
+_start_lock = threading.Lock()
+_recent = {}
+_open = {}
+_recent_ready = False
+_open_ready = False
+_version = 0
+_watches = []
+_last_start_attempt = None
+
+_EPOCH = datetime.min.replace(tzinfo=timezone.utc)
+
+
+def alert_time(alert_data: dict) -> datetime:
+    """Alert timestamp as an aware UTC datetime (epoch if missing)."""
+    ts = alert_data.get("timestamp")
+    if not isinstance(ts, datetime):
+        return _EPOCH
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+def _by_time(items):
+    # Ties on timestamp fall back to the id, matching Firestore's __name__ tiebreak
+    return sorted(items, key=lambda item: (alert_time(item[1]), item[0]), reverse=True)
+
+
+def _by_severity(items):
+    items = _by_time(items)
+    return sorted(items, key=lambda item: SEVERITY_RANK.get(item[1].get("severity"), len(SEVERITY_RANK)))
+
+
+def _open_entry(alert_data: dict) -> dict:
+    entry = {key: alert_data[key] for key in OPEN_ALERT_FIELDS if key in alert_data}
+    if not entry.get("plant_id"):
+        entry["plant_id"] = (alert_data.get("plant_state") or {}).get("plant_id")
+    return entry
+
+
+def _versioned(entry):
+    return None if entry is None else tuple(repr(entry.get(key)) for key in _VERSIONED_FIELDS)
+
+
+def _on_recent(docs, changes, read_time):
+    global _recent_ready
+    with _lock:
+        for change in changes:
+            if change.type.name == "REMOVED":
+                _recent.pop(change.document.id, None)
+            else:
+                _recent[change.document.id] = change.document.to_dict()
+        _recent_ready = True
+
+
+def _on_open(docs, changes, read_time):
+    global _open_ready, _version
+    with _lock:
+        changed = False
+        for change in changes:
+            alert_id = change.document.id
+            before = _open.get(alert_id)
+            if change.type.name == "REMOVED":
+                _open.pop(alert_id, None)
+                after = None
+            else:
+                after = _open[alert_id] = _open_entry(change.document.to_dict())
+            changed = changed or _versioned(before) != _versioned(after)
+        _open_ready = True
+        if changed:
+            _version += 1
+
+
+def start():
+    """
+    Attach the snapshot listeners if they are not running. Safe to call on
+    every read: after a failed or dropped attach it retries at most once per
+    ALERT_INDEX_RETRY_SECONDS.
+    """
+    global _last_start_attempt
+    if not ALERT_INDEX_ENABLED or is_active():
+        return
+    with _start_lock:
+        if is_active():
+            return
+        if _last_start_attempt is not None and time.monotonic() - _last_start_attempt < ALERT_INDEX_RETRY_SECONDS:
+            return
+        _last_start_attempt = time.monotonic()
+        stop()
+        try:
+            alerts = fs_client.collection("alerts")
+            _watches.append(
+                alerts.order_by("timestamp", direction="DESCENDING")
+                .limit(ALERT_INDEX_WINDOW)
+                .on_snapshot(_on_recent)
+            )
+            _watches.append(
+                alerts.where("acknowledged", "==", False)
+                .order_by("timestamp", direction="DESCENDING")
+                .limit(ALERT_INDEX_OPEN_LIMIT)
+                .on_snapshot(_on_open)
+            )
+            logger.info(f"Alert index listeners started (window={ALERT_INDEX_WINDOW}, open={ALERT_INDEX_OPEN_LIMIT})")
+        except Exception as e:
+            logger.warning(f"Could not start alert index listeners (retrying in {ALERT_INDEX_RETRY_SECONDS}s): {e}")
+            stop()
+
+
+def stop():
+    global _recent_ready, _open_ready
+    while _watches:
+        try:
+            _watches.pop().unsubscribe()
+        except Exception:
+            pass
+    with _lock:
+        _recent.clear()
+        _open.clear()
+        _recent_ready = False
+        _open_ready = False
+
+
+def is_active() -> bool:
+    return bool(_watches) and all(getattr(w, "is_active", False) for w in _watches)
+
+
+def version() -> int:
+    """Increments when the open alerts change; lets callers key caches on them."""
+    return _version
+
+
+def upsert(alert_id: str, alert_data: dict):
+    """Apply a local write immediately instead of waiting for the listener."""
+    global _version
+    with _lock:
+        if _recent_ready:
+            _recent[alert_id] = dict(alert_data)
+            if len(_recent) > ALERT_INDEX_WINDOW:
+                oldest_id = _by_time(_recent.items())[-1][0]
+                _recent.pop(oldest_id, None)
+        if _open_ready:
+            before = _open.get(alert_id)
+            if alert_data.get("acknowledged"):
+                _open.pop(alert_id, None)
+                after = None
+            else:
+                after = _open[alert_id] = _open_entry(alert_data)
+            if _versioned(before) != _versioned(after):
+                _version += 1
+
+
+def mark_acknowledged(alert_ids, acknowledged_by: str, acknowledged_at: datetime):
+    """Reflect acknowledgements made by this process right away."""
+    global _version
+    with _lock:
+        removed = False
+        for alert_id in alert_ids:
+            removed = _open.pop(alert_id, None) is not None or removed
+            if alert_id in _recent:
+                _recent[alert_id] = {
+                    **_recent[alert_id],
+                    "acknowledged": True,
+                    "acknowledged_by": acknowledged_by,
+                    "acknowledged_at": acknowledged_at,
+                }
+        if removed:
+            _version += 1
+
+
+def recent(limit: int, severity: str = None, after: tuple = None):
+    """
+    Newest alerts as (id, data) pairs, or None when the index cannot answer
+    (listener not ready, or the page reaches past the mirrored window).
+    `after` is the (timestamp, id) of the last alert of the previous page.
+    """
+    start()
+    with _lock:
+        if not _recent_ready or not is_active():
+            return None
+        items = list(_recent.items())
+        window_full = len(items) >= ALERT_INDEX_WINDOW
+
+    if severity:
+        items = [item for item in items if item[1].get("severity") == severity]
+    if after is not None:
+        after_time, after_id = after
+        after_time = after_time if after_time.tzinfo else after_time.replace(tzinfo=timezone.utc)
+        items = [item for item in items if (alert_time(item[1]), item[0]) < (after_time, after_id)]
+    items = _by_time(items)
+
+    if len(items) < limit and window_full:
+        return None
+    return [(alert_id, dict(data)) for alert_id, data in items[:limit]]
+
+
+def open_alerts(limit: int = None, order: str = "time", plant_id: str = None):
+    """
+    Unacknowledged alerts as (id, data) pairs ordered by "time" (newest
+    first) or "severity" (critical first, then newest). None if not ready.
+    """
+    start()
+    with _lock:
+        if not _open_ready or not is_active():
+            return None
+        items = list(_open.items())
+
+    if plant_id:
+        items = [item for item in items if item[1].get("plant_id") == plant_id]
+    items = _by_severity(items) if order == "severity" else _by_time(items)
+    if limit is not None:
+        items = items[:limit]
+    return [(alert_id, dict(data)) for alert_id, data in items]
+
+
+def get(alert_id: str):
+    """A full mirrored alert by id, or None if it is not in the recent window."""
+    with _lock:
+        data = _recent.get(alert_id)
+        return dict(data) if data is not None else None
@@ -0,0 +1,143 @@
+from google.cloud import firestore
+from google.api_core.exceptions import AlreadyExists
+from datetime import datetime
+from app.services.firestore_service import fs_client
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_COLLECTION = "alert_summary"
+SUMMARY_DOC_ID = "global"
+UNKNOWN_PLANT = "unknown"
+
+_seed_lock = threading.Lock()
+_seeded = False
+
+
+def summary_ref():
+    return fs_client.collection(SUMMARY_COLLECTION).document(SUMMARY_DOC_ID)
+
+
+def _plant_of(alert_data: dict) -> str:
+    return alert_data.get("plant_id") or (alert_data.get("plant_state") or {}).get("plant_id") or UNKNOWN_PLANT
+
+
+def new_alert_changes(alert_id: str, alert_data: dict) -> dict:
+    """Merge payload for the summary document when an alert is created."""
+    severity = alert_data.get("severity", "unknown")
+    plant = _plant_of(alert_data)
+    return {
+        "unacknowledged": {severity: firestore.Increment(1)},
+        "unacknowledged_total": firestore.Increment(1),
+        "by_plant": {plant: {severity: firestore.Increment(1)}},
+        "latest_alert_id": alert_id,
+        "latest_alert_time": alert_data.get("timestamp"),
+        "latest_alert_severity": severity,
+        "latest_alert_anomaly_count": len(alert_data.get("anomalies", [])),
+        "updated_at": datetime.utcnow(),
+    }
+
+
+def acknowledged_changes(alerts: list) -> dict:
+    """Merge payload for the summary document when alerts are acknowledged."""
+    by_severity = {}
+    by_plant = {}
+    for alert_data in alerts:
+        severity = alert_data.get("severity", "unknown")
+        plant = _plant_of(alert_data)
+        by_severity[severity] = by_severity.get(severity, 0) + 1
+        by_plant.setdefault(plant, {})
+        by_plant[plant][severity] = by_plant[plant].get(severity, 0) + 1
+
+    return {
+        "unacknowledged": {s: firestore.Increment(-n) for s, n in by_severity.items()},
+        "unacknowledged_total": firestore.Increment(-len(alerts)),
+        "by_plant": {
+            plant: {s: firestore.Increment(-n) for s, n in counts.items()}
+            for plant, counts in by_plant.items()
+        },
+        "updated_at": datetime.utcnow(),
+    }
+
+
+def rebuild_summary(create_only: bool = False) -> dict:
+    """
+    Recompute the summary document from the alerts collection.
+    Used to seed the counters for alerts created before they existed. With
+    `create_only`, the document is only written if it still does not exist,
+    so an instance seeding concurrently never overwrites live counters.
+    """
+    query = (
+        fs_client.collection("alerts")
+        .where("acknowledged", "==", False)
+        .select(["severity", "plant_id", "plant_state.plant_id"])
+    )
+    summary = {
+        "unacknowledged": {},
+        "unacknowledged_total": 0,
+        "by_plant": {},
+        "updated_at": datetime.utcnow(),
+    }
+    for doc in query.stream():
+        alert_data = doc.to_dict()
+        severity = alert_data.get("severity", "unknown")
+        plant = _plant_of(alert_data)
+        summary["unacknowledged"][severity] = summary["unacknowledged"].get(severity, 0) + 1
+        summary["unacknowledged_total"] += 1
+        plant_counts = summary["by_plant"].setdefault(plant, {})
+        plant_counts[severity] = plant_counts.get(severity, 0) + 1
+
+    latest = list(
+        fs_client.collection("alerts")
+        .order_by("timestamp", direction="DESCENDING")
+        .select(["timestamp", "severity", "anomalies"])
+        .limit(1)
+        .stream()
+    )
+    if latest:
+        latest_data = latest[0].to_dict()
+        summary["latest_alert_id"] = latest[0].id
+        summary["latest_alert_time"] = latest_data.get("timestamp")
+        summary["latest_alert_severity"] = latest_data.get("severity")
+        summary["latest_alert_anomaly_count"] = len(latest_data.get("anomalies", []))
+
+    if create_only:
+        try:
+            summary_ref().create(summary)
+        except AlreadyExists:
+            logger.info("Alert summary was seeded concurrently; keeping the existing counters")
+            return summary_ref().get().to_dict()
+    else:
+        summary_ref().set(summary)
+    logger.info(f"Alert summary rebuilt: {summary['unacknowledged_total']} unacknowledged alerts")
+    return summary
+
+
+def ensure_summary():
+    """
+    Seed the counters from the alerts collection if the summary document does
+    not exist yet. Called before any counter increment, so the first alert
+    after deploy can't create the document with only its own +1 and leave
+    alerts that were already open uncounted.
+    """
+    global _seeded
+    if _seeded:
+        return
+    with _seed_lock:
+        if _seeded:
+            return
+        if not summary_ref().get().exists:
+            rebuild_summary(create_only=True)
+        _seeded = True
+
+
+def get_alert_summary() -> dict:
+    """Read the summary document (a single document read)."""
+    ensure_summary()
+    summary = summary_ref().get().to_dict() or {}
+
+    for key in ("latest_alert_time", "updated_at"):
+        if summary.get(key) is not None and hasattr(summary[key], "isoformat"):
+            summary[key] = summary[key].isoformat()
+    return summary
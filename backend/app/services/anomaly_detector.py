@@ -1,9 +1,16 @@
-from google.cloud import bigquery
-from datetime import datetime, timedelta
+from google.cloud import firestore
+from fastapi import HTTPException
+from google.api_core.exceptions import FailedPrecondition
+from datetime import datetime, timedelta, timezone
 from app.routers.config_router import DEFAULT_THRESHOLDS
 from app.services.firestore_service import fs_client
+from app.services.bigquery_service import run_query, latest_state_table
+from app.utils import metrics
+from app.services import alert_index, alert_summary
 from app.services.email_service import send_anomaly_alert_email
 import logging
+import base64
+import json
 
 logger = logging.getLogger(__name__)
 
@@ -96,16 +103,14 @@ def run_scheduled_anomaly_detection():
         logger.info("Starting scheduled anomaly detection...")
         
         # Fetch latest state from BigQuery
-        bq_client = bigquery.Client()
-        query = """
+        query = f"""
             SELECT *
-            FROM `xement-ai.xement_ai_dataset.serve_latest`
+            FROM `{latest_state_table()}`
             ORDER BY timestamp DESC
             LIMIT 1
         """
         
-        result = bq_client.query(query).result()
-        rows = list(result)
+        rows = run_query(query, "serve_latest")
         
         if not rows:
             logger.warning("No data found in BigQuery for anomaly detection")
@@ -125,6 +130,7 @@ def run_scheduled_anomaly_detection():
             # Store alert in Firestore
             alert_data = {
                 "timestamp": datetime.utcnow(),
+                "plant_id": latest_state.get("plant_id"),
                 "severity": anomaly_result["severity"],
                 "anomalies": anomaly_result["anomalies"],
                 "critical_anomalies": anomaly_result["critical_anomalies"],
@@ -134,9 +140,9 @@ def run_scheduled_anomaly_detection():
                 "acknowledged": False
             }
             
-            # Save to Firestore
-            alert_ref = fs_client.collection("alerts").add(alert_data)
-            logger.info(f"Alert saved to Firestore: {alert_ref[1].id}")
+            # Save to Firestore together with the summary counters
+            alert_id = record_alert(alert_data)
+            logger.info(f"Alert saved to Firestore: {alert_id}")
             
             # Send email notifications
             send_anomaly_alert_email(
@@ -150,7 +156,7 @@ def run_scheduled_anomaly_detection():
                 "anomaly_detected": True,
                 "severity": anomaly_result["severity"],
                 "anomalies": anomaly_result["anomalies"],
-                "alert_id": alert_ref[1].id
+                "alert_id": alert_id
             }
         else:
             logger.info("No anomalies detected in scheduled check")
@@ -165,40 +171,281 @@ def run_scheduled_anomaly_detection():
         return {"success": False, "error": str(e)}
 
 
-def get_recent_alerts(limit: int = 50, severity: str = None):
-    """Fetch recent alerts from Firestore."""
+def record_alert(alert_data: dict) -> str:
+    """Write a new alert and bump the summary counters in one atomic batch."""
+    alert_summary.ensure_summary()
+    alert_ref = fs_client.collection("alerts").document()
+    batch = fs_client.batch()
+    batch.set(alert_ref, alert_data)
+    batch.set(
+        alert_summary.summary_ref(),
+        alert_summary.new_alert_changes(alert_ref.id, alert_data),
+        merge=True
+    )
+    with metrics.timed("firestore", "alerts.record"):
+        batch.commit()
+    alert_index.upsert(alert_ref.id, alert_data)
+    return alert_ref.id
+
+
+ALERT_LIST_FIELDS = [
+    "timestamp",
+    "severity",
+    "anomalies",
+    "critical_anomalies",
+    "warning_anomalies",
+    "plant_id",
+    "plant_state.plant_id",
+    "notified",
+    "acknowledged",
+    "acknowledged_by",
+    "acknowledged_at",
+]
+
+
+def _serialize_alert(doc_id: str, alert_data: dict) -> dict:
+    alert_data["id"] = doc_id
+    for key in ("timestamp", "acknowledged_at"):
+        if alert_data.get(key) is not None and hasattr(alert_data[key], "isoformat"):
+            alert_data[key] = alert_data[key].isoformat()
+    return alert_data
+
+
+def _to_list_item(doc_id: str, alert_data: dict) -> dict:
+    item = {key: alert_data[key] for key in ALERT_LIST_FIELDS if key in alert_data}
+    if not item.get("plant_id"):
+        item["plant_id"] = (alert_data.get("plant_state") or {}).get("plant_id")
+    return _serialize_alert(doc_id, item)
+
+
+def encode_alert_cursor(timestamp: str, alert_id: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([timestamp, alert_id]).encode("utf-8")).decode("ascii")
+
+
+def decode_alert_cursor(cursor: str):
+    """(timestamp, alert id) from a `next_cursor`; raises HTTPException 400 if malformed."""
     try:
-        query = fs_client.collection("alerts").order_by("timestamp", direction="DESCENDING").limit(limit)
-        
-        if severity:
-            query = query.where("severity", "==", severity)
-        
-        alerts = []
-        for doc in query.stream():
-            alert_data = doc.to_dict()
-            alert_data["id"] = doc.id
-            # Convert timestamp to ISO string
-            if "timestamp" in alert_data:
-                alert_data["timestamp"] = alert_data["timestamp"].isoformat()
-            alerts.append(alert_data)
-        
-        return alerts
-    
+        timestamp, alert_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        timestamp = datetime.fromisoformat(timestamp)
+        if not isinstance(alert_id, str) or not alert_id:
+            raise ValueError("missing alert id")
+    except (ValueError, TypeError, UnicodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp, alert_id
+
+
+def get_recent_alerts(limit: int = 50, severity: str = None, cursor: str = None):
+    """
+    Fetch one page of recent alerts, newest first.
+
+    Served from the in-memory alert index when it covers the page, otherwise
+    from Firestore. Only the summary fields in ALERT_LIST_FIELDS are
+    returned; the embedded plant_state snapshot is left out (use get_alert
+    for the full document). `cursor` is the `next_cursor` returned by the
+    previous page: the timestamp and id of its last alert, passed to
+    Firestore's start_after so alerts sharing a timestamp are not skipped.
+    Filtering by severity needs the (severity, timestamp DESC) composite
+    index. A malformed cursor raises HTTPException 400.
+    """
+    after = decode_alert_cursor(cursor) if cursor else None
+    try:
+        indexed = alert_index.recent(limit, severity=severity, after=after)
+        metrics.cache_result("alert_index", indexed is not None)
+        if indexed is not None:
+            alerts = [_to_list_item(alert_id, alert_data) for alert_id, alert_data in indexed]
+        else:
+            query = fs_client.collection("alerts")
+            if severity:
+                query = query.where("severity", "==", severity)
+            query = query.order_by("timestamp", direction="DESCENDING").order_by("__name__", direction="DESCENDING")
+            if after:
+                query = query.start_after({
+                    "timestamp": after[0],
+                    "__name__": fs_client.collection("alerts").document(after[1]),
+                })
+            query = query.select(ALERT_LIST_FIELDS).limit(limit)
+            with metrics.timed("firestore", "alerts.list"):
+                alerts = [_to_list_item(doc.id, doc.to_dict()) for doc in query.stream()]
+
+        next_cursor = encode_alert_cursor(alerts[-1]["timestamp"], alerts[-1]["id"]) if len(alerts) == limit else None
+        return {"alerts": alerts, "next_cursor": next_cursor}
+
     except Exception as e:
         logger.error(f"Error fetching alerts: {str(e)}")
-        return []
+        return {"alerts": [], "next_cursor": None}
+
+
+def get_alert(alert_id: str):
+    """Fetch a single alert including its full plant_state snapshot."""
+    alert_data = alert_index.get(alert_id)
+    if alert_data is not None:
+        return _serialize_alert(alert_id, alert_data)
+    doc = fs_client.collection("alerts").document(alert_id).get()
+    if not doc.exists:
+        return None
+    return _serialize_alert(doc.id, doc.to_dict())
+
+
+@firestore.transactional
+def _acknowledge_in_transaction(transaction, alert_ref, acknowledged_by: str) -> bool:
+    snapshot = alert_ref.get(
+        field_paths=["acknowledged", "severity", "plant_id", "plant_state.plant_id"],
+        transaction=transaction
+    )
+    if not snapshot.exists:
+        raise ValueError(f"Alert {alert_ref.id} not found")
+    alert_data = snapshot.to_dict()
+    if alert_data.get("acknowledged"):
+        # Keep the original acknowledger and time
+        return False
+
+    transaction.update(alert_ref, {
+        "acknowledged": True,
+        "acknowledged_by": acknowledged_by,
+        "acknowledged_at": datetime.utcnow()
+    })
+    transaction.set(
+        alert_summary.summary_ref(),
+        alert_summary.acknowledged_changes([alert_data]),
+        merge=True
+    )
+    return True
 
 
 def acknowledge_alert(alert_id: str, acknowledged_by: str):
-    """Mark an alert as acknowledged."""
+    """Mark an alert as acknowledged and decrement the summary counters."""
     try:
+        alert_summary.ensure_summary()
         alert_ref = fs_client.collection("alerts").document(alert_id)
-        alert_ref.update({
-            "acknowledged": True,
-            "acknowledged_by": acknowledged_by,
-            "acknowledged_at": datetime.utcnow()
-        })
+        if not _acknowledge_in_transaction(fs_client.transaction(), alert_ref, acknowledged_by):
+            return {"success": True, "message": "Alert already acknowledged"}
+        alert_index.mark_acknowledged([alert_id], acknowledged_by, datetime.utcnow())
         return {"success": True, "message": "Alert acknowledged"}
     except Exception as e:
         logger.error(f"Error acknowledging alert: {str(e)}")
         return {"success": False, "error": str(e)}
+
+
+BULK_WRITE_BATCH_SIZE = 500
+BULK_ACK_MAX_ATTEMPTS = 3
+_ACK_FIELDS = ["acknowledged", "severity", "plant_id", "plant_state.plant_id"]
+
+
+def _commit_acknowledge_chunk(snapshots: list, acknowledged_by: str):
+    """
+    Acknowledge a chunk of open alerts in one batched write, including the
+    summary counter update. Each alert write is conditioned on its
+    update_time, so an alert changed since it was read fails the batch
+    instead of being counted twice.
+    """
+    batch = fs_client.batch()
+    now = datetime.utcnow()
+    for snapshot in snapshots:
+        batch.update(
+            snapshot.reference,
+            {
+                "acknowledged": True,
+                "acknowledged_by": acknowledged_by,
+                "acknowledged_at": now
+            },
+            option=fs_client.write_option(last_update_time=snapshot.update_time)
+        )
+    batch.set(
+        alert_summary.summary_ref(),
+        alert_summary.acknowledged_changes([snapshot.to_dict() for snapshot in snapshots]),
+        merge=True
+    )
+    batch.commit()
+
+
+def _acknowledge_snapshots(snapshots: list, acknowledged_by: str, results: dict):
+    # One write per batch is reserved for the summary document
+    chunk_size = BULK_WRITE_BATCH_SIZE - 1
+    for i in range(0, len(snapshots), chunk_size):
+        chunk = snapshots[i:i + chunk_size]
+        for attempt in range(1, BULK_ACK_MAX_ATTEMPTS + 1):
+            open_alerts = []
+            for snapshot in chunk:
+                if not snapshot.exists:
+                    results[snapshot.id] = "not_found"
+                elif snapshot.to_dict().get("acknowledged"):
+                    results[snapshot.id] = "already_acknowledged"
+                else:
+                    open_alerts.append(snapshot)
+            if not open_alerts:
+                break
+            try:
+                _commit_acknowledge_chunk(open_alerts, acknowledged_by)
+                alert_index.mark_acknowledged([s.id for s in open_alerts], acknowledged_by, datetime.utcnow())
+                for snapshot in open_alerts:
+                    results[snapshot.id] = "acknowledged"
+                break
+            except FailedPrecondition:
+                if attempt == BULK_ACK_MAX_ATTEMPTS:
+                    for snapshot in open_alerts:
+                        results[snapshot.id] = "conflict"
+                    break
+                logger.info(f"Alerts changed during bulk acknowledge, re-reading chunk (attempt {attempt})")
+                chunk = list(fs_client.get_all([s.reference for s in chunk], field_paths=_ACK_FIELDS))
+
+
+def bulk_acknowledge_alerts(
+    acknowledged_by: str,
+    alert_ids: list = None,
+    plant_id: str = None,
+    severity: str = None,
+    before: datetime = None
+):
+    """
+    Acknowledge many alerts with batched writes of up to BULK_WRITE_BATCH_SIZE.
+
+    Alerts are selected either by `alert_ids` or, when no ids are given, by
+    an open-alert filter on plant_id, severity and timestamp < before.
+    Returns a status per alert id: acknowledged, already_acknowledged,
+    not_found or conflict.
+    """
+    try:
+        alert_summary.ensure_summary()
+        results = {}
+        if alert_ids:
+            alert_ids = list(dict.fromkeys(alert_ids))
+            collection = fs_client.collection("alerts")
+            for i in range(0, len(alert_ids), BULK_WRITE_BATCH_SIZE):
+                refs = [collection.document(alert_id) for alert_id in alert_ids[i:i + BULK_WRITE_BATCH_SIZE]]
+                snapshots = list(fs_client.get_all(refs, field_paths=_ACK_FIELDS))
+                _acknowledge_snapshots(snapshots, acknowledged_by, results)
+        else:
+            # Alerts written before plant_id was stored at the top level only
+            # carry it inside the plant_state snapshot, so match on both
+            plant_fields = ["plant_id", "plant_state.plant_id"] if plant_id else [None]
+            snapshots = {}
+            for plant_field in plant_fields:
+                query = fs_client.collection("alerts").where("acknowledged", "==", False)
+                if plant_field:
+                    query = query.where(plant_field, "==", plant_id)
+                if severity:
+                    query = query.where("severity", "==", severity)
+                if before:
+                    query = query.where("timestamp", "<", before)
+                for snapshot in query.select(_ACK_FIELDS).stream():
+                    snapshots[snapshot.id] = snapshot
+            _acknowledge_snapshots(list(snapshots.values()), acknowledged_by, results)
+
+        counts = {}
+        for status in results.values():
+            counts[status] = counts.get(status, 0) + 1
+        logger.info(f"Bulk acknowledge by {acknowledged_by}: {counts}")
+
+        return {
+            "success": True,
+            "acknowledged": counts.get("acknowledged", 0),
+            "already_acknowledged": counts.get("already_acknowledged", 0),
+            "not_found": counts.get("not_found", 0),
+            "conflict": counts.get("conflict", 0),
+            "results": results
+        }
+    except Exception as e:
+        logger.error(f"Error bulk acknowledging alerts: {str(e)}")
+        return {"success": False, "error": str(e)}
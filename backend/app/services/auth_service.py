@@ -1,9 +1,26 @@
+import asyncio
+import logging
 from fastapi import HTTPException, status
-from app.utils.security import hash_password, verify_password
+from fastapi.concurrency import run_in_threadpool
+from app.utils.security import (
+    hash_password, verify_password_async, hash_password_async, needs_rehash, PasswordHasherBusy
+)
 from app.services.firestore_service import get_user_by_email, create_auth_token, fs_client
+from app.services import session_tokens
 from app.models.user_model import UserSignup, UserLogin
 from datetime import datetime, timezone
 
+logger = logging.getLogger(__name__)
+
+# Strong references to fire-and-forget hash upgrades so they aren't garbage collected mid-run
+_background_tasks = set()
+
+def issue_session_token(user_id, email, role):
+    """Signed token when a signing secret is configured, otherwise an opaque auth_tokens entry."""
+    if session_tokens.signing_enabled():
+        return session_tokens.issue_token(user_id, email, role)
+    return create_auth_token(user_id, email, role)
+
 def signup_user(user_data: UserSignup):
     existing = get_user_by_email(user_data.email)
     if existing:
@@ -12,7 +29,12 @@ def signup_user(user_data: UserSignup):
     if user_data.role not in ["admin", "operator"]:
         raise HTTPException(status_code=400, detail="Invalid role")
 
-    hashed_pw = hash_password(user_data.password)
+    try:
+        hashed_pw = hash_password(user_data.password)
+    except PasswordHasherBusy as e:
+        logger.warning(f"Rejecting signup for {user_data.email}: {e}")
+        raise HTTPException(status_code=503, detail="Too many requests in progress, retry shortly",
+                            headers={"Retry-After": "1"})
     user_doc = {
         "email": user_data.email,
         "password": hashed_pw,
@@ -21,19 +43,39 @@ def signup_user(user_data: UserSignup):
         "role": user_data.role,
         "created_at": datetime.now(timezone.utc),
         "is_active": True,
+        "email_lower": user_data.email.lower(),
+        "full_name_lower": user_data.full_name.lower(),
     }
     doc_ref = fs_client.collection("users").add(user_doc)
     user_id = doc_ref[1].id
-    token = create_auth_token(user_id, user_data.email, user_data.role)
+    token = issue_session_token(user_id, user_data.email, user_data.role)
     return {"token": token, "user": {**user_data.dict(), "id": user_id}}
 
-def login_user(credentials: UserLogin):
-    user = get_user_by_email(credentials.email)
+async def _upgrade_password_hash(user_id: str, password: str):
+    """Re-hash with the current work factor after a successful login."""
+    try:
+        new_hash = await hash_password_async(password)
+        await run_in_threadpool(fs_client.collection("users").document(user_id).update, {"password": new_hash})
+        logger.info(f"Upgraded password hash for user {user_id}")
+    except Exception as e:
+        # The old hash still verifies; try again on the next login
+        logger.warning(f"Could not upgrade password hash for user {user_id}: {e}")
+
+async def login_user(credentials: UserLogin):
+    # Firestore calls run on the threadpool and bcrypt in the hashing process pool,
+    # so a burst of logins never blocks the event loop
+    user = await run_in_threadpool(get_user_by_email, credentials.email)
     
     if not user:
         raise HTTPException(status_code=401, detail=f"User not found: {credentials.email}")
     
-    password_valid = verify_password(credentials.password, user.get("password", ""))
+    stored_hash = user.get("password", "")
+    try:
+        password_valid = await verify_password_async(credentials.password, stored_hash)
+    except PasswordHasherBusy as e:
+        logger.warning(f"Rejecting login for {credentials.email}: {e}")
+        raise HTTPException(status_code=503, detail="Too many logins in progress, retry shortly",
+                            headers={"Retry-After": "1"})
     if not password_valid:
         raise HTTPException(status_code=401, detail="Invalid password")
 
@@ -49,5 +91,10 @@ def login_user(credentials: UserLogin):
         else:
             raise HTTPException(status_code=403, detail=f"Invalid role selection. Your account type is: {user_role}")
 
-    token = create_auth_token(user["id"], user["email"], user["role"])
+    token = await run_in_threadpool(issue_session_token, user["id"], user["email"], user["role"])
+    if needs_rehash(stored_hash):
+        # Off the response path: the login doesn't wait for a second full hash
+        task = asyncio.create_task(_upgrade_password_hash(user["id"], credentials.password))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
     return {"token": token, "user": {k: user[k] for k in ["id", "email", "full_name", "organization", "role"]}}
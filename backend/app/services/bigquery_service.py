@@ -0,0 +1,175 @@
+"""
+Single entry point for BigQuery queries.
+
+Every query goes through `run_query` with a short operation name (e.g.
+"latest_state", "history"). Besides latency, each finished job's bytes
+processed and billed, slot time and cache hit are recorded per operation
+and router, so /metrics shows which endpoints drive the BigQuery bill.
+
+With BIGQUERY_MAX_BYTES set, queries are dry-run first (estimates are
+cached per query text and parameters) and any query over the budget is
+either rejected (BIGQUERY_GUARD_MODE=reject, the default) or, in
+"downgrade" mode, replaced by the caller's cheaper `fallback` query when
+one is given. The real job also carries maximum_bytes_billed, so
+BigQuery itself refuses anything the estimate missed.
+"""
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from fastapi import HTTPException
+from google.api_core.exceptions import NotFound
+from google.cloud import bigquery
+from app.utils import metrics
+from app.utils.providers import bigquery_client
+
+logger = logging.getLogger("xement-ai")
+
+BIGQUERY_MAX_BYTES = int(os.getenv("BIGQUERY_MAX_BYTES", "0"))  # 0 = no guard
+BIGQUERY_GUARD_MODE = os.getenv("BIGQUERY_GUARD_MODE", "reject").lower()
+DRY_RUN_CACHE_SIZE = 256
+MIN_BILLED_BYTES = 10 * 1024 * 1024
+# One row per plant, kept current by the simulator's per-batch MERGE
+LATEST_STATE_TABLE = os.getenv("LATEST_STATE_TABLE", "xement-ai.xement_ai_dataset.plant_latest_state")
+# Read instead until the simulator has created LATEST_STATE_TABLE
+LEGACY_LATEST_TABLE = os.getenv("LEGACY_LATEST_TABLE", "xement-ai.xement_ai_dataset.serve_latest")
+LATEST_TABLE_RECHECK_SECONDS = int(os.getenv("LATEST_TABLE_RECHECK_SECONDS", "300"))
+
+bytes_processed = metrics.register(metrics.Counter(
+    "xement_bigquery_bytes_processed_total", "Bytes processed by BigQuery queries",
+    labels=("operation", "router"),
+))
+bytes_billed = metrics.register(metrics.Counter(
+    "xement_bigquery_bytes_billed_total", "Bytes billed for BigQuery queries",
+    labels=("operation", "router"),
+))
+slot_seconds = metrics.register(metrics.Counter(
+    "xement_bigquery_slot_seconds_total", "Slot time consumed by BigQuery queries",
+    labels=("operation", "router"),
+))
+queries = metrics.register(metrics.Counter(
+    "xement_bigquery_queries_total", "BigQuery queries by result cache outcome",
+    labels=("operation", "router", "cache_hit"),
+))
+guarded = metrics.register(metrics.Counter(
+    "xement_bigquery_guarded_total", "Queries over the byte budget, by action taken",
+    labels=("operation", "action"),
+))
+
+_dry_run_lock = threading.Lock()
+_dry_run_estimates = OrderedDict()
+
+_latest_table_lock = threading.Lock()
+_latest_table_exists = False
+_latest_table_checked = None  # monotonic time of the last failed existence check
+
+
+def _params_key(job_config) -> tuple:
+    if job_config is None or not job_config.query_parameters:
+        return ()
+    return tuple(repr(p.to_api_repr()) for p in job_config.query_parameters)
+
+
+def estimate_bytes(query: str, job_config=None) -> int:
+    """Bytes the query would process, from a (cached) dry run."""
+    key = (query, _params_key(job_config))
+    with _dry_run_lock:
+        if key in _dry_run_estimates:
+            _dry_run_estimates.move_to_end(key)
+            return _dry_run_estimates[key]
+
+    dry_config = bigquery.QueryJobConfig(dry_run=True, use_query_cache=False)
+    if job_config is not None and job_config.query_parameters:
+        dry_config.query_parameters = job_config.query_parameters
+    estimate = bigquery_client().query(query, job_config=dry_config).total_bytes_processed or 0
+
+    with _dry_run_lock:
+        _dry_run_estimates[key] = estimate
+        while len(_dry_run_estimates) > DRY_RUN_CACHE_SIZE:
+            _dry_run_estimates.popitem(last=False)
+    return estimate
+
+
+def _guard(query: str, operation: str, job_config, fallback):
+    """Apply the byte budget; returns the (query, job_config) to run."""
+    estimate = estimate_bytes(query, job_config)
+    if estimate <= BIGQUERY_MAX_BYTES:
+        return query, job_config
+    if BIGQUERY_GUARD_MODE == "downgrade" and fallback:
+        logger.warning(f"BigQuery {operation} would scan {estimate} bytes (budget {BIGQUERY_MAX_BYTES}); using fallback query")
+        guarded.inc(operation, "downgraded")
+        return fallback
+    guarded.inc(operation, "rejected")
+    logger.warning(f"BigQuery {operation} rejected: would scan {estimate} bytes (budget {BIGQUERY_MAX_BYTES})")
+    raise HTTPException(
+        status_code=400,
+        detail=f"Query for {operation} would scan {estimate} bytes, over the budget of {BIGQUERY_MAX_BYTES}"
+    )
+
+
+def _record_job(job, operation: str):
+    router = metrics.current_router.get()
+    bytes_processed.inc(operation, router, amount=job.total_bytes_processed or 0)
+    bytes_billed.inc(operation, router, amount=job.total_bytes_billed or 0)
+    slot_seconds.inc(operation, router, amount=(job.slot_millis or 0) / 1000)
+    queries.inc(operation, router, "true" if job.cache_hit else "false")
+
+
+def cache_stats() -> dict:
+    """BigQuery result-cache hit rate per operation since process start."""
+    stats = {}
+    for (operation, _, cache_hit), count in queries.items():
+        entry = stats.setdefault(operation, {"queries": 0, "cache_hits": 0})
+        entry["queries"] += int(count)
+        if cache_hit == "true":
+            entry["cache_hits"] += int(count)
+    for entry in stats.values():
+        entry["hit_rate"] = round(entry["cache_hits"] / entry["queries"], 4) if entry["queries"] else 0.0
+    return stats
+
+
+def latest_state_table() -> str:
+    """
+    LATEST_STATE_TABLE once it exists, LEGACY_LATEST_TABLE before that.
+    A missing table is looked up again every LATEST_TABLE_RECHECK_SECONDS,
+    so readers switch over after the simulator's first run without a restart.
+    """
+    global _latest_table_exists, _latest_table_checked
+    if _latest_table_exists:
+        return LATEST_STATE_TABLE
+    with _latest_table_lock:
+        if _latest_table_exists:
+            return LATEST_STATE_TABLE
+        now = time.monotonic()
+        if _latest_table_checked is not None and now - _latest_table_checked < LATEST_TABLE_RECHECK_SECONDS:
+            return LEGACY_LATEST_TABLE
+        try:
+            bigquery_client().get_table(LATEST_STATE_TABLE)
+            _latest_table_exists = True
+            return LATEST_STATE_TABLE
+        except NotFound:
+            _latest_table_checked = now
+            logger.warning(f"{LATEST_STATE_TABLE} not found, reading {LEGACY_LATEST_TABLE} instead")
+            return LEGACY_LATEST_TABLE
+        except Exception as e:
+            # Not remembered: the next call checks again, and the query itself surfaces real errors
+            logger.warning(f"Could not check {LATEST_STATE_TABLE}: {e}")
+            return LATEST_STATE_TABLE
+
+
+def run_query(query: str, operation: str, job_config=None, fallback: tuple = None) -> list:
+    """
+    Run a query on the shared client and return all rows. `fallback` is an
+    optional cheaper (query, job_config) pair used by the downgrade guard.
+    """
+    with metrics.timed("bigquery", operation):
+        if BIGQUERY_MAX_BYTES:
+            query, job_config = _guard(query, operation, job_config, fallback)
+            job_config = job_config or bigquery.QueryJobConfig()
+            # BigQuery bills at least 10 MB per query, so a lower cap would fail every query
+            job_config.maximum_bytes_billed = job_config.maximum_bytes_billed or max(BIGQUERY_MAX_BYTES, MIN_BILLED_BYTES)
+        job = bigquery_client().query(query, job_config=job_config)
+        rows = list(job.result())
+    _record_job(job, operation)
+    return rows
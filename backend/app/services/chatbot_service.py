@@ -1,20 +1,22 @@
-import google.generativeai as genai
 import os
+import asyncio
+import threading
+import time
 from datetime import datetime
-from google.cloud import bigquery
 import logging
+from app.services.context_service import get_shared_context, PROJECT_ID, DATASET_ID, TABLE_ID
+from app.services.prompt_builder import build_prompt, remember_turn, reset_conversation, has_history
+from app.services import intent_router, response_cache
+from app.utils import providers
+from app.utils.resilience import gemini_chat
 
 logger = logging.getLogger("xement-ai")
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
 
-# BigQuery client
-bq_client = bigquery.Client()
-PROJECT_ID = os.getenv("GCP_PROJECT_ID", "xement-ai")
-DATASET_ID = "xement_ai_dataset"
-TABLE_ID = "serve_latest"
+CHAT_MODEL_NAME = "gemini-2.5-flash"
+_chat_model = None
+_chat_model_lock = threading.Lock()
 
 # System prompt for XementAI Assistant
 SYSTEM_PROMPT = """You are XementAI Assistant, an expert AI-powered assistant for cement plant operations at XementAI.
@@ -50,118 +52,26 @@ You will receive current plant data, recent anomalies, and user role information
 Use this context to provide accurate, grounded responses.
 """
 
-def get_plant_context():
-    """Fetch latest plant data from BigQuery for context"""
-    try:
-        full_table = f"{PROJECT_ID}.{DATASET_ID}.{TABLE_ID}"
-        logger.info(f"Fetching plant context from BigQuery: {full_table}")
-        
-        query = f"""
-        SELECT 
-            timestamp,
-            energy_use,
-            emissions_CO2,
-            grinding_efficiency,
-            product_quality_index,
-            kiln_temp,
-            fan_speed,
-            feed_rate
-        FROM `{full_table}`
-        ORDER BY timestamp DESC
-        LIMIT 1
-        """
-        
-        query_job = bq_client.query(query)
-        results = list(query_job.result())
-        logger.info(f"BigQuery returned {len(results)} rows")
-        
-        if results:
-            row = results[0]
-            plant_data = {
-                "timestamp": row.timestamp.isoformat() if row.timestamp else None,
-                "energy_use": float(row.energy_use) if row.energy_use else None,
-                "emissions_CO2": float(row.emissions_CO2) if row.emissions_CO2 else None,
-                "grinding_efficiency": float(row.grinding_efficiency) if row.grinding_efficiency else None,
-                "product_quality": float(row.product_quality_index) if row.product_quality_index else None,
-                "kiln_temp": float(row.kiln_temp) if row.kiln_temp else None,
-                "fan_speed": float(row.fan_speed) if row.fan_speed else None,
-                "feed_rate": float(row.feed_rate) if row.feed_rate else None
-            }
-            logger.info(f"Successfully fetched plant data: {plant_data}")
-            return plant_data
-        else:
-            logger.warning("No results returned from BigQuery")
-            return None
-    except Exception as e:
-        logger.error(f"Error fetching plant context: {str(e)}", exc_info=True)
-        return None
+RESPONSE_INSTRUCTIONS = """1. **BE CONCISE**: Keep your response to 2-3 short paragraphs or a brief bulleted list
+2. **LEAD WITH THE ANSWER**: Start with the direct answer, then add supporting details only if essential
+3. **USE ACTUAL DATA**: Always cite specific numbers from the plant status when answering
+4. **NO FLUFF**: Avoid introductory phrases like "Understood!" or "Great question!" - just answer
+5. **BULLET POINTS**: Use bullets for lists, not long paragraphs
+6. **ACTIONABLE**: If suggesting actions, be specific and brief
+7. **SKIP OBVIOUS**: Don't explain basic concepts unless asked
+8. **OFF-TOPIC QUESTIONS**: If asked about something unrelated to cement plant operations (like playing songs, weather, jokes, etc.), respond with ONLY: "I am XementAI Assistant, an expert AI for cement plant operations. I can only help with plant monitoring, KPIs, anomalies, optimization, and simulations."
 
-async def get_recent_anomalies():
-    """Fetch recent anomalies from Firestore"""
-    try:
-        from app.services.firestore_service import fs_client
-        
-        alerts_ref = fs_client.collection("alerts")
-        query = alerts_ref.where("acknowledged", "==", False).limit(10)
-        docs = query.stream()
-        
-        anomalies = []
-        for doc in docs:
-            data = doc.to_dict()
-            anomalies.append({
-                "severity": data.get("severity"),
-                "anomalies": data.get("anomalies", []),
-                "timestamp": data.get("timestamp")
-            })
-        
-        anomalies.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
-        return anomalies[:5]  # Return top 5
-    except Exception as e:
-        logger.error(f"Error fetching anomalies: {str(e)}")
-        return []
+Examples of good responses:
+- "Current energy use is 163.57 kWh/ton. To reduce it: decrease kiln temp by 10°C or increase fan speed to 90%."
+- "Simulating 30% alt fuel would reduce CO2 by ~15-20% and energy cost by 10-12%. Run /simulate_fuel for exact numbers."
+- "2 critical alerts: high energy (163.57 > 160) and low quality (76.69 < 80). Check kiln temp and feed rate."
+- For off-topic: "I am XementAI Assistant, an expert AI for cement plant operations. I can only help with plant monitoring, KPIs, anomalies, optimization, and simulations."
+"""
 
-def build_context_string(plant_data, anomalies):
-    """Build comprehensive context string for Gemini"""
-    context_parts = []
-    
-    if plant_data:
-        context_parts.append("=== CURRENT PLANT STATUS ===")
-        context_parts.append(f"Timestamp: {plant_data.get('timestamp', 'N/A')}")
-        context_parts.append("")
-        context_parts.append("**Key Performance Indicators:**")
-        context_parts.append(f"• Energy Use: {plant_data.get('energy_use', 'N/A')} kWh/ton")
-        context_parts.append(f"• CO2 Emissions: {plant_data.get('emissions_CO2', 'N/A')} kg/ton")
-        context_parts.append(f"• Grinding Efficiency: {plant_data.get('grinding_efficiency', 'N/A')}%")
-        context_parts.append(f"• Product Quality Index: {plant_data.get('product_quality', 'N/A')}")
-        context_parts.append("")
-        context_parts.append("**Operational Parameters:**")
-        context_parts.append(f"• Kiln Temperature: {plant_data.get('kiln_temp', 'N/A')}°C")
-        context_parts.append(f"• Fan Speed: {plant_data.get('fan_speed', 'N/A')}%")
-        context_parts.append(f"• Feed Rate: {plant_data.get('feed_rate', 'N/A')} tons/hr")
-        context_parts.append("")
-    
-    if anomalies:
-        context_parts.append("=== RECENT ANOMALIES & ALERTS ===")
-        for i, anomaly in enumerate(anomalies[:5], 1):
-            severity = anomaly.get('severity', 'unknown')
-            anomaly_list = anomaly.get('anomalies', [])
-            timestamp = anomaly.get('timestamp', 'N/A')
-            context_parts.append(f"{i}. [{severity.upper()}] {', '.join(anomaly_list)}")
-            context_parts.append(f"   Time: {timestamp}")
-        context_parts.append("")
-    else:
-        context_parts.append("=== RECENT ANOMALIES & ALERTS ===")
-        context_parts.append("✅ No recent anomalies detected. Plant operating normally.")
-        context_parts.append("")
-    
-    context_parts.append("=== AVAILABLE ACTIONS ===")
-    context_parts.append("• View detailed KPI trends and historical data")
-    context_parts.append("• Run fuel simulation scenarios (alternative fuel impact)")
-    context_parts.append("• Get AI-powered optimization recommendations")
-    context_parts.append("• Analyze anomaly root causes and solutions")
-    context_parts.append("• Compare performance across shifts and time periods")
-    
-    return "\n".join(context_parts)
+# Static part of every prompt, sent as the model's system instruction so it forms a stable cached prefix
+STATIC_PROMPT_PREFIX = f"""{SYSTEM_PROMPT}
+=== INSTRUCTIONS ===
+{RESPONSE_INSTRUCTIONS}"""
 
 def generate_fallback_response(message: str, plant_data: dict, anomalies: list):
     """Generate a helpful fallback response without AI when Gemini is not configured"""
@@ -242,48 +152,77 @@ The AI will analyze your plant's performance and suggest actionable improvements
 
 You can also navigate to specific pages in the dashboard for detailed analysis."""
 
+def get_chat_model():
+    """Create the Gemini model client once per process and reuse it."""
+    global _chat_model
+    if _chat_model is None:
+        with _chat_model_lock:
+            if _chat_model is None:
+                genai = providers.get("genai")
+                _chat_model = genai.GenerativeModel(
+                    CHAT_MODEL_NAME,
+                    system_instruction=STATIC_PROMPT_PREFIX
+                )
+    return _chat_model
+
 async def process_chat_message(message: str, user_id: str, user_name: str, context: dict = None):
     """Process chat message with Gemini AI"""
+    started = time.perf_counter()
     try:
         logger.info(f"Processing chat message: {message}")
-        plant_data = get_plant_context() 
-        logger.info(f"Plant data fetched: {plant_data is not None}")
+        shared_context = await asyncio.to_thread(get_shared_context)
+        plant_data = shared_context["plant_data"]
+        anomalies = shared_context["anomalies"]
+        context_string = shared_context["context_string"]
+        logger.info(f"Using plant context version {shared_context['version']}")
         
-        anomalies = await get_recent_anomalies()
-        logger.info(f"Anomalies fetched: {len(anomalies) if anomalies else 0}")
+        context = context or {}
+        conversation_id = context.get("conversation_id")
+        if context.get("reset_memory"):
+            reset_conversation(user_id, conversation_id)
         
-        context_string = build_context_string(plant_data, anomalies)
+        intent, local_response = intent_router.answer_locally(message, plant_data, anomalies)
+        if local_response is not None:
+            logger.info(f"Answered locally for intent: {intent}")
+            remember_turn(user_id, message, local_response, conversation_id)
+            intent_router.record_outcome("local", time.perf_counter() - started)
+            return {
+                "response": local_response,
+                "model": "local",
+                "context_used": True,
+                "timestamp": datetime.utcnow().isoformat()
+            }
         
-        full_prompt = f"""{SYSTEM_PROMPT}
-
-{context_string}
-
-=== USER QUERY ===
-{message}
-
-=== INSTRUCTIONS ===
-1. **BE CONCISE**: Keep your response to 2-3 short paragraphs or a brief bulleted list
-2. **LEAD WITH THE ANSWER**: Start with the direct answer, then add supporting details only if essential
-3. **USE ACTUAL DATA**: Always cite specific numbers from the plant status when answering
-4. **NO FLUFF**: Avoid introductory phrases like "Understood!" or "Great question!" - just answer
-5. **BULLET POINTS**: Use bullets for lists, not long paragraphs
-6. **ACTIONABLE**: If suggesting actions, be specific and brief
-7. **SKIP OBVIOUS**: Don't explain basic concepts unless asked
-8. **OFF-TOPIC QUESTIONS**: If asked about something unrelated to cement plant operations (like playing songs, weather, jokes, etc.), respond with ONLY: "I am XementAI Assistant, an expert AI for cement plant operations. I can only help with plant monitoring, KPIs, anomalies, optimization, and simulations."
-
-Examples of good responses:
-- "Current energy use is 163.57 kWh/ton. To reduce it: decrease kiln temp by 10°C or increase fan speed to 90%."
-- "Simulating 30% alt fuel would reduce CO2 by ~15-20% and energy cost by 10-12%. Run /simulate_fuel for exact numbers."
-- "2 critical alerts: high energy (163.57 > 160) and low quality (76.69 < 80). Check kiln temp and feed rate."
-- For off-topic: "I am XementAI Assistant, an expert AI for cement plant operations. I can only help with plant monitoring, KPIs, anomalies, optimization, and simulations."
-
-Respond now:
-"""
+        # Follow-ups are answered with this user's memory in the prompt, so they
+        # neither read nor fill the cross-user response cache
+        shareable = not has_history(user_id, conversation_id)
+        cached_response = response_cache.lookup(message, shared_context["version"]) if shareable else None
+        if cached_response is not None:
+            logger.info("Serving chat response from cache")
+            remember_turn(user_id, message, cached_response, conversation_id)
+            intent_router.record_outcome("cache", time.perf_counter() - started)
+            return {
+                "response": cached_response,
+                "model": "gemini-cache",
+                "context_used": bool(plant_data or anomalies),
+                "timestamp": datetime.utcnow().isoformat()
+            }
+        
+        prompt, prompt_sections = build_prompt(
+            static_prefix=STATIC_PROMPT_PREFIX,
+            context_string=context_string,
+            message=message,
+            user_id=user_id,
+            conversation_id=conversation_id
+        )
+        logger.info(f"Prompt token estimate by section: {prompt_sections}")
         
         logger.info(f"GEMINI_API_KEY configured: {bool(GEMINI_API_KEY)}")
         if not GEMINI_API_KEY:
             logger.warning("GEMINI_API_KEY not configured - using fallback")
             fallback_response = generate_fallback_response(message, plant_data, anomalies)
+            remember_turn(user_id, message, fallback_response, conversation_id)
+            intent_router.record_outcome("fallback", time.perf_counter() - started)
             return {
                 "response": fallback_response,
                 "model": "fallback",
@@ -293,20 +232,26 @@ Respond now:
         
         try:
             logger.info("Calling Gemini API...")
-            model = genai.GenerativeModel('gemini-2.5-flash')
-            response = model.generate_content(full_prompt)
+            model = get_chat_model()
+            response = await gemini_chat.call_async(model.generate_content_async, prompt)
             
             logger.info(f"Gemini response received: {len(response.text)} characters")
+            remember_turn(user_id, message, response.text, conversation_id)
+            if shareable:
+                response_cache.store(message, shared_context["version"], response.text)
+            intent_router.record_outcome("gemini", time.perf_counter() - started)
             
             return {
                 "response": response.text,
                 "model": "gemini-pro",
                 "context_used": bool(plant_data or anomalies),
-                "timestamp": datetime.utcnow().isoformat()
+                "timestamp": datetime.utcnow().isoformat(),
+                "prompt_tokens": prompt_sections
             }
         except Exception as gemini_error:
             logger.error(f"Gemini API error: {str(gemini_error)}", exc_info=True)
             fallback_response = generate_fallback_response(message, plant_data, anomalies)
+            intent_router.record_outcome("fallback", time.perf_counter() - started)
             return {
                 "response": fallback_response,
                 "model": "fallback-error",
@@ -0,0 +1,187 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+from app.services import alert_index
+from app.services.firestore_service import fs_client
+from app.utils import metrics
+from app.services.bigquery_service import run_query, latest_state_table, LATEST_STATE_TABLE
+
+logger = logging.getLogger("xement-ai")
+
+PROJECT_ID, DATASET_ID, TABLE_ID = LATEST_STATE_TABLE.split(".")
+
+# Plant data lands in 5-minute ingest batches, so the context is rebuilt at most once per window
+PLANT_CONTEXT_TTL_SECONDS = int(os.getenv("PLANT_CONTEXT_TTL_SECONDS", "300"))
+# Newest open alerts included in the context
+CONTEXT_ALERT_LIMIT = 5
+
+_context_lock = threading.Lock()
+_shared_context = None
+
+def get_plant_context():
+    """Fetch latest plant data from BigQuery for context"""
+    try:
+        table = latest_state_table()
+        logger.info(f"Fetching plant context from BigQuery: {table}")
+        
+        query = f"""
+        SELECT 
+            timestamp,
+            energy_use,
+            emissions_CO2,
+            grinding_efficiency,
+            product_quality_index,
+            kiln_temp,
+            fan_speed,
+            feed_rate
+        FROM `{table}`
+        ORDER BY timestamp DESC
+        LIMIT 1
+        """
+        
+        results = run_query(query, "plant_context")
+        logger.info(f"BigQuery returned {len(results)} rows")
+        
+        if results:
+            row = results[0]
+            plant_data = {
+                "timestamp": row.timestamp.isoformat() if row.timestamp else None,
+                "energy_use": float(row.energy_use) if row.energy_use else None,
+                "emissions_CO2": float(row.emissions_CO2) if row.emissions_CO2 else None,
+                "grinding_efficiency": float(row.grinding_efficiency) if row.grinding_efficiency else None,
+                "product_quality": float(row.product_quality_index) if row.product_quality_index else None,
+                "kiln_temp": float(row.kiln_temp) if row.kiln_temp else None,
+                "fan_speed": float(row.fan_speed) if row.fan_speed else None,
+                "feed_rate": float(row.feed_rate) if row.feed_rate else None
+            }
+            logger.info(f"Successfully fetched plant data: {plant_data}")
+            return plant_data
+        else:
+            logger.warning("No results returned from BigQuery")
+            return None
+    except Exception as e:
+        logger.error(f"Error fetching plant context: {str(e)}", exc_info=True)
+        return None
+
+def get_recent_anomalies():
+    """Fetch the newest unacknowledged alerts, from the in-memory alert index when available"""
+    try:
+        open_items = alert_index.open_alerts(limit=CONTEXT_ALERT_LIMIT, order="time")
+        if open_items is None:
+            query = (
+                fs_client.collection("alerts")
+                .where("acknowledged", "==", False)
+                .order_by("timestamp", direction="DESCENDING")
+                .select(["severity", "anomalies", "timestamp"])
+                .limit(CONTEXT_ALERT_LIMIT)
+            )
+            open_items = [(doc.id, doc.to_dict()) for doc in query.stream()]
+        
+        return [
+            {
+                "severity": data.get("severity"),
+                "anomalies": data.get("anomalies", []),
+                "timestamp": data.get("timestamp")
+            }
+            for _, data in open_items
+        ]
+    except Exception as e:
+        logger.error(f"Error fetching anomalies: {str(e)}")
+        return []
+
+def build_context_string(plant_data, anomalies):
+    """Build comprehensive context string for Gemini"""
+    context_parts = []
+    
+    if plant_data:
+        context_parts.append("=== CURRENT PLANT STATUS ===")
+        context_parts.append(f"Timestamp: {plant_data.get('timestamp', 'N/A')}")
+        context_parts.append("")
+        context_parts.append("**Key Performance Indicators:**")
+        context_parts.append(f"• Energy Use: {plant_data.get('energy_use', 'N/A')} kWh/ton")
+        context_parts.append(f"• CO2 Emissions: {plant_data.get('emissions_CO2', 'N/A')} kg/ton")
+        context_parts.append(f"• Grinding Efficiency: {plant_data.get('grinding_efficiency', 'N/A')}%")
+        context_parts.append(f"• Product Quality Index: {plant_data.get('product_quality', 'N/A')}")
+        context_parts.append("")
+        context_parts.append("**Operational Parameters:**")
+        context_parts.append(f"• Kiln Temperature: {plant_data.get('kiln_temp', 'N/A')}°C")
+        context_parts.append(f"• Fan Speed: {plant_data.get('fan_speed', 'N/A')}%")
+        context_parts.append(f"• Feed Rate: {plant_data.get('feed_rate', 'N/A')} tons/hr")
+        context_parts.append("")
+    
+    if anomalies:
+        context_parts.append("=== RECENT ANOMALIES & ALERTS ===")
+        for i, anomaly in enumerate(anomalies[:5], 1):
+            severity = anomaly.get('severity', 'unknown')
+            anomaly_list = anomaly.get('anomalies', [])
+            timestamp = anomaly.get('timestamp', 'N/A')
+            context_parts.append(f"{i}. [{severity.upper()}] {', '.join(anomaly_list)}")
+            context_parts.append(f"   Time: {timestamp}")
+        context_parts.append("")
+    else:
+        context_parts.append("=== RECENT ANOMALIES & ALERTS ===")
+        context_parts.append("✅ No recent anomalies detected. Plant operating normally.")
+        context_parts.append("")
+    
+    context_parts.append("=== AVAILABLE ACTIONS ===")
+    context_parts.append("• View detailed KPI trends and historical data")
+    context_parts.append("• Run fuel simulation scenarios (alternative fuel impact)")
+    context_parts.append("• Get AI-powered optimization recommendations")
+    context_parts.append("• Analyze anomaly root causes and solutions")
+    context_parts.append("• Compare performance across shifts and time periods")
+    
+    return "\n".join(context_parts)
+
+def current_context_version() -> str:
+    """
+    Version of the data behind the chat context: the current ingest window
+    plus a digest of the ids and severities of the open alerts the context
+    shows, so a new or acknowledged alert among them rebuilds it without
+    waiting for the window to roll over, and other alert writes don't.
+    Without the alert index, only the window is used.
+    """
+    window = int(time.time() // PLANT_CONTEXT_TTL_SECONDS)
+    open_items = alert_index.open_alerts(limit=CONTEXT_ALERT_LIMIT, order="time")
+    if open_items is None:
+        return str(window)
+    shown = repr([(alert_id, data.get("severity")) for alert_id, data in open_items])
+    return f"{window}:{hashlib.sha1(shown.encode('utf-8')).hexdigest()[:12]}"
+
+def get_shared_context():
+    """
+    Return the plant data, anomalies and rendered context block for the
+    current data version, building it at most once per version for all
+    users. Concurrent callers wait for the single build instead of each
+    querying BigQuery and Firestore.
+    """
+    global _shared_context
+    version = current_context_version()
+    cached = _shared_context
+    if cached and cached["version"] == version:
+        metrics.cache_result("plant_context", True)
+        return cached
+
+    with _context_lock:
+        cached = _shared_context
+        if cached and cached["version"] == version:
+            metrics.cache_result("plant_context", True)
+            return cached
+        metrics.cache_result("plant_context", False)
+
+        plant_data = get_plant_context()
+        logger.info(f"Plant data fetched: {plant_data is not None}")
+        anomalies = get_recent_anomalies()
+        logger.info(f"Anomalies fetched: {len(anomalies) if anomalies else 0}")
+
+        context = {
+            "version": version,
+            "plant_data": plant_data,
+            "anomalies": anomalies,
+            "context_string": build_context_string(plant_data, anomalies),
+        }
+        # Don't pin a failed BigQuery fetch for a whole window
+        if plant_data is not None:
+            _shared_context = context
+        return context
@@ -4,12 +4,11 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from typing import List, Dict
 import logging
-from google.cloud import firestore
+from app.services import recipient_directory
+from app.utils import metrics
 
 logger = logging.getLogger(__name__)
 
-fs_client = firestore.Client()
-
 SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
 SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
 SMTP_USERNAME = os.getenv("SMTP_USERNAME")
@@ -19,7 +18,8 @@ FROM_EMAIL = os.getenv("FROM_EMAIL", SMTP_USERNAME)
 
 def get_users_by_role(role: str) -> List[str]:
     """
-    Fetch user emails from Firestore by role.
+    Get emails of users with the given role who opted in to notifications.
+    Served from the in-memory recipient directory, not a per-call query.
     
     Args:
         role: User role ('admin' or 'operator')
@@ -28,17 +28,7 @@ def get_users_by_role(role: str) -> List[str]:
         List of email addresses for users with the specified role
     """
     try:
-        users_ref = fs_client.collection("users")
-        query = users_ref.where("role", "==", role).where("emailNotifications", "==", True)
-        users = query.stream()
-        
-        emails = []
-        for user in users:
-            user_data = user.to_dict()
-            email = user_data.get("email")
-            if email:
-                emails.append(email)
-        
+        emails = recipient_directory.get_recipients(role)
         logger.info(f"Found {len(emails)} {role} users with email notifications enabled")
         return emails
     except Exception as e:
@@ -175,7 +165,7 @@ Login to the dashboard for detailed analysis and recommendations.
         msg.attach(part1)
         msg.attach(part2)
         
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
+        with metrics.timed("smtp", "anomaly_alert"), smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
             server.starttls()
             server.login(SMTP_USERNAME, SMTP_PASSWORD)
             server.send_message(msg)
@@ -1,15 +1,17 @@
-from google.cloud import firestore
 from datetime import datetime, timedelta, timezone
 import secrets
+from app.utils import providers, metrics
 
-fs_client = firestore.Client(database="xement-ai-firestore")
+# Created on first use; see app.utils.providers
+fs_client = providers.lazy("firestore")
 USERS_COLLECTION = "users"
 TOKENS_COLLECTION = "auth_tokens"
 
 def get_user_by_email(email: str):
     users_ref = fs_client.collection(USERS_COLLECTION)
     query = users_ref.where("email", "==", email).limit(1)
-    docs = list(query.stream())
+    with metrics.timed("firestore", "users.by_email"):
+        docs = list(query.stream())
     if docs:
         data = docs[0].to_dict()
         data["id"] = docs[0].id
@@ -27,15 +29,19 @@ def create_auth_token(user_id, email, role):
         "created_at": now,
         "expires_at": now + timedelta(days=7),
     }
-    fs_client.collection(TOKENS_COLLECTION).document(token).set(token_data)
+    with metrics.timed("firestore", "auth_tokens.set"):
+        fs_client.collection(TOKENS_COLLECTION).document(token).set(token_data)
     return token
 
 def verify_token(token: str):
-    doc = fs_client.collection(TOKENS_COLLECTION).document(token).get()
+    with metrics.timed("firestore", "auth_tokens.get"):
+        doc = fs_client.collection(TOKENS_COLLECTION).document(token).get()
     if not doc.exists:
         return None
     data = doc.to_dict()
     now = datetime.now(timezone.utc)
     if data["expires_at"] < now:
+        # Already paid for the read; drop it now rather than waiting for the sweeper
+        doc.reference.delete()
         return None
     return data
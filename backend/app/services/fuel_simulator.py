@@ -1,6 +1,7 @@
-import pandas as pd
 from datetime import datetime, timezone
-from google.cloud import aiplatform
+from functools import lru_cache
+from app.utils import providers
+from app.utils.resilience import vertex_fuel
 
 ENDPOINT_RESOURCE = "projects/cement-ops-472217/locations/us-central1/endpoints/3291175852003295232"
 EMISSION_FACTORS = {
@@ -22,9 +23,15 @@ def prepare_instance(base_row, alt_pct):
     
     return inst
 
+@lru_cache(maxsize=1)
+def get_endpoint():
+    return providers.get("aiplatform").Endpoint(ENDPOINT_RESOURCE)
+
 def call_vertex_endpoint(instances):
-    endpoint = aiplatform.Endpoint(ENDPOINT_RESOURCE)
-    response = endpoint.predict(instances=instances)
+    """Predict via Vertex; fails fast while the endpoint is unhealthy so the heuristic takes over."""
+    response = vertex_fuel.call(
+        lambda: get_endpoint().predict(instances=instances, timeout=vertex_fuel.timeout)
+    )
     return response.predictions
 
 def heuristic_energy_adjustment(base_energy, alt_pct, alpha=ENERGY_REDUCTION_PER_ALT_PCT):
@@ -58,9 +65,12 @@ def simulate_fuel_mix(base_row, alt_values=list(range(0, 61, 10))):
 
     emissions_kg = [compute_emissions_kgh(e, pct) for e, pct in zip(pred_energies, alt_values)]
 
-    df = pd.DataFrame({
-        "alt_fuel_pct": alt_values,
-        "pred_energy_kwh_per_ton": pred_energies,
-        "emissions_kgCO2_per_ton": emissions_kg
-    })
-    return df.to_dict(orient="records")
+    # Plain records; building a DataFrame only to serialise it again meant importing pandas
+    return [
+        {
+            "alt_fuel_pct": pct,
+            "pred_energy_kwh_per_ton": float(energy),
+            "emissions_kgCO2_per_ton": float(emissions),
+        }
+        for pct, energy, emissions in zip(alt_values, pred_energies, emissions_kg)
+    ]
@@ -1,13 +1,11 @@
-import os
 import json
-import vertexai
-from vertexai.generative_models import GenerativeModel
+from app.utils import providers
+from app.utils.resilience import gemini_recommendation
 
 def get_recommendation(state_dict: dict) -> dict:
-    project_id = os.getenv("GOOGLE_CLOUD_PROJECT", "xement-ai")
-    location = "us-central1"
-    
-    vertexai.init(project=project_id, location=location)
+    # vertexai is imported and initialised once, on the first recommendation
+    providers.get("vertexai")
+    from vertexai.generative_models import GenerativeModel
     model = GenerativeModel("gemini-2.5-flash")
 
     prompt = f"""
@@ -33,7 +31,7 @@ def get_recommendation(state_dict: dict) -> dict:
     """
 
     try:
-        response = model.generate_content(prompt)
+        response = gemini_recommendation.call(model.generate_content, prompt)
         raw_output = response.candidates[0].content.parts[0].text.strip()
 
         if raw_output.startswith("```"):
@@ -0,0 +1,191 @@
+"""
+First-stage intent router for the chatbot.
+
+Pure data lookups (current KPIs, a specific metric, open alert counts,
+thresholds) are answered locally from the shared plant context, the
+in-memory alert index and the threshold config, in milliseconds. Anything
+that needs reasoning (why/how/recommend/simulate/compare...) or refers to
+a time range or aggregate (yesterday, last shift, average...) returns None
+and is escalated to Gemini.
+
+Every chat outcome is recorded so /chatbot/stats can report the share of
+traffic served locally and the latency of each path.
+"""
+import re
+import threading
+from app.routers.config_router import DEFAULT_THRESHOLDS
+from app.services import alert_index
+
+# Keywords are matched as regexes on word stems, so inflections ("compared",
+# "averages", "temperatures") count the same as the base word.
+REASONING_RE = re.compile(
+    r"\b(?:why|how|should|would|could|if|what if|root|recommend\w*|suggest\w*|optimi[sz]\w*|"
+    r"improv\w*|reduc\w*|lower\w*|increas\w*|decreas\w*|explain\w*|explanation\w*|caus\w*|"
+    r"compar\w*|versus|vs|predict\w*|forecast\w*|simulat\w*|scenario\w*|impact\w*|trend\w*|"
+    r"analy[sz]\w*|fix\w*|diagnos\w*)\b"
+)
+# A time range or aggregation means the answer is not the latest reading
+QUALIFIER_RE = re.compile(
+    r"\b(?:yesterday|today|tonight|last|past|previous\w*|prior|ago|earlier|since|until|till|"
+    r"between|during|over|hour\w*|day\w*|week\w*|month\w*|year\w*|shift\w*|morning|"
+    r"afternoon|evening|night\w*|histor\w*|averag\w*|avg|mean|median|min|minimum|max|maximum|"
+    r"peak\w*|highest|lowest|total\w*|sum|cumulative|range|\d{4}-\d{2}-\d{2}|\d{1,2}\s?(?:am|pm))\b"
+)
+THRESHOLD_RE = re.compile(r"\b(?:threshold\w*|limit\w*|set ?points?)\b")
+ALERT_RE = re.compile(r"\b(?:alert\w*|anomal\w*|alarm\w*|issues?)\b")
+OVERVIEW_RE = re.compile(r"\b(?:kpis?|status|overview|latest|current\w*|now|readings?|metrics?|summary)\b")
+
+# pattern -> (plant_data key, threshold key, label, unit)
+METRICS = [
+    (re.compile(r"\benerg\w*\b"), ("energy_use", "energy_use", "Energy Use", "kWh/ton")),
+    (re.compile(r"\b(?:emission\w*|emit\w*|co2)\b"), ("emissions_CO2", "emissions_CO2", "CO2 Emissions", "kg/ton")),
+    (re.compile(r"\b(?:grind\w*|efficien\w*)\b"), ("grinding_efficiency", "grinding_efficiency", "Grinding Efficiency", "%")),
+    (re.compile(r"\bquality\b"), ("product_quality", "product_quality_index", "Product Quality Index", "")),
+    (re.compile(r"\b(?:kilns?|temps?|temperatures?)\b"), ("kiln_temp", "kiln_temp", "Kiln Temperature", "°C")),
+    (re.compile(r"\bfans?\b"), ("fan_speed", "fan_speed", "Fan Speed", "%")),
+    (re.compile(r"\bfeed(?:s|ing|rate)?\b"), ("feed_rate", "feed_rate", "Feed Rate", "tons/hr")),
+]
+
+_stats_lock = threading.Lock()
+_stats = {}
+
+
+def _normalize(message: str) -> str:
+    return " ".join(message.lower().split())
+
+
+def _mentioned_metrics(text: str) -> list:
+    return [metric for pattern, metric in METRICS if pattern.search(text)]
+
+
+def classify(message: str):
+    """
+    Return the local intent for a message, or None to escalate to Gemini.
+    Reasoning questions and anything with a time range or aggregation
+    ("yesterday", "last shift", "average", "since Monday"...) escalate, since
+    the local answers only know the latest reading.
+    """
+    text = _normalize(message)
+    if not text or REASONING_RE.search(text) or QUALIFIER_RE.search(text):
+        return None
+    if THRESHOLD_RE.search(text):
+        return "thresholds"
+    if ALERT_RE.search(text):
+        return "open_alerts"
+    if _mentioned_metrics(text):
+        return "metric"
+    if OVERVIEW_RE.search(text):
+        return "kpi_overview"
+    return None
+
+
+def _format_value(value, unit: str) -> str:
+    if value is None:
+        return "N/A"
+    if unit in ("%", "°C"):
+        return f"{value}{unit}"
+    return f"{value} {unit}".strip()
+
+
+def _answer_overview(plant_data: dict) -> str:
+    lines = [f"Latest plant readings ({plant_data.get('timestamp', 'N/A')}):"]
+    seen = set()
+    for _, (data_key, _, label, unit) in METRICS:
+        if data_key in seen:
+            continue
+        seen.add(data_key)
+        lines.append(f"• {label}: {_format_value(plant_data.get(data_key), unit)}")
+    return "\n".join(lines)
+
+
+def _answer_metrics(plant_data: dict, metrics: list) -> str:
+    lines = [
+        f"• {label}: {_format_value(plant_data.get(data_key), unit)}"
+        for data_key, _, label, unit in metrics
+    ]
+    return "\n".join([f"Latest reading ({plant_data.get('timestamp', 'N/A')}):"] + lines)
+
+
+def _answer_thresholds(metrics: list) -> str:
+    threshold_keys = [m[1] for m in metrics] or list(DEFAULT_THRESHOLDS.keys())
+    lines = ["Anomaly thresholds:"]
+    for key in threshold_keys:
+        limits = DEFAULT_THRESHOLDS.get(key, {})
+        rendered = ", ".join(f"{name.replace('_', ' ')} {value}" for name, value in limits.items())
+        lines.append(f"• {key.replace('_', ' ').title()}: {rendered}")
+    return "\n".join(lines)
+
+
+def _answer_open_alerts(anomalies: list) -> str:
+    open_items = alert_index.open_alerts(order="severity")
+    if open_items is None:
+        # Index not running: the shared context holds the newest open alerts only
+        if not anomalies:
+            return "No open alerts. The plant is operating within normal parameters."
+        lines = ["Most recent open alerts:"]
+        lines += [f"• {a.get('severity', 'unknown').upper()}: {', '.join(a.get('anomalies', []))}" for a in anomalies]
+        return "\n".join(lines)
+
+    if not open_items:
+        return "No open alerts. The plant is operating within normal parameters."
+    counts = {}
+    for _, data in open_items:
+        counts[data.get("severity", "unknown")] = counts.get(data.get("severity", "unknown"), 0) + 1
+    breakdown = ", ".join(f"{n} {severity}" for severity, n in counts.items())
+    lines = [f"{len(open_items)} open alerts ({breakdown}). Most severe:"]
+    for _, data in open_items[:3]:
+        lines.append(f"• {data.get('severity', 'unknown').upper()}: {', '.join(data.get('anomalies', []))}")
+    return "\n".join(lines)
+
+
+def answer_locally(message: str, plant_data: dict, anomalies: list):
+    """
+    Answer a pure data lookup from cached data.
+    Returns (intent, response), or (None, None) when the message needs Gemini.
+    """
+    intent = classify(message)
+    if intent is None:
+        return None, None
+
+    metrics = _mentioned_metrics(_normalize(message))
+    if intent == "thresholds":
+        return intent, _answer_thresholds(metrics)
+    if intent == "open_alerts":
+        return intent, _answer_open_alerts(anomalies)
+    if not plant_data:
+        return None, None
+    if intent == "metric":
+        return intent, _answer_metrics(plant_data, metrics)
+    return intent, _answer_overview(plant_data)
+
+
+def record_outcome(path: str, elapsed_seconds: float):
+    """Record how a chat message was served: local, cache, gemini or fallback."""
+    with _stats_lock:
+        entry = _stats.setdefault(path, {"count": 0, "total_ms": 0.0})
+        entry["count"] += 1
+        entry["total_ms"] += elapsed_seconds * 1000
+
+
+def get_stats() -> dict:
+    """Share of messages served by each path and their average latency."""
+    with _stats_lock:
+        snapshot = {path: dict(entry) for path, entry in _stats.items()}
+    total = sum(entry["count"] for entry in snapshot.values())
+    paths = {
+        path: {
+            "count": entry["count"],
+            "fraction": round(entry["count"] / total, 4) if total else 0.0,
+            "avg_ms": round(entry["total_ms"] / entry["count"], 2) if entry["count"] else 0.0,
+        }
+        for path, entry in snapshot.items()
+    }
+    local = paths.get("local", {})
+    gemini = paths.get("gemini", {})
+    return {
+        "total_messages": total,
+        "local_fraction": local.get("fraction", 0.0),
+        "avg_local_ms": local.get("avg_ms", 0.0),
+        "avg_gemini_ms": gemini.get("avg_ms", 0.0),
+        "paths": paths,
+    }
@@ -0,0 +1,312 @@
+"""
+In-process replica of recent plant readings.
+
+The last LOCAL_REPLICA_DAYS days of xement_ai_refinement_data are kept in
+an embedded SQLite database (stdlib, in memory or at LOCAL_REPLICA_PATH)
+and pulled incrementally from BigQuery every LOCAL_REPLICA_REFRESH_SECONDS
+on a timestamp watermark. Each pull re-reads LOCAL_REPLICA_PULL_LAG_SECONDS
+before the watermark, so rows that land late or out of order within that
+window are picked up; rows are keyed by (plant_id, timestamp), so the
+overlap is upserted idempotently.
+
+/latest_state, /latest_state/batch and /history ask `covers(start)` first
+and answer from the replica when the requested range starts inside the
+replicated window and the last pull is recent; anything older, or a stale
+replica, still goes to BigQuery.
+
+For tests and offline work, LOCAL_REPLICA_SEED points at a .jsonl or .csv
+export of the table (e.g. from simulate_and_upload) that is loaded at
+start; with LOCAL_REPLICA_OFFLINE=true nothing is pulled from BigQuery and
+every range is served from the seed.
+"""
+import os
+import csv
+import json
+import time
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+
+from google.cloud import bigquery
+from app.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+LOCAL_REPLICA_ENABLED = os.getenv("LOCAL_REPLICA_ENABLED", "false").lower() == "true"
+LOCAL_REPLICA_DAYS = int(os.getenv("LOCAL_REPLICA_DAYS", "7"))
+LOCAL_REPLICA_PATH = os.getenv("LOCAL_REPLICA_PATH", ":memory:")
+LOCAL_REPLICA_REFRESH_SECONDS = int(os.getenv("LOCAL_REPLICA_REFRESH_SECONDS", "60"))
+LOCAL_REPLICA_SEED = os.getenv("LOCAL_REPLICA_SEED", "")
+LOCAL_REPLICA_OFFLINE = os.getenv("LOCAL_REPLICA_OFFLINE", "false").lower() == "true"
+# How far behind the watermark each pull starts, to catch late-arriving rows
+LOCAL_REPLICA_PULL_LAG_SECONDS = int(os.getenv("LOCAL_REPLICA_PULL_LAG_SECONDS", "900"))
+# A replica that has missed this many pulls in a row is treated as stale
+STALE_AFTER_PULLS = 3
+
+SOURCE_TABLE = "`xement-ai.xement_ai_dataset.xement_ai_refinement_data`"
+
+# Same columns and order as the BigQuery table
+COLUMNS = {
+    "timestamp": "TIMESTAMP",
+    "plant_id": "STRING",
+    "raw1_frac": "FLOAT",
+    "raw2_frac": "FLOAT",
+    "grinding_efficiency": "FLOAT",
+    "kiln_temp": "FLOAT",
+    "fan_speed": "FLOAT",
+    "mill_speed": "FLOAT",
+    "feed_rate": "FLOAT",
+    "clinker_rate": "FLOAT",
+    "alt_fuel_pct": "FLOAT",
+    "fuel_type": "STRING",
+    "energy_use": "FLOAT",
+    "emissions_CO2": "FLOAT",
+    "product_quality_index": "FLOAT",
+    "anomaly_flag": "BOOLEAN",
+    "notes": "STRING",
+}
+_SQLITE_TYPES = {"TIMESTAMP": "REAL", "STRING": "TEXT", "FLOAT": "REAL", "BOOLEAN": "INTEGER"}
+_COLUMN_LIST = ", ".join(COLUMNS)
+
+_lock = threading.Lock()
+_conn = None
+_watermark = None        # newest replicated timestamp (epoch seconds)
+_last_pull = 0.0         # monotonic time of the last successful pull
+_pulled_rows = 0
+_thread = None
+_stop = threading.Event()
+
+
+# ----- value conversion -----
+def _to_epoch(value) -> float:
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.strip().replace("Z", "+00:00").replace(" ", "T", 1))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def _from_epoch(value):
+    return datetime.fromtimestamp(value, timezone.utc) if value is not None else None
+
+
+def _to_sqlite(column: str, value):
+    if value is None or value == "":
+        return None
+    kind = COLUMNS[column]
+    if kind == "TIMESTAMP":
+        return _to_epoch(value)
+    if kind == "FLOAT":
+        return float(value)
+    if kind == "BOOLEAN":
+        if isinstance(value, str):
+            return 1 if value.strip().lower() in ("true", "1") else 0
+        return 1 if value else 0
+    return str(value)
+
+
+def _from_sqlite(row: sqlite3.Row) -> dict:
+    data = dict(row)
+    data["timestamp"] = _from_epoch(data["timestamp"])
+    if data.get("anomaly_flag") is not None:
+        data["anomaly_flag"] = bool(data["anomaly_flag"])
+    return data
+
+
+# ----- storage -----
+def _connect():
+    global _conn, _watermark
+    conn = sqlite3.connect(LOCAL_REPLICA_PATH, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    columns = ", ".join(f"{name} {_SQLITE_TYPES[kind]}" for name, kind in COLUMNS.items())
+    conn.execute(f"CREATE TABLE IF NOT EXISTS readings ({columns}, PRIMARY KEY (plant_id, timestamp))")
+    conn.execute("CREATE INDEX IF NOT EXISTS readings_by_time ON readings (timestamp)")
+    conn.commit()
+    _conn = conn
+    _watermark = conn.execute("SELECT MAX(timestamp) FROM readings").fetchone()[0]
+
+
+def _insert(rows) -> int:
+    """Upsert BigQuery rows or seed records; returns how many were written."""
+    global _watermark
+    placeholders = ", ".join("?" for _ in COLUMNS)
+    values = [tuple(_to_sqlite(column, row.get(column)) for column in COLUMNS) for row in rows]
+    values = [v for v in values if v[0] is not None and v[1] is not None]
+    if not values:
+        return 0
+    with _lock:
+        _conn.executemany(f"INSERT OR REPLACE INTO readings ({_COLUMN_LIST}) VALUES ({placeholders})", values)
+        _conn.commit()
+        newest = max(v[0] for v in values)
+        _watermark = newest if _watermark is None else max(_watermark, newest)
+    return len(values)
+
+
+def _horizon() -> float:
+    return (datetime.now(timezone.utc) - timedelta(days=LOCAL_REPLICA_DAYS)).timestamp()
+
+
+def _prune():
+    with _lock:
+        _conn.execute("DELETE FROM readings WHERE timestamp < ?", (_horizon(),))
+        _conn.commit()
+
+
+def load_seed(path: str) -> int:
+    """Load a .jsonl or .csv export of the table into the replica."""
+    with open(path, newline="", encoding="utf-8") as handle:
+        if path.endswith(".csv"):
+            records = list(csv.DictReader(handle))
+        else:
+            records = [json.loads(line) for line in handle if line.strip()]
+    loaded = _insert(records)
+    logger.info(f"Local replica seeded with {loaded} rows from {path}")
+    return loaded
+
+
+def pull():
+    """
+    Fetch rows from LOCAL_REPLICA_PULL_LAG_SECONDS before the watermark (or
+    the last LOCAL_REPLICA_DAYS days) from BigQuery.
+    """
+    global _last_pull, _pulled_rows
+    from app.services.bigquery_service import run_query
+
+    since = _horizon()
+    if _watermark is not None:
+        since = max(_watermark - LOCAL_REPLICA_PULL_LAG_SECONDS, since)
+    query = f"""
+        SELECT {_COLUMN_LIST}
+        FROM {SOURCE_TABLE}
+        WHERE timestamp >= @since
+        ORDER BY timestamp
+    """
+    job_config = bigquery.QueryJobConfig(query_parameters=[
+        bigquery.ScalarQueryParameter("since", "TIMESTAMP", _from_epoch(since)),
+    ])
+    rows = run_query(query, "local_replica_pull", job_config=job_config)
+    written = _insert(dict(row) for row in rows)
+    _prune()
+    with _lock:
+        _last_pull = time.monotonic()
+        _pulled_rows += written
+    return written
+
+
+def _run():
+    while not _stop.is_set():
+        try:
+            pull()
+        except Exception as e:
+            logger.warning(f"Local replica pull failed: {e}")
+        _stop.wait(LOCAL_REPLICA_REFRESH_SECONDS)
+
+
+def start():
+    """Open the store, load the seed and start pulling. Safe to call more than once."""
+    global _thread
+    if not LOCAL_REPLICA_ENABLED or _conn is not None:
+        return
+    _connect()
+    if LOCAL_REPLICA_SEED:
+        try:
+            load_seed(LOCAL_REPLICA_SEED)
+        except Exception as e:
+            logger.warning(f"Could not load local replica seed {LOCAL_REPLICA_SEED}: {e}")
+    if LOCAL_REPLICA_OFFLINE:
+        logger.info("Local replica running offline from its seed")
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_run, name="local-replica", daemon=True)
+    _thread.start()
+    logger.info(f"Local replica pulling the last {LOCAL_REPLICA_DAYS} days every {LOCAL_REPLICA_REFRESH_SECONDS}s")
+
+
+def stop():
+    _stop.set()
+
+
+# ----- reads -----
+def covers(start) -> bool:
+    """True when a range starting at `start` (None = unbounded) can be answered locally."""
+    if _conn is None:
+        return False
+    if LOCAL_REPLICA_OFFLINE:
+        return True
+    if not _last_pull or time.monotonic() - _last_pull > STALE_AFTER_PULLS * LOCAL_REPLICA_REFRESH_SECONDS:
+        return False
+    return start is not None and _to_epoch(start) >= _horizon()
+
+
+def _range_filter(plant: str, start, end):
+    clauses, params = ["timestamp < ?"], [_to_epoch(end)]
+    if start is not None:
+        clauses.append("timestamp >= ?")
+        params.append(_to_epoch(start))
+    if plant != "all":
+        clauses.append("plant_id = ?")
+        params.append(plant)
+    return " AND ".join(clauses), params
+
+
+def rows(plant: str, start, end, limit: int) -> list:
+    """Newest-first readings in [start, end), like the /history query."""
+    where_clause, params = _range_filter(plant, start, end)
+    with metrics.timed("local_replica", "rows"), _lock:
+        result = _conn.execute(
+            f"SELECT {_COLUMN_LIST} FROM readings WHERE {where_clause} ORDER BY timestamp DESC LIMIT ?",
+            params + [int(limit)],
+        ).fetchall()
+    return [_from_sqlite(row) for row in result]
+
+
+def aggregate(plant: str, start, end) -> dict:
+    """Period averages with the same keys as the BigQuery aggregate query."""
+    where_clause, params = _range_filter(plant, start, end)
+    query = f"""
+        SELECT
+          AVG(energy_use) AS energy_use,
+          AVG(grinding_efficiency) AS grinding_efficiency,
+          AVG(kiln_temp) AS kiln_temp,
+          AVG(product_quality_index) AS product_quality_index,
+          AVG(emissions_CO2) AS emissions,
+          AVG(alt_fuel_pct) AS alt_fuel_pct,
+          AVG(clinker_rate) AS clinker_rate,
+          AVG(feed_rate) AS production_volume,
+          MAX(timestamp) AS last_record_time,
+          MIN(timestamp) AS period_start,
+          COUNT(*) AS record_count,
+          (SELECT fuel_type FROM readings WHERE {where_clause}
+           GROUP BY fuel_type ORDER BY COUNT(*) DESC LIMIT 1) AS fuel_type,
+          MAX(anomaly_flag) AS has_anomaly
+        FROM readings
+        WHERE {where_clause}
+    """
+    with metrics.timed("local_replica", "aggregate"), _lock:
+        row = dict(_conn.execute(query, params + params).fetchone())
+    row["last_record_time"] = _from_epoch(row["last_record_time"])
+    row["period_start"] = _from_epoch(row["period_start"])
+    if row["has_anomaly"] is not None:
+        row["has_anomaly"] = bool(row["has_anomaly"])
+    return row
+
+
+def status() -> dict:
+    if _conn is None:
+        return {"enabled": LOCAL_REPLICA_ENABLED, "ready": False}
+    with _lock:
+        count = _conn.execute("SELECT COUNT(*) FROM readings").fetchone()[0]
+        last_pull = _last_pull
+        pulled = _pulled_rows
+    return {
+        "enabled": True,
+        "ready": covers(datetime.now(timezone.utc)),
+        "offline": LOCAL_REPLICA_OFFLINE,
+        "rows": count,
+        "pulled_rows": pulled,
+        "watermark": _from_epoch(_watermark).isoformat() if _watermark else None,
+        "seconds_since_pull": round(time.monotonic() - last_pull, 1) if last_pull else None,
+    }
@@ -0,0 +1,146 @@
+"""
+Prompt assembly for the chatbot under a token budget.
+
+The prompt is laid out so the stable parts come first: the static system
+prompt and instructions are sent once as the model's system instruction,
+then the shared plant context block (identical for every user within a
+data version), then the user's conversation memory, then the query. This
+keeps the longest possible prefix identical between requests, which is
+what Gemini's prefix caching reuses.
+
+Conversation memory is kept per user (and optional conversation id).
+When the recent turns no longer fit the budget, the oldest are folded
+into a short extractive summary, so prompt size stays bounded however
+long the conversation runs, without an extra LLM call per turn.
+"""
+import os
+import time
+import threading
+from collections import OrderedDict, deque
+
+# Rough Gemini tokenization for English text; good enough for budgeting
+CHARS_PER_TOKEN = 4
+
+CHAT_PROMPT_TOKEN_BUDGET = int(os.getenv("CHAT_PROMPT_TOKEN_BUDGET", "4000"))
+CHAT_SUMMARY_TOKEN_BUDGET = int(os.getenv("CHAT_SUMMARY_TOKEN_BUDGET", "300"))
+CHAT_MEMORY_MAX_TURNS = int(os.getenv("CHAT_MEMORY_MAX_TURNS", "20"))
+CHAT_MEMORY_MAX_CONVERSATIONS = int(os.getenv("CHAT_MEMORY_MAX_CONVERSATIONS", "1000"))
+CHAT_MEMORY_TTL_SECONDS = int(os.getenv("CHAT_MEMORY_TTL_SECONDS", "3600"))
+SUMMARY_SNIPPET_CHARS = 160
+
+_lock = threading.Lock()
+_conversations = OrderedDict()
+
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def _conversation_key(user_id: str, conversation_id: str = None) -> str:
+    return f"{user_id}:{conversation_id or 'default'}"
+
+
+def _get_conversation(key: str) -> dict:
+    """Fetch (or create) a conversation, evicting idle and least recently used ones."""
+    now = time.monotonic()
+    conversation = _conversations.get(key)
+    if conversation is None or now - conversation["last_used"] > CHAT_MEMORY_TTL_SECONDS:
+        conversation = {"turns": deque(), "summary": [], "last_used": now}
+        _conversations[key] = conversation
+    conversation["last_used"] = now
+    _conversations.move_to_end(key)
+    while len(_conversations) > CHAT_MEMORY_MAX_CONVERSATIONS:
+        _conversations.popitem(last=False)
+    return conversation
+
+
+def _snippet(text: str) -> str:
+    text = " ".join(text.split())
+    if len(text) <= SUMMARY_SNIPPET_CHARS:
+        return text
+    return text[:SUMMARY_SNIPPET_CHARS].rsplit(" ", 1)[0] + "…"
+
+
+def _fold_oldest_turn(conversation: dict):
+    """Move the oldest turn into the rolling summary, trimming it to its budget."""
+    turn = conversation["turns"].popleft()
+    conversation["summary"].append(f"- User asked: {_snippet(turn['user'])} | Assistant: {_snippet(turn['assistant'])}")
+    while conversation["summary"] and estimate_tokens("\n".join(conversation["summary"])) > CHAT_SUMMARY_TOKEN_BUDGET:
+        conversation["summary"].pop(0)
+
+
+def _render_memory(conversation: dict) -> str:
+    parts = []
+    if conversation["summary"]:
+        parts.append("=== EARLIER IN THIS CONVERSATION (SUMMARY) ===")
+        parts.extend(conversation["summary"])
+        parts.append("")
+    if conversation["turns"]:
+        parts.append("=== RECENT CONVERSATION ===")
+        for turn in conversation["turns"]:
+            parts.append(f"User: {turn['user']}")
+            parts.append(f"Assistant: {turn['assistant']}")
+        parts.append("")
+    return "\n".join(parts)
+
+
+def build_prompt(static_prefix: str, context_string: str, message: str,
+                 user_id: str, conversation_id: str = None):
+    """
+    Assemble the per-request prompt and report the token cost of each section.
+
+    `static_prefix` is only measured here; callers send it as the model's
+    system instruction. Returns (prompt, sections) where sections maps each
+    section name to its estimated token count.
+    """
+    query_block = f"=== USER QUERY ===\n{message}\n\nRespond now:\n"
+    sections = {
+        "static_prefix": estimate_tokens(static_prefix),
+        "context": estimate_tokens(context_string),
+        "query": estimate_tokens(query_block),
+    }
+    memory_budget = CHAT_PROMPT_TOKEN_BUDGET - sum(sections.values())
+
+    with _lock:
+        conversation = _get_conversation(_conversation_key(user_id, conversation_id))
+        memory = _render_memory(conversation)
+        while conversation["turns"] and estimate_tokens(memory) > memory_budget:
+            _fold_oldest_turn(conversation)
+            memory = _render_memory(conversation)
+        while conversation["summary"] and estimate_tokens(memory) > memory_budget:
+            conversation["summary"].pop(0)
+            memory = _render_memory(conversation)
+
+    sections["memory"] = estimate_tokens(memory)
+    sections["total"] = sum(sections.values())
+
+    prompt_parts = [context_string, ""]
+    if memory:
+        prompt_parts.append(memory)
+    prompt_parts.append(query_block)
+    return "\n".join(prompt_parts), sections
+
+
+def has_history(user_id: str, conversation_id: str = None) -> bool:
+    """True when the conversation has turns or a summary that would go into the prompt."""
+    with _lock:
+        conversation = _conversations.get(_conversation_key(user_id, conversation_id))
+        if conversation is None or time.monotonic() - conversation["last_used"] > CHAT_MEMORY_TTL_SECONDS:
+            return False
+        return bool(conversation["turns"] or conversation["summary"])
+
+
+def remember_turn(user_id: str, message: str, reply: str, conversation_id: str = None):
+    """Record a completed exchange in the user's conversation memory."""
+    with _lock:
+        conversation = _get_conversation(_conversation_key(user_id, conversation_id))
+        conversation["turns"].append({"user": message, "assistant": reply})
+        while len(conversation["turns"]) > CHAT_MEMORY_MAX_TURNS:
+            _fold_oldest_turn(conversation)
+
+
+def reset_conversation(user_id: str, conversation_id: str = None):
+    with _lock:
+        _conversations.pop(_conversation_key(user_id, conversation_id), None)
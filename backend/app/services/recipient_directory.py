@@ -0,0 +1,137 @@
+"""
+In-memory directory of alert email recipients.
+
+Opted-in users (``emailNotifications == True``) are loaded once, grouped by
+role, and kept current through a Firestore snapshot listener. When the
+listener is disabled or not running, the cached lists are refreshed in the
+background once they are older than RECIPIENT_CACHE_TTL_SECONDS, so alert
+fan-out never waits on a Firestore query after the first load.
+"""
+import os
+import time
+import logging
+import threading
+from typing import Dict, List
+
+from app.services.firestore_service import fs_client, USERS_COLLECTION
+
+logger = logging.getLogger(__name__)
+
+RECIPIENT_CACHE_TTL_SECONDS = int(os.getenv("RECIPIENT_CACHE_TTL_SECONDS", "300"))
+RECIPIENT_LISTENER_ENABLED = os.getenv("RECIPIENT_LISTENER_ENABLED", "true").lower() == "true"
+
+_lock = threading.Lock()
+_recipients: Dict[str, List[str]] = {}
+_loaded_at = 0.0
+_refreshing = False
+_watch = None
+
+
+def _opted_in_query():
+    return fs_client.collection(USERS_COLLECTION).where("emailNotifications", "==", True)
+
+
+def _group_by_role(docs) -> Dict[str, List[str]]:
+    grouped: Dict[str, List[str]] = {}
+    for doc in docs:
+        user_data = doc.to_dict() or {}
+        email = user_data.get("email")
+        role = user_data.get("role")
+        if email and role:
+            grouped.setdefault(role, []).append(email)
+    return grouped
+
+
+def _store(grouped: Dict[str, List[str]]):
+    global _recipients, _loaded_at
+    with _lock:
+        _recipients = grouped
+        _loaded_at = time.monotonic()
+    counts = {role: len(emails) for role, emails in grouped.items()}
+    logger.info(f"Recipient directory loaded: {counts}")
+
+
+def _listener_active() -> bool:
+    return _watch is not None and getattr(_watch, "is_active", False)
+
+
+def _on_snapshot(docs, changes, read_time):
+    _store(_group_by_role(docs))
+
+
+def refresh():
+    """Reload opted-in recipients from Firestore (one query for all roles)."""
+    global _refreshing
+    try:
+        _store(_group_by_role(_opted_in_query().stream()))
+    finally:
+        with _lock:
+            _refreshing = False
+
+
+def _refresh_in_background():
+    global _refreshing
+    with _lock:
+        if _refreshing:
+            return
+        _refreshing = True
+
+    def _run():
+        try:
+            refresh()
+        except Exception as e:
+            logger.error(f"Background recipient refresh failed: {str(e)}")
+
+    threading.Thread(target=_run, name="recipient-directory-refresh", daemon=True).start()
+
+
+def start():
+    """Attach the snapshot listener. Safe to call more than once."""
+    global _watch
+    if not RECIPIENT_LISTENER_ENABLED or _listener_active():
+        return
+    try:
+        _watch = _opted_in_query().on_snapshot(_on_snapshot)
+        logger.info("Recipient directory listener started")
+    except Exception as e:
+        logger.warning(f"Could not start recipient directory listener, using TTL refresh: {e}")
+        _watch = None
+
+
+def invalidate():
+    """
+    Called after a user is created, updated or deleted so the next alert
+    sees the change. A running listener picks edits up on its own.
+    """
+    global _loaded_at
+    if _listener_active():
+        return
+    try:
+        refresh()
+    except Exception as e:
+        logger.error(f"Recipient directory reload failed: {str(e)}")
+        with _lock:
+            _loaded_at = 0.0
+
+
+def get_recipients(role: str) -> List[str]:
+    """
+    Return cached email addresses for users with the given role who opted in
+    to notifications. Only the very first call (before any load) queries
+    Firestore on the caller's thread.
+    """
+    with _lock:
+        loaded = _loaded_at > 0
+        stale = time.monotonic() - _loaded_at > RECIPIENT_CACHE_TTL_SECONDS
+        emails = list(_recipients.get(role, []))
+
+    if not loaded:
+        start()
+        if _loaded_at == 0:
+            refresh()
+        with _lock:
+            return list(_recipients.get(role, []))
+
+    if stale and not _listener_active():
+        _refresh_in_background()
+    return emails
@@ -0,0 +1,147 @@
+"""
+Response cache for repeated chatbot questions.
+
+Questions are normalized (lowercased, punctuation and stopwords removed,
+word order kept, since "is A above B" and "is B above A" differ) and
+cached together with the plant-context version they were answered
+against. A new context version clears the cache, so an answer is never
+served against data it was not generated from. The cache is shared by all
+users, so callers only use it for the first message of a conversation,
+whose answer does not depend on anyone's conversation memory.
+
+With CHAT_CACHE_SEMANTIC enabled, a miss on the exact key falls back to
+the closest cached question by cosine similarity of hashed character
+trigram vectors, a dependency-free stand-in for a text embedding.
+"""
+import os
+import re
+import math
+import zlib
+import threading
+from collections import OrderedDict
+from app.utils import metrics
+
+CHAT_CACHE_ENABLED = os.getenv("CHAT_CACHE_ENABLED", "true").lower() == "true"
+CHAT_CACHE_MAX_ENTRIES = int(os.getenv("CHAT_CACHE_MAX_ENTRIES", "500"))
+CHAT_CACHE_SEMANTIC = os.getenv("CHAT_CACHE_SEMANTIC", "false").lower() == "true"
+CHAT_CACHE_SIMILARITY = float(os.getenv("CHAT_CACHE_SIMILARITY", "0.9"))
+EMBEDDING_DIMENSIONS = 256
+
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "been", "am", "do", "does", "did",
+    "i", "me", "my", "we", "our", "you", "your", "us", "please", "pls", "can", "could",
+    "would", "will", "should", "to", "of", "for", "in", "on", "at", "by", "with", "from",
+    "and", "or", "what", "whats", "give", "tell", "let", "know", "there", "any", "some",
+    "hi", "hello", "hey", "thanks", "thank", "now", "right", "currently", "just",
+}
+
+# Messages that refer back to the conversation can't be answered from a shared cache
+FOLLOW_UP_WORDS = {
+    "it", "its", "that", "this", "those", "these", "they", "them", "why", "more",
+    "else", "again", "above", "previous", "earlier", "same",
+}
+
+_WORD_RE = re.compile(r"[a-z0-9_]+")
+
+_lock = threading.Lock()
+_entries = OrderedDict()
+_version = None
+_stats = {"lookups": 0, "hits": 0, "semantic_hits": 0, "misses": 0, "skipped": 0, "invalidations": 0}
+
+
+def normalize(message: str) -> str:
+    words = _WORD_RE.findall(message.lower())
+    return " ".join(w for w in words if w not in STOPWORDS)
+
+
+def is_cacheable(message: str) -> bool:
+    words = set(_WORD_RE.findall(message.lower()))
+    return bool(words - STOPWORDS) and not (words & FOLLOW_UP_WORDS)
+
+
+def _embed(text: str):
+    vector = [0.0] * EMBEDDING_DIMENSIONS
+    padded = f" {text} "
+    for i in range(len(padded) - 2):
+        vector[zlib.crc32(padded[i:i + 3].encode()) % EMBEDDING_DIMENSIONS] += 1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def _similarity(a, b) -> float:
+    return sum(x * y for x, y in zip(a, b))
+
+
+def _sync_version(version: str):
+    global _version
+    if version != _version:
+        if _entries:
+            _stats["invalidations"] += 1
+        _entries.clear()
+        _version = version
+
+
+def lookup(message: str, version: str):
+    """Return a cached response for this question and context version, or None."""
+    if not CHAT_CACHE_ENABLED:
+        return None
+    with _lock:
+        _stats["lookups"] += 1
+        if not is_cacheable(message):
+            _stats["skipped"] += 1
+            return None
+        _sync_version(version)
+
+        key = normalize(message)
+        entry = _entries.get(key)
+        if entry is not None:
+            _entries.move_to_end(key)
+            _stats["hits"] += 1
+            metrics.cache_result("chat_response", True)
+            return entry["response"]
+
+        if CHAT_CACHE_SEMANTIC and _entries:
+            query_vector = _embed(key)
+            best_key, best_score = None, 0.0
+            for cached_key, cached in _entries.items():
+                score = _similarity(query_vector, cached["vector"])
+                if score > best_score:
+                    best_key, best_score = cached_key, score
+            if best_score >= CHAT_CACHE_SIMILARITY:
+                _entries.move_to_end(best_key)
+                _stats["hits"] += 1
+                _stats["semantic_hits"] += 1
+                metrics.cache_result("chat_response", True)
+                return _entries[best_key]["response"]
+
+        _stats["misses"] += 1
+        metrics.cache_result("chat_response", False)
+        return None
+
+
+def store(message: str, version: str, response: str):
+    """Cache a Gemini response for this question and context version."""
+    if not CHAT_CACHE_ENABLED or not is_cacheable(message):
+        return
+    with _lock:
+        _sync_version(version)
+        key = normalize(message)
+        _entries[key] = {
+            "response": response,
+            "vector": _embed(key) if CHAT_CACHE_SEMANTIC else None,
+        }
+        _entries.move_to_end(key)
+        while len(_entries) > CHAT_CACHE_MAX_ENTRIES:
+            _entries.popitem(last=False)
+
+
+def get_stats() -> dict:
+    """Hit ratio and Gemini calls saved since process start."""
+    with _lock:
+        stats = dict(_stats)
+        stats["entries"] = len(_entries)
+        stats["context_version"] = _version
+    considered = stats["hits"] + stats["misses"]
+    stats["hit_ratio"] = round(stats["hits"] / considered, 4) if considered else 0.0
+    stats["gemini_calls_saved"] = stats["hits"]
+    return stats
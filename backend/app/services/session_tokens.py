@@ -0,0 +1,247 @@
+"""
+Signed, self-contained session tokens.
+
+Tokens look like ``v1.<payload>.<signature>``: a base64url JSON payload
+(user id, email, role, issue/expiry time, token id) signed with
+HMAC-SHA256 under TOKEN_SIGNING_SECRET. Verification is local and takes
+microseconds; the only shared state is the revocation set, which lives
+in memory, preloaded at startup and kept current by a Firestore snapshot
+listener on the ``revoked_tokens`` collection (with a periodic reload in a
+background thread as fallback). Request handling never reads Firestore.
+
+A revocation is either a single token id (logout) or a per-user
+"not before" time that invalidates every token issued earlier (role
+change, deactivation, password reset, deletion).
+
+When TOKEN_SIGNING_SECRET is not set, signed tokens are not issued and
+the opaque ``auth_tokens`` flow keeps working unchanged.
+"""
+import os
+import hmac
+import json
+import time
+import base64
+import hashlib
+import logging
+import secrets
+import threading
+from datetime import datetime, timedelta, timezone
+
+from app.services.firestore_service import fs_client
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PREFIX = "v1"
+REVOCATIONS_COLLECTION = "revoked_tokens"
+TOKEN_SIGNING_SECRET = os.getenv("TOKEN_SIGNING_SECRET", "")
+# Still accepted for verification after rotating TOKEN_SIGNING_SECRET
+TOKEN_SIGNING_PREVIOUS_SECRET = os.getenv("TOKEN_SIGNING_PREVIOUS_SECRET", "")
+TOKEN_TTL_SECONDS = int(os.getenv("TOKEN_TTL_SECONDS", str(7 * 24 * 3600)))
+REVOCATION_REFRESH_SECONDS = int(os.getenv("REVOCATION_REFRESH_SECONDS", "30"))
+REVOCATION_LISTENER_ENABLED = os.getenv("REVOCATION_LISTENER_ENABLED", "true").lower() == "true"
+
+_lock = threading.Lock()
+_revoked_ids = {}        # token id -> expiry (epoch seconds)
+_users_not_before = {}   # user id -> epoch seconds; tokens issued earlier are revoked
+_loaded_at = 0.0
+_watch = None
+_reloader = None
+_stop = threading.Event()
+
+
+def signing_enabled() -> bool:
+    return bool(TOKEN_SIGNING_SECRET)
+
+
+def is_signed_token(token: str) -> bool:
+    return token.startswith(f"{TOKEN_PREFIX}.")
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _sign(secret: str, signing_input: str) -> str:
+    return _b64encode(hmac.new(secret.encode("utf-8"), signing_input.encode("ascii"), hashlib.sha256).digest())
+
+
+def issue_token(user_id: str, email: str, role: str) -> str:
+    now = round(time.time(), 3)
+    payload = {
+        "sub": user_id,
+        "email": email,
+        "role": role,
+        "iat": now,
+        "exp": now + TOKEN_TTL_SECONDS,
+        "jti": secrets.token_urlsafe(12),
+    }
+    body = _b64encode(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+    signing_input = f"{TOKEN_PREFIX}.{body}"
+    return f"{signing_input}.{_sign(TOKEN_SIGNING_SECRET, signing_input)}"
+
+
+def _to_token_data(token: str, payload: dict) -> dict:
+    """Same shape as an ``auth_tokens`` document, so callers need not care which kind they got."""
+    return {
+        "token": token,
+        "jti": payload["jti"],
+        "user_id": payload["sub"],
+        "email": payload.get("email"),
+        "role": payload.get("role"),
+        "created_at": datetime.fromtimestamp(payload["iat"], timezone.utc),
+        "expires_at": datetime.fromtimestamp(payload["exp"], timezone.utc),
+    }
+
+
+def verify_signed_token(token: str):
+    """Return token data for a valid, unexpired, unrevoked signed token, else None."""
+    try:
+        prefix, body, signature = token.split(".")
+    except ValueError:
+        return None
+    if prefix != TOKEN_PREFIX:
+        return None
+
+    signing_input = f"{prefix}.{body}"
+    secrets_to_try = [s for s in (TOKEN_SIGNING_SECRET, TOKEN_SIGNING_PREVIOUS_SECRET) if s]
+    if not any(hmac.compare_digest(signature, _sign(s, signing_input)) for s in secrets_to_try):
+        return None
+
+    try:
+        payload = json.loads(_b64decode(body))
+    except ValueError:
+        return None
+    if payload.get("exp", 0) < time.time():
+        return None
+    if is_revoked(payload):
+        return None
+    return _to_token_data(token, payload)
+
+
+# ----- revocation set -----
+def _epoch(value) -> float:
+    return value.timestamp() if isinstance(value, datetime) else float(value or 0)
+
+
+def _load(docs):
+    global _revoked_ids, _users_not_before, _loaded_at
+    revoked_ids, users_not_before = {}, {}
+    for doc in docs:
+        data = doc.to_dict() or {}
+        if data.get("jti"):
+            revoked_ids[data["jti"]] = _epoch(data.get("expires_at"))
+        elif data.get("user_id"):
+            users_not_before[data["user_id"]] = _epoch(data.get("not_before"))
+    with _lock:
+        _revoked_ids = revoked_ids
+        _users_not_before = users_not_before
+        _loaded_at = time.monotonic()
+    logger.info(f"Token revocation set loaded: {len(revoked_ids)} tokens, {len(users_not_before)} users")
+
+
+def _active_revocations_query():
+    # Revocations stop mattering once every token they cover has expired
+    now = datetime.now(timezone.utc)
+    return fs_client.collection(REVOCATIONS_COLLECTION).where("expires_at", ">", now)
+
+
+def _listener_active() -> bool:
+    return _watch is not None and getattr(_watch, "is_active", False)
+
+
+def _on_snapshot(docs, changes, read_time):
+    _load(docs)
+
+
+def refresh():
+    """Reload the revocation set from Firestore."""
+    _load(_active_revocations_query().stream())
+
+
+def _reload_loop():
+    # Fallback for when the listener is down (or disabled): reload periodically,
+    # which also retries a preload that failed at startup
+    while not _stop.wait(REVOCATION_REFRESH_SECONDS):
+        if _listener_active():
+            continue
+        try:
+            refresh()
+        except Exception as e:
+            logger.error(f"Token revocation reload failed: {str(e)}")
+
+
+def start():
+    """
+    Preload the revocation set, attach the snapshot listener and start the
+    fallback reload thread. Called once from app startup; safe to call again.
+    """
+    global _watch, _reloader
+    with _lock:
+        if _reloader is not None:
+            return
+        _reloader = threading.Thread(target=_reload_loop, name="token-revocation-reload", daemon=True)
+    try:
+        refresh()
+    except Exception as e:
+        logger.error(f"Token revocation preload failed, retrying in the background: {str(e)}")
+    if REVOCATION_LISTENER_ENABLED:
+        try:
+            _watch = _active_revocations_query().on_snapshot(_on_snapshot)
+            logger.info("Token revocation listener started")
+        except Exception as e:
+            logger.warning(f"Could not start token revocation listener, using periodic reload: {e}")
+            _watch = None
+    _reloader.start()
+
+
+def stop():
+    _stop.set()
+    if _watch is not None:
+        _watch.unsubscribe()
+
+
+def is_revoked(payload: dict) -> bool:
+    """
+    Check a verified payload against the in-memory revocation set. Never
+    touches Firestore: the set is loaded by start() and kept current by the
+    listener or the reload thread, so an outage only delays new revocations.
+    """
+    with _lock:
+        if payload.get("jti") in _revoked_ids:
+            return True
+        return payload.get("iat", 0) < _users_not_before.get(payload.get("sub"), 0)
+
+
+def revoke_token(token_data: dict):
+    """Revoke a single signed token (logout)."""
+    jti = token_data.get("jti")
+    if not jti:
+        return
+    expires_at = token_data["expires_at"]
+    fs_client.collection(REVOCATIONS_COLLECTION).document(jti).set({
+        "jti": jti,
+        "user_id": token_data.get("user_id"),
+        "expires_at": expires_at,
+        "revoked_at": datetime.now(timezone.utc),
+    })
+    with _lock:
+        _revoked_ids[jti] = _epoch(expires_at)
+
+
+def revoke_user(user_id: str):
+    """Revoke every signed token issued to a user before now."""
+    now = datetime.now(timezone.utc)
+    # Token issue times are rounded to the millisecond; step past this one
+    not_before = round(now.timestamp(), 3) + 0.001
+    fs_client.collection(REVOCATIONS_COLLECTION).document(f"user_{user_id}").set({
+        "user_id": user_id,
+        "not_before": not_before,
+        "expires_at": now + timedelta(seconds=TOKEN_TTL_SECONDS + 1),
+        "revoked_at": now,
+    })
+    with _lock:
+        _users_not_before[user_id] = not_before
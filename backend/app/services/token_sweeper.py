@@ -0,0 +1,102 @@
+"""
+Sweeper for expired opaque session tokens in ``auth_tokens``.
+
+Meant to be triggered by Cloud Scheduler (POST /auth/tokens/sweep, with
+SCHEDULER_SECRET in X-Scheduler-Secret). Each run walks the expired tokens
+oldest first through the single-field ``expires_at`` index, reading only
+their names and ``expires_at``, and deletes them with batched writes of at
+most TOKEN_SWEEP_BATCH_SIZE. A run stops after TOKEN_SWEEP_MAX_SECONDS so
+it fits the scheduler's deadline; because swept tokens are gone, the next
+run simply picks up where the last one stopped. Progress and totals are kept in ``maintenance/auth_token_sweep``.
+"""
+import os
+import time
+import logging
+from datetime import datetime, timezone
+from google.cloud import firestore
+
+from app.services.firestore_service import fs_client, TOKENS_COLLECTION
+
+logger = logging.getLogger(__name__)
+
+# Firestore allows 500 writes per batch
+TOKEN_SWEEP_BATCH_SIZE = min(int(os.getenv("TOKEN_SWEEP_BATCH_SIZE", "500")), 500)
+TOKEN_SWEEP_MAX_SECONDS = float(os.getenv("TOKEN_SWEEP_MAX_SECONDS", "240"))
+SWEEP_STATE_DOC = ("maintenance", "auth_token_sweep")
+
+
+def _state_ref():
+    return fs_client.collection(SWEEP_STATE_DOC[0]).document(SWEEP_STATE_DOC[1])
+
+
+def sweep_expired_tokens(max_seconds: float = None):
+    """
+    Delete expired auth tokens in bounded batches.
+
+    Returns counts for this run and whether the backlog was cleared
+    (`complete`); an incomplete run is resumed by the next one.
+    """
+    max_seconds = TOKEN_SWEEP_MAX_SECONDS if max_seconds is None else max_seconds
+    started = time.monotonic()
+    cutoff = datetime.now(timezone.utc)
+    deleted = 0
+    batches = 0
+    complete = False
+    last_expires_at = None
+
+    while time.monotonic() - started < max_seconds:
+        # Projected read: document names plus expires_at, never the token's user data
+        docs = list(
+            fs_client.collection(TOKENS_COLLECTION)
+            .where("expires_at", "<", cutoff)
+            .order_by("expires_at")
+            .select(["expires_at"])
+            .limit(TOKEN_SWEEP_BATCH_SIZE)
+            .stream()
+        )
+        if not docs:
+            complete = True
+            break
+
+        batch = fs_client.batch()
+        for doc in docs:
+            batch.delete(doc.reference)
+        batch.commit()
+
+        deleted += len(docs)
+        batches += 1
+        last_expires_at = docs[-1].to_dict().get("expires_at")
+        if len(docs) < TOKEN_SWEEP_BATCH_SIZE:
+            complete = True
+            break
+
+    elapsed = round(time.monotonic() - started, 2)
+    result = {
+        "success": True,
+        "deleted": deleted,
+        "batches": batches,
+        "complete": complete,
+        "cutoff": cutoff.isoformat(),
+        "swept_through": last_expires_at.isoformat() if last_expires_at else None,
+        "elapsed_seconds": elapsed,
+    }
+
+    try:
+        _state_ref().set({
+            "last_run_at": cutoff,
+            "last_run_deleted": deleted,
+            "last_run_complete": complete,
+            "swept_through": last_expires_at,
+            "total_deleted": firestore.Increment(deleted),
+        }, merge=True)
+    except Exception as e:
+        logger.warning(f"Could not record token sweep progress: {e}")
+
+    logger.info(f"Token sweep deleted {deleted} expired tokens in {batches} batches "
+                f"({elapsed}s, complete={complete})")
+    return result
+
+
+def get_sweep_status():
+    doc = _state_ref().get()
+    return doc.to_dict() if doc.exists else {}
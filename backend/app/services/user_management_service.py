@@ -1,24 +1,210 @@
 from fastapi import HTTPException, status
-from app.utils.security import hash_password
+from app.utils.security import hash_password, PasswordHasherBusy
 from app.services.firestore_service import fs_client, get_user_by_email
+from app.services import recipient_directory, session_tokens
 from app.models.user_model import UserSignup, UserUpdate
 from datetime import datetime
+import base64
+import json
+import time
+import threading
 
-def get_all_users():
-    """Get all users from Firestore"""
+# Fields returned by the admin list; `password` is never read
+USER_LIST_FIELDS = [
+    "email",
+    "full_name",
+    "organization",
+    "role",
+    "is_active",
+    "created_at",
+    "updated_at",
+    "emailNotifications",
+]
+# Lowercased copies of email/full_name that back prefix search
+SEARCH_FIELDS = {"email": "email_lower", "name": "full_name_lower"}
+# Until every user has an ordering field, recheck this often instead of on every page
+USER_FIELDS_RECHECK_SECONDS = 300
+
+_fields_lock = threading.Lock()
+_complete_fields = set()     # ordering fields known to be present on every user document
+_incomplete_checked = {}     # field -> monotonic time it was last found missing somewhere
+
+
+def search_fields(email: str = None, full_name: str = None) -> dict:
+    """Lowercased search fields to store alongside email/full_name."""
+    fields = {}
+    if email is not None:
+        fields["email_lower"] = email.lower()
+    if full_name is not None:
+        fields["full_name_lower"] = full_name.lower()
+    return fields
+
+
+def _hash_or_503(password: str) -> str:
+    try:
+        return hash_password(password)
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Password hashing is busy, retry shortly",
+                            headers={"Retry-After": "1"})
+
+
+def _encode_cursor(value, doc_id: str) -> str:
+    if hasattr(value, "isoformat"):
+        value = value.isoformat()
+    return base64.urlsafe_b64encode(json.dumps([value, doc_id]).encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor: str):
+    try:
+        value, doc_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return value, doc_id
+
+
+def _public_user(user_data: dict, doc_id: str) -> dict:
+    for field in SEARCH_FIELDS.values():
+        user_data.pop(field, None)
+    user_data.pop("password", None)
+    user_data["id"] = doc_id
+    return user_data
+
+
+def _field_on_every_user(users_ref, field: str) -> bool:
+    """
+    Ordering on a field skips documents that lack it, so paged queries are
+    only complete once every user carries it. Compared with two count()
+    aggregations; a True answer is remembered since new users always get
+    the field, a False one for USER_FIELDS_RECHECK_SECONDS.
+    """
+    with _fields_lock:
+        if field in _complete_fields:
+            return True
+        checked = _incomplete_checked.get(field)
+        if checked is not None and time.monotonic() - checked < USER_FIELDS_RECHECK_SECONDS:
+            return False
+    total = users_ref.count().get()[0][0].value
+    with_field = users_ref.order_by(field).count().get()[0][0].value
+    with _fields_lock:
+        if with_field < total:
+            _incomplete_checked[field] = time.monotonic()
+            return False
+        _complete_fields.add(field)
+        _incomplete_checked.pop(field, None)
+    return True
+
+
+def _unpaged_users(users_ref, search: str = None, search_by: str = "email") -> dict:
+    """The listing before paging: every user in one response, prefix filtered in Python."""
+    source = {"email": "email", "name": "full_name"}[search_by]
+    prefix = search.strip().lower() if search else None
+    users = []
+    for doc in users_ref.select(USER_LIST_FIELDS).stream():
+        user_data = doc.to_dict()
+        if prefix is not None and not str(user_data.get(source) or "").lower().startswith(prefix):
+            continue
+        users.append(_public_user(user_data, doc.id))
+    return {"users": users, "count": len(users), "next_cursor": None, "total": len(users)}
+
+
+def get_all_users(limit: int = 50, cursor: str = None, search: str = None, search_by: str = "email"):
+    """
+    Fetch one page of users for the admin console.
+
+    Without `search`, users are listed newest first. With `search`, users
+    whose email (or full name, with search_by="name") starts with the term
+    are listed alphabetically, using the lowercased email_lower /
+    full_name_lower fields and their single-field indexes. Only the fields
+    in USER_LIST_FIELDS are read. `cursor` is the `next_cursor` returned
+    by the previous page.
+
+    Until every user has the ordering field (created_at, or the search
+    field before POST /admin/users/backfill-search has run), all matching
+    users are returned in a single unpaged response instead, so older
+    accounts are not silently left out.
+    """
     try:
         users_ref = fs_client.collection("users")
-        docs = users_ref.stream()
+        if search and search_by not in SEARCH_FIELDS:
+            raise HTTPException(status_code=400, detail="search_by must be 'email' or 'name'")
+        order_field = SEARCH_FIELDS[search_by] if search else "created_at"
+        if not _field_on_every_user(users_ref, order_field):
+            return _unpaged_users(users_ref, search, search_by)
+
+        if search:
+            prefix = search.strip().lower()
+            query = (
+                users_ref.where(order_field, ">=", prefix)
+                .where(order_field, "<", prefix + "\uf8ff")
+                .order_by(order_field)
+                .order_by("__name__")
+            )
+        else:
+            query = (
+                users_ref.order_by("created_at", direction="DESCENDING")
+                .order_by("__name__", direction="DESCENDING")
+            )
+
+        if cursor:
+            value, doc_id = _decode_cursor(cursor)
+            if order_field == "created_at":
+                try:
+                    value = datetime.fromisoformat(value)
+                except (ValueError, TypeError):
+                    raise HTTPException(status_code=400, detail="Invalid cursor")
+            query = query.start_after({order_field: value, "__name__": users_ref.document(doc_id)})
+
+        fields = USER_LIST_FIELDS if order_field in USER_LIST_FIELDS else USER_LIST_FIELDS + [order_field]
+        query = query.select(fields).limit(limit)
+
         users = []
-        for doc in docs:
+        last_value = None
+        for doc in query.stream():
             user_data = doc.to_dict()
-            user_data["id"] = doc.id
-            user_data.pop("password", None)
-            users.append(user_data)
-        return {"users": users, "total": len(users)}
+            last_value = user_data.get(order_field)
+            users.append(_public_user(user_data, doc.id))
+
+        next_cursor = _encode_cursor(last_value, users[-1]["id"]) if users and len(users) == limit else None
+        page = {"users": users, "count": len(users), "next_cursor": next_cursor}
+        if not cursor and not search:
+            # Count aggregation reads index entries, not documents
+            page["total"] = users_ref.count().get()[0][0].value
+        return page
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching users: {str(e)}")
 
+
+def backfill_search_fields(batch_size: int = 400):
+    """One-off: add email_lower/full_name_lower to users created before search existed."""
+    try:
+        users_ref = fs_client.collection("users")
+        updated = 0
+        batch = fs_client.batch()
+        pending = 0
+        for doc in users_ref.select(["email", "full_name", "email_lower", "full_name_lower"]).stream():
+            data = doc.to_dict()
+            fields = search_fields(data.get("email"), data.get("full_name"))
+            if all(data.get(key) == value for key, value in fields.items()):
+                continue
+            batch.update(doc.reference, fields)
+            pending += 1
+            updated += 1
+            if pending >= batch_size:
+                batch.commit()
+                batch = fs_client.batch()
+                pending = 0
+        if pending:
+            batch.commit()
+        with _fields_lock:
+            # Let the next listing recheck right away
+            for field in SEARCH_FIELDS.values():
+                _incomplete_checked.pop(field, None)
+        return {"message": "Search fields backfilled", "updated": updated}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error backfilling search fields: {str(e)}")
+
 def get_user_by_id(user_id: str):
     """Get user by ID"""
     try:
@@ -42,7 +228,7 @@ def create_user_by_admin(user_data: UserSignup):
         if user_data.role not in ["admin", "operator"]:
             raise HTTPException(status_code=400, detail="Invalid role. Must be 'admin' or 'operator'")
         
-        hashed_password = hash_password(user_data.password)
+        hashed_password = _hash_or_503(user_data.password)
         
         user_doc = {
             "email": user_data.email,
@@ -52,10 +238,12 @@ def create_user_by_admin(user_data: UserSignup):
             "role": user_data.role,
             "is_active": True,
             "created_at": datetime.utcnow(),
+            **search_fields(user_data.email, user_data.full_name),
         }
         
         doc_ref = fs_client.collection("users").add(user_doc)
         user_id = doc_ref[1].id
+        recipient_directory.invalidate()
         
         return {
             "id": user_id,
@@ -72,6 +260,20 @@ def create_user_by_admin(user_data: UserSignup):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating user: {str(e)}")
 
+def needs_revocation(existing: dict, changes: dict) -> bool:
+    """
+    True when an update invalidates the user's sessions: the role actually
+    changes, a new password is set, or an active account is deactivated.
+    The edit form always sends role and is_active, so unchanged values must
+    not end sessions.
+    """
+    if "role" in changes and changes["role"] != existing.get("role"):
+        return True
+    if "password" in changes:
+        return True
+    return changes.get("is_active") is False and existing.get("is_active", True) is not False
+
+
 def update_user(user_id: str, user_data: UserUpdate):
     """Update user information"""
     try:
@@ -92,6 +294,7 @@ def update_user(user_id: str, user_data: UserUpdate):
         
         if user_data.full_name is not None:
             update_dict["full_name"] = user_data.full_name
+            update_dict.update(search_fields(full_name=user_data.full_name))
         
         if user_data.role is not None:
             if user_data.role not in ["admin", "operator"]:
@@ -107,16 +310,18 @@ def update_user(user_id: str, user_data: UserUpdate):
         if user_data.new_password is not None and user_data.new_password.strip():
             if len(user_data.new_password) < 6:
                 raise HTTPException(status_code=400, detail="Password must be at least 6 characters")
-            hashed_password = hash_password(user_data.new_password)
+            hashed_password = _hash_or_503(user_data.new_password)
             update_dict["password"] = hashed_password
         
         update_dict["updated_at"] = datetime.utcnow()
         
         user_ref.update(update_dict)
+        recipient_directory.invalidate()
+        if needs_revocation(existing_user_data, update_dict):
+            # Signed tokens carry the role, so end sessions issued under the old account state
+            session_tokens.revoke_user(user_id)
         
-        updated_user = user_ref.get().to_dict()
-        updated_user["id"] = user_id
-        updated_user.pop("password", None)
+        updated_user = _public_user(user_ref.get().to_dict(), user_id)
         
         return {"message": "User updated successfully", "user": updated_user}
     except HTTPException:
@@ -141,6 +346,8 @@ def delete_user(user_id: str):
             )
         
         user_ref.delete()
+        recipient_directory.invalidate()
+        session_tokens.revoke_user(user_id)
         
         return {"message": "User deleted successfully", "user_id": user_id}
     except HTTPException:
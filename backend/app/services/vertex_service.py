@@ -1,15 +1,22 @@
-from google.cloud import aiplatform
+from functools import lru_cache
+from app.utils import providers
+from app.utils.resilience import vertex_energy
 import os
 
 PROJECT_ID = os.getenv("GCP_PROJECT_ID", "xement-ai")
 LOCATION = os.getenv("VERTEX_REGION", "us-central1")
 ENDPOINT_ID = os.getenv("VERTEX_ENDPOINT_ID", "endpoint-id")
 
-aiplatform.init(project=PROJECT_ID, location=LOCATION)
+@lru_cache(maxsize=1)
+def get_endpoint():
+    """Resolve the Vertex endpoint once per process instead of on every prediction."""
+    aiplatform = providers.get("aiplatform")
+    return aiplatform.Endpoint(endpoint_name=f"projects/{PROJECT_ID}/locations/{LOCATION}/endpoints/{ENDPOINT_ID}")
 
 def predict_energy(instance: dict) -> float:
-    endpoint = aiplatform.Endpoint(endpoint_name=f"projects/{PROJECT_ID}/locations/{LOCATION}/endpoints/{ENDPOINT_ID}")
-    predictions = endpoint.predict(instances=[instance])
+    predictions = vertex_energy.call(
+        lambda: get_endpoint().predict(instances=[instance], timeout=vertex_energy.timeout)
+    )
     pred = predictions.predictions[0]
     if isinstance(pred, dict):
         for v in pred.values():
@@ -0,0 +1,159 @@
+"""
+Startup warm-up.
+
+Cloud Run routes traffic to a new instance as soon as it accepts
+connections, so the first requests used to pay for BigQuery/Firestore
+auth and channel setup, Vertex endpoint resolution and empty caches.
+`start()` runs those steps in parallel in the background right after
+startup; GET /ready returns 503 until they have all finished or
+WARMUP_DEADLINE_SECONDS has passed, so a Cloud Run startup probe on
+/ready holds traffic back until the instance is warm.
+
+A failing step is logged and reported but never keeps the instance from
+becoming ready: the request that needs it will simply pay the cost.
+"""
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger("xement-ai")
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+WARMUP_DEADLINE_SECONDS = float(os.getenv("WARMUP_DEADLINE_SECONDS", "25"))
+WARMUP_VERTEX_ENDPOINTS = os.getenv("WARMUP_VERTEX_ENDPOINTS", "true").lower() == "true"
+
+_lock = threading.Lock()
+_started_at = None
+_finished_at = None
+_steps = {}
+
+
+def _open_firestore():
+    from app.utils import providers
+    providers.get("firestore")
+
+
+def _open_bigquery():
+    from app.utils import providers
+    providers.get("bigquery")
+
+
+def _latest_state():
+    # Same query and caches the dashboard hits first
+    from app.routers.public_router import get_latest_state
+    get_latest_state()
+
+
+def _plant_context():
+    from app.services.context_service import get_shared_context
+    get_shared_context()
+
+
+def _alerts():
+    from app.services.anomaly_detector import get_recent_alerts
+    from app.services.alert_summary import get_alert_summary
+    get_recent_alerts(limit=50)
+    get_alert_summary()
+
+
+def _thresholds():
+    from app.routers.config_router import DEFAULT_THRESHOLDS
+    from app.services.anomaly_detector import check_anomalies_with_thresholds
+    check_anomalies_with_thresholds({}, DEFAULT_THRESHOLDS)
+
+
+def _vertex_endpoints():
+    from app.services import vertex_service, fuel_simulator
+    vertex_service.get_endpoint()
+    fuel_simulator.get_endpoint()
+
+
+def _chat_model():
+    from app.services.chatbot_service import get_chat_model, GEMINI_API_KEY
+    if GEMINI_API_KEY:
+        get_chat_model()
+
+
+def _warmup_steps() -> dict:
+    steps = {
+        "firestore": _open_firestore,
+        "bigquery": _open_bigquery,
+        "latest_state": _latest_state,
+        "plant_context": _plant_context,
+        "alerts": _alerts,
+        "thresholds": _thresholds,
+        "chat_model": _chat_model,
+    }
+    if WARMUP_VERTEX_ENDPOINTS:
+        steps["vertex_endpoints"] = _vertex_endpoints
+    return steps
+
+
+def _run_step(name: str, fn):
+    started = time.perf_counter()
+    try:
+        fn()
+        status, error = "ok", None
+    except Exception as e:
+        status, error = "failed", str(e)
+        logger.warning(f"Warm-up step {name} failed: {e}")
+    with _lock:
+        _steps[name] = {
+            "status": status,
+            "ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+        if error:
+            _steps[name]["error"] = error
+
+
+def _run_all():
+    global _finished_at
+    steps = _warmup_steps()
+    with _lock:
+        for name in steps:
+            _steps[name] = {"status": "running"}
+    with ThreadPoolExecutor(max_workers=len(steps), thread_name_prefix="warmup") as pool:
+        for name, fn in steps.items():
+            pool.submit(_run_step, name, fn)
+    with _lock:
+        _finished_at = time.monotonic()
+        outcome = {name: step["status"] for name, step in _steps.items()}
+    logger.info(f"Warm-up finished in {_finished_at - _started_at:.2f}s: {outcome}")
+
+
+def start():
+    """Kick off warm-up in the background. Safe to call more than once."""
+    global _started_at, _finished_at
+    with _lock:
+        if _started_at is not None:
+            return
+        _started_at = time.monotonic()
+        if not WARMUP_ENABLED:
+            _finished_at = _started_at
+            return
+    threading.Thread(target=_run_all, name="warmup", daemon=True).start()
+
+
+def status() -> dict:
+    """Readiness: ready once warm-up has finished or its deadline has passed."""
+    with _lock:
+        steps = {name: dict(step) for name, step in _steps.items()}
+        started_at, finished_at = _started_at, _finished_at
+    if started_at is None:
+        return {"ready": False, "state": "not_started", "steps": steps}
+    elapsed = (finished_at or time.monotonic()) - started_at
+    if finished_at is not None:
+        state = "warm"
+    elif elapsed >= WARMUP_DEADLINE_SECONDS:
+        state = "deadline_exceeded"
+    else:
+        state = "warming"
+    return {
+        "ready": state != "warming",
+        "state": state,
+        "elapsed_seconds": round(elapsed, 2),
+        "deadline_seconds": WARMUP_DEADLINE_SECONDS,
+        "steps": steps,
+    }
@@ -0,0 +1,162 @@
+"""
+In-process metrics in Prometheus text format.
+
+Three kinds of measurements are recorded:
+- request latency per route (`xement_http_request_duration_seconds`),
+  observed by MetricsMiddleware,
+- outbound call latency and outcome per dependency, operation and router
+  (`xement_dependency_call_duration_seconds`, `xement_dependency_calls_total`),
+  recorded with `timed(...)` or `observe_dependency(...)`,
+- cache lookups (`xement_cache_requests_total`), recorded with `cache_result`.
+
+The router label of an outbound call comes from a context variable set by
+the middleware, so calls made on the threadpool or in the resilience
+executors are attributed to the route that triggered them. Recording a
+sample is a dict lookup and a few additions under a lock; `render()` is
+only paid when /metrics is scraped.
+"""
+import time
+import bisect
+import threading
+import contextvars
+from contextlib import contextmanager
+from app.utils import tracing
+
+# Seconds; covers cache hits (sub-ms) through slow Gemini calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+INF_LABEL = 'le="+Inf"'
+
+current_router = contextvars.ContextVar("current_router", default="background")
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1.0):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def value(self, *label_values) -> float:
+        with self._lock:
+            return self._values.get(label_values, 0.0)
+
+    def items(self) -> list:
+        """Snapshot of (label values, value) pairs."""
+        with self._lock:
+            return list(self._values.items())
+
+    def render(self) -> list:
+        items = sorted(self.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for label_values, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list:
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for label_values, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = _format_labels(self.labels, label_values, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labels, label_values, INF_LABEL)} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, label_values)} {series[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, label_values)} {series[-1]}")
+        return lines
+
+
+_registry = []
+
+
+def register(metric):
+    _registry.append(metric)
+    return metric
+
+
+http_request_duration = register(Histogram(
+    "xement_http_request_duration_seconds", "Request latency by route",
+    labels=("method", "route", "status"),
+))
+dependency_call_duration = register(Histogram(
+    "xement_dependency_call_duration_seconds", "Outbound call latency",
+    labels=("dependency", "operation", "router"),
+))
+dependency_calls = register(Counter(
+    "xement_dependency_calls_total", "Outbound calls by outcome",
+    labels=("dependency", "operation", "router", "outcome"),
+))
+cache_requests = register(Counter(
+    "xement_cache_requests_total", "Cache lookups by result",
+    labels=("cache", "result"),
+))
+
+
+def observe_dependency(dependency: str, operation: str, seconds: float, ok: bool = True):
+    router = current_router.get()
+    dependency_call_duration.observe(seconds, dependency, operation, router)
+    dependency_calls.inc(dependency, operation, router, "ok" if ok else "error")
+
+
+@contextmanager
+def timed(dependency: str, operation: str):
+    """Time an outbound call: `with metrics.timed("bigquery", "latest_state"): ...`"""
+    started = time.perf_counter()
+    ok = False
+    try:
+        with tracing.span(f"{dependency}.{operation}"):
+            yield
+        ok = True
+    finally:
+        observe_dependency(dependency, operation, time.perf_counter() - started, ok)
+
+
+def cache_result(cache: str, hit: bool):
+    cache_requests.inc(cache, "hit" if hit else "miss")
+
+
+def render() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,137 @@
+"""
+Registry of lazily created SDK clients.
+
+Heavy Google SDKs (aiplatform, vertexai, google.generativeai) and the
+shared Firestore/BigQuery clients are imported and initialised on first
+use rather than when `app.main` is imported, so a new Cloud Run instance
+starts serving before it has paid for SDKs its first requests may never
+touch. Each provider is created once per process; `loaded()` reports
+which ones exist and how long each took to create.
+
+Modules that used to hold a client at module level keep the same name,
+bound to `lazy(...)`, e.g. ``fs_client = providers.lazy("firestore")``.
+"""
+import os
+import time
+import logging
+import threading
+
+logger = logging.getLogger("xement-ai")
+
+FIRESTORE_DATABASE = os.getenv("FIRESTORE_DATABASE", "xement-ai-firestore")
+
+_factories = {}
+_instances = {}
+_load_seconds = {}
+_locks = {}
+_lock = threading.Lock()
+
+
+def register(name: str, factory):
+    """Register a zero-argument factory. Re-registering replaces an unloaded provider."""
+    with _lock:
+        _factories[name] = factory
+        _locks.setdefault(name, threading.Lock())
+
+
+def get(name: str):
+    """Return the provider, creating it on first use."""
+    instance = _instances.get(name)
+    if instance is not None:
+        return instance
+    # One lock per provider, so different providers can be created in parallel
+    with _locks[name]:
+        instance = _instances.get(name)
+        if instance is None:
+            started = time.perf_counter()
+            instance = _factories[name]()
+            _load_seconds[name] = time.perf_counter() - started
+            _instances[name] = instance
+            logger.info(f"Provider {name} loaded in {_load_seconds[name] * 1000:.0f} ms")
+    return instance
+
+
+def names() -> list:
+    return sorted(_factories)
+
+
+def is_loaded(name: str) -> bool:
+    return name in _instances
+
+
+def loaded() -> dict:
+    """Milliseconds spent creating each provider loaded so far."""
+    return {name: round(seconds * 1000, 1) for name, seconds in sorted(_load_seconds.items())}
+
+
+def load_all():
+    """Create every registered provider now (what importing the app used to do)."""
+    for name in names():
+        get(name)
+
+
+class LazyClient:
+    """Stand-in for a client attribute that creates the client on first attribute access."""
+
+    def __init__(self, name: str):
+        self._name = name
+
+    def __getattr__(self, item):
+        return getattr(get(self._name), item)
+
+    def __repr__(self):
+        state = "loaded" if is_loaded(self._name) else "not loaded"
+        return f"<LazyClient {self._name} ({state})>"
+
+
+def lazy(name: str) -> LazyClient:
+    return LazyClient(name)
+
+
+# ----- built-in providers -----
+def _firestore():
+    from google.cloud import firestore
+    return firestore.Client(database=FIRESTORE_DATABASE)
+
+
+def _bigquery():
+    from google.cloud import bigquery
+    return bigquery.Client()
+
+
+def _aiplatform():
+    from google.cloud import aiplatform
+    aiplatform.init(
+        project=os.getenv("GCP_PROJECT_ID", "xement-ai"),
+        location=os.getenv("VERTEX_REGION", "us-central1"),
+    )
+    return aiplatform
+
+
+def _vertexai():
+    import vertexai
+    vertexai.init(project=os.getenv("GOOGLE_CLOUD_PROJECT", "xement-ai"), location="us-central1")
+    return vertexai
+
+
+def _genai():
+    import google.generativeai as genai
+    api_key = os.getenv("GEMINI_API_KEY")
+    if api_key:
+        genai.configure(api_key=api_key)
+    return genai
+
+
+register("firestore", _firestore)
+register("bigquery", _bigquery)
+register("aiplatform", _aiplatform)
+register("vertexai", _vertexai)
+register("genai", _genai)
+
+
+def firestore_client():
+    return get("firestore")
+
+
+def bigquery_client():
+    return get("bigquery")
@@ -0,0 +1,251 @@
+"""
+Resilience wrapper for outbound AI calls (Gemini, Vertex AI).
+
+Each remote dependency gets:
+- a deadline: the caller stops waiting after `timeout` seconds,
+- a bulkhead: at most `max_concurrency` calls in flight; extra calls are
+  rejected immediately instead of queueing on the request threadpool,
+- a circuit breaker: after `failure_threshold` consecutive failures the
+  dependency is skipped for `reset_timeout` seconds, then one trial call
+  decides whether to close it again.
+
+Every rejection raises a DependencyUnavailable subclass, so the callers'
+existing `except Exception` fallbacks (heuristics, fallback responses)
+kick in without waiting out the failure.
+
+Settings can be overridden per dependency with environment variables,
+e.g. VERTEX_ENERGY_TIMEOUT_SECONDS or GEMINI_CHAT_MAX_CONCURRENCY.
+"""
+import os
+import time
+import asyncio
+import logging
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from app.utils import metrics, tracing
+
+logger = logging.getLogger("xement-ai")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+LATENCY_WINDOW = 200
+
+
+class DependencyUnavailable(Exception):
+    """Raised when a call is not attempted or abandoned by the resilience layer."""
+
+
+class CircuitOpenError(DependencyUnavailable):
+    pass
+
+
+class BulkheadFullError(DependencyUnavailable):
+    pass
+
+
+class DependencyTimeoutError(DependencyUnavailable):
+    pass
+
+
+def _env_number(name: str, default, cast):
+    value = os.getenv(name)
+    return cast(value) if value else default
+
+
+class Dependency:
+    def __init__(self, name: str, timeout: float, max_concurrency: int,
+                 failure_threshold: int = 5, reset_timeout: float = 30.0):
+        prefix = name.upper()
+        self.name = name
+        # "gemini_chat" -> dependency "gemini", operation "chat" in the metrics
+        self.dependency, _, self.operation = name.partition("_")
+        self.timeout = _env_number(f"{prefix}_TIMEOUT_SECONDS", timeout, float)
+        self.max_concurrency = _env_number(f"{prefix}_MAX_CONCURRENCY", max_concurrency, int)
+        self.failure_threshold = _env_number(f"{prefix}_FAILURE_THRESHOLD", failure_threshold, int)
+        self.reset_timeout = _env_number(f"{prefix}_RESET_TIMEOUT_SECONDS", reset_timeout, float)
+
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._executor = None
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._consecutive_failures = 0
+        self._in_flight = 0
+        self._counts = {"calls": 0, "successes": 0, "failures": 0, "timeouts": 0,
+                        "rejected_open": 0, "rejected_full": 0}
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+
+    # ----- circuit breaker -----
+    def _admit(self):
+        with self._lock:
+            if self._state == OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    self._counts["rejected_open"] += 1
+                    raise CircuitOpenError(f"{self.name} circuit open")
+                self._state = HALF_OPEN
+            if self._state == HALF_OPEN:
+                if self._trial_in_flight:
+                    self._counts["rejected_open"] += 1
+                    raise CircuitOpenError(f"{self.name} circuit half-open, trial call in progress")
+                self._trial_in_flight = True
+
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._trial_in_flight = False
+                self._counts["rejected_full"] += 1
+            raise BulkheadFullError(f"{self.name} has {self.max_concurrency} calls in flight")
+
+        with self._lock:
+            self._counts["calls"] += 1
+            self._in_flight += 1
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def _record(self, started: float, error: Exception = None):
+        elapsed = time.perf_counter() - started
+        metrics.observe_dependency(self.dependency, self.operation or "call", elapsed, ok=error is None)
+        with self._lock:
+            self._latencies.append(elapsed)
+            self._trial_in_flight = False
+            if error is None:
+                self._counts["successes"] += 1
+                self._consecutive_failures = 0
+                if self._state != CLOSED:
+                    logger.info(f"Circuit for {self.name} closed")
+                self._state = CLOSED
+                return
+            self._counts["failures"] += 1
+            if isinstance(error, DependencyTimeoutError):
+                self._counts["timeouts"] += 1
+            self._consecutive_failures += 1
+            if self._state == HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    logger.warning(f"Circuit for {self.name} opened after {self._consecutive_failures} failures: {error}")
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+
+    def _abandon(self):
+        """A cancelled call says nothing about the dependency: just free the half-open trial slot."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    # ----- calls -----
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_concurrency,
+                        thread_name_prefix=f"dep-{self.name}"
+                    )
+        return self._executor
+
+    def call(self, fn, *args, **kwargs):
+        """Run a blocking call under the deadline, bulkhead and circuit breaker."""
+        self._admit()
+        started = time.perf_counter()
+        ctx = contextvars.copy_context()
+
+        def run():
+            try:
+                return ctx.run(fn, *args, **kwargs)
+            finally:
+                # The slot is held until the remote call really finishes
+                self._release()
+
+        try:
+            future = self._pool().submit(run)
+        except Exception:
+            self._release()
+            raise
+        try:
+            with tracing.span(f"{self.dependency}.{self.operation or 'call'}"):
+                result = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            error = DependencyTimeoutError(f"{self.name} timed out after {self.timeout}s")
+            self._record(started, error)
+            raise error
+        except Exception as e:
+            self._record(started, e)
+            raise
+        self._record(started)
+        return result
+
+    async def call_async(self, fn, *args, **kwargs):
+        """Await a coroutine function under the deadline, bulkhead and circuit breaker."""
+        self._admit()
+        started = time.perf_counter()
+        try:
+            with tracing.span(f"{self.dependency}.{self.operation or 'call'}"):
+                result = await asyncio.wait_for(fn(*args, **kwargs), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            error = DependencyTimeoutError(f"{self.name} timed out after {self.timeout}s")
+            self._record(started, error)
+            raise error
+        except asyncio.CancelledError:
+            # Client disconnect or an outer deadline; not a failure of the dependency
+            self._abandon()
+            raise
+        except Exception as e:
+            self._record(started, e)
+            raise
+        finally:
+            self._release()
+        self._record(started)
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            state = self._state
+            if state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                state = HALF_OPEN
+            stats = {
+                "state": state,
+                "in_flight": self._in_flight,
+                "consecutive_failures": self._consecutive_failures,
+                "timeout_seconds": self.timeout,
+                "max_concurrency": self.max_concurrency,
+                **self._counts,
+            }
+        if latencies:
+            stats["latency_ms"] = {
+                "avg": round(1000 * sum(latencies) / len(latencies), 1),
+                "p50": round(1000 * latencies[len(latencies) // 2], 1),
+                "p95": round(1000 * latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 1),
+                "max": round(1000 * latencies[-1], 1),
+            }
+        return stats
+
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def get_dependency(name: str, **defaults) -> Dependency:
+    """Return the shared wrapper for a dependency, creating it on first use."""
+    dependency = _registry.get(name)
+    if dependency is None:
+        with _registry_lock:
+            dependency = _registry.get(name)
+            if dependency is None:
+                dependency = Dependency(name, **defaults)
+                _registry[name] = dependency
+    return dependency
+
+
+def dependency_stats() -> dict:
+    return {name: dependency.stats() for name, dependency in sorted(_registry.items())}
+
+
+gemini_chat = get_dependency("gemini_chat", timeout=20.0, max_concurrency=8)
+gemini_recommendation = get_dependency("gemini_recommendation", timeout=30.0, max_concurrency=4)
+vertex_energy = get_dependency("vertex_energy", timeout=8.0, max_concurrency=8)
+vertex_fuel = get_dependency("vertex_fuel", timeout=8.0, max_concurrency=4)
@@ -1,8 +1,127 @@
+import os
+import asyncio
+import threading
+import multiprocessing
 import bcrypt
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
 
-def hash_password(password: str) -> str:
-    salt = bcrypt.gensalt()
+# bcrypt work factor for new hashes; existing hashes are upgraded on successful login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Dedicated processes for bcrypt so hashing never occupies the request threadpool
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+# Hashing jobs allowed in flight (running or waiting for a worker); more are rejected
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", str(PASSWORD_HASH_WORKERS * 4)))
+# Longest a caller waits for its hash before giving up
+PASSWORD_HASH_TIMEOUT_SECONDS = float(os.getenv("PASSWORD_HASH_TIMEOUT_SECONDS", "10"))
+
+_pool = None
+_in_flight = 0
+# Sync callers run on threadpool threads, async ones on the event loop
+_in_flight_lock = threading.Lock()
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing pool is saturated or a hash timed out."""
+
+
+def _hash(password: str, rounds: int) -> str:
+    salt = bcrypt.gensalt(rounds=rounds)
     return bcrypt.hashpw(password.encode("utf-8"), salt).decode("utf-8")
 
+
+def _verify(plain_password: str, hashed_password: str) -> bool:
+    try:
+        return bcrypt.checkpw(plain_password.encode("utf-8"), hashed_password.encode("utf-8"))
+    except ValueError:
+        # Missing or malformed stored hash
+        return False
+
+
+def _noop():
+    return None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # Workers are spawned, not forked: by the time the pool exists the process
+        # has gRPC channels and listener threads, and forking those can deadlock
+        _pool = ProcessPoolExecutor(
+            max_workers=PASSWORD_HASH_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+def start_pool():
+    """Create the pool and start its workers at startup so the first logins don't pay for spawning."""
+    pool = _get_pool()
+    for _ in range(PASSWORD_HASH_WORKERS):
+        pool.submit(_noop)
+
+
+def _claim_slot():
+    global _in_flight
+    with _in_flight_lock:
+        if _in_flight >= PASSWORD_HASH_MAX_PENDING:
+            raise PasswordHasherBusy(f"{_in_flight} password hashes already in flight")
+        _in_flight += 1
+
+
+def _free_slot():
+    global _in_flight
+    with _in_flight_lock:
+        _in_flight -= 1
+
+
+async def _run_in_pool(fn, *args):
+    _claim_slot()
+    try:
+        future = asyncio.get_running_loop().run_in_executor(_get_pool(), fn, *args)
+        return await asyncio.wait_for(future, PASSWORD_HASH_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        raise PasswordHasherBusy(f"password hash took longer than {PASSWORD_HASH_TIMEOUT_SECONDS}s")
+    finally:
+        _free_slot()
+
+
+def _run_in_pool_sync(fn, *args):
+    """Blocking counterpart of _run_in_pool for sync handlers, under the same bound."""
+    _claim_slot()
+    try:
+        return _get_pool().submit(fn, *args).result(timeout=PASSWORD_HASH_TIMEOUT_SECONDS)
+    except FutureTimeoutError:
+        raise PasswordHasherBusy(f"password hash took longer than {PASSWORD_HASH_TIMEOUT_SECONDS}s")
+    finally:
+        _free_slot()
+
+
+def hash_password(password: str) -> str:
+    return _run_in_pool_sync(_hash, password, BCRYPT_ROUNDS)
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return bcrypt.checkpw(plain_password.encode("utf-8"), hashed_password.encode("utf-8"))
+    return _run_in_pool_sync(_verify, plain_password, hashed_password)
+
+
+async def hash_password_async(password: str) -> str:
+    return await _run_in_pool(_hash, password, BCRYPT_ROUNDS)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run_in_pool(_verify, plain_password, hashed_password)
+
+
+def needs_rehash(hashed_password: str) -> bool:
+    """True when a stored hash was made with a different work factor than BCRYPT_ROUNDS."""
+    try:
+        return int(hashed_password.split("$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return False
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
@@ -0,0 +1,69 @@
+"""
+Fast JSON responses.
+
+`FastJSONResponse` renders with orjson, which serializes datetimes, dates,
+UUIDs, dataclasses and dicts/lists of them natively; `_default` covers the
+rest of what routers return (Decimal from BigQuery NUMERIC columns,
+Firestore's datetime subclass, pydantic models, BigQuery rows, sets).
+orjson writes NaN and infinities as null instead of failing the response.
+
+It is the app's default response class, so every endpoint renders through
+it. Endpoints with large payloads (/history, /latest_state, alert lists)
+return it directly to also skip FastAPI's jsonable_encoder pass, which
+walks every value in Python before rendering.
+
+Without orjson installed, rendering falls back to the standard library,
+with NaN and infinities mapped to null the same way.
+"""
+import json
+import math
+import datetime
+from decimal import Decimal
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+
+def _default(obj):
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if hasattr(obj, "dict") and callable(obj.dict):
+        return obj.dict()
+    if hasattr(obj, "items") and callable(obj.items):
+        return dict(obj.items())
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+if orjson is not None:
+    def dumps(content) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+else:
+    def _finite(obj):
+        """Copy of obj with non-finite floats replaced by None; json.dumps would write bare NaN."""
+        if isinstance(obj, float):
+            return obj if math.isfinite(obj) else None
+        if isinstance(obj, dict):
+            return {key: _finite(value) for key, value in obj.items()}
+        if isinstance(obj, (list, tuple)):
+            return [_finite(value) for value in obj]
+        return obj
+
+    def dumps(content) -> bytes:
+        return json.dumps(
+            _finite(content), default=lambda obj: _finite(_default(obj)),
+            allow_nan=False, ensure_ascii=False, separators=(",", ":"),
+        ).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
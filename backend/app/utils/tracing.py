@@ -0,0 +1,157 @@
+"""
+Lightweight request tracing.
+
+With TRACING_ENABLED=true, TracingMiddleware starts a trace per request
+and `span(name)` records named, nested timings inside it: the run_cycle
+stages, and every outbound call timed through `metrics.timed` or the
+resilience layer. The active trace and parent span live in context
+variables, so spans opened on the threadpool (run_in_threadpool,
+asyncio.to_thread, the resilience executors) attach to the request that
+started them.
+
+Finished spans are sent back as a `Server-Timing` response header and,
+when TRACE_EXPORT_FILE is set, appended as one JSON line per request to
+that file for a local collector to pick up.
+
+When tracing is disabled, or outside a request, `span()` returns a shared
+no-op context manager after a single context-variable lookup.
+"""
+import os
+import re
+import json
+import time
+import queue
+import logging
+import threading
+import contextvars
+from contextlib import nullcontext
+
+logger = logging.getLogger("xement-ai")
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+TRACE_EXPORT_FILE = os.getenv("TRACE_EXPORT_FILE", "")
+# Keep Server-Timing headers a reasonable size on chatty requests
+SERVER_TIMING_MAX_SPANS = int(os.getenv("SERVER_TIMING_MAX_SPANS", "30"))
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+_current_span = contextvars.ContextVar("current_span", default=None)
+_NOOP = nullcontext()
+_TOKEN_RE = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+class Trace:
+    def __init__(self, name: str):
+        self.name = name
+        self.started = time.perf_counter()
+        self.started_at = time.time()
+        self.spans = []
+        self._lock = threading.Lock()
+        self._next_id = 0
+
+    def _new_id(self) -> int:
+        with self._lock:
+            self._next_id += 1
+            return self._next_id
+
+    def add(self, span: dict):
+        with self._lock:
+            self.spans.append(span)
+
+    def finished_spans(self) -> list:
+        with self._lock:
+            return list(self.spans)
+
+
+class _Span:
+    __slots__ = ("trace", "name", "attributes", "id", "parent", "started", "_token")
+
+    def __init__(self, trace: Trace, name: str, attributes: dict):
+        self.trace = trace
+        self.name = name
+        self.attributes = attributes
+
+    def __enter__(self):
+        self.id = self.trace._new_id()
+        self.parent = _current_span.get()
+        self._token = _current_span.set(self.id)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        ended = time.perf_counter()
+        _current_span.reset(self._token)
+        record = {
+            "id": self.id,
+            "parent": self.parent,
+            "name": self.name,
+            "start_ms": round((self.started - self.trace.started) * 1000, 3),
+            "duration_ms": round((ended - self.started) * 1000, 3),
+        }
+        if self.attributes:
+            record["attributes"] = self.attributes
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        self.trace.add(record)
+        return False
+
+
+def span(name: str, **attributes):
+    """Time a block as a span of the current request's trace (no-op when not tracing)."""
+    trace = _current_trace.get()
+    if trace is None:
+        return _NOOP
+    return _Span(trace, name, attributes)
+
+
+def start_trace(name: str):
+    """Begin a trace in the current context. Returns (trace, token) or (None, None) when disabled."""
+    if not TRACING_ENABLED:
+        return None, None
+    trace = Trace(name)
+    return trace, _current_trace.set(trace)
+
+
+def end_trace(trace: Trace, token):
+    _current_trace.reset(token)
+    if TRACE_EXPORT_FILE:
+        _export(trace)
+
+
+def server_timing(trace: Trace) -> str:
+    """Render finished spans as a Server-Timing header value, slowest first."""
+    spans = sorted(trace.finished_spans(), key=lambda s: s["duration_ms"], reverse=True)
+    entries = [f'total;dur={(time.perf_counter() - trace.started) * 1000:.1f}']
+    for index, s in enumerate(spans[:SERVER_TIMING_MAX_SPANS]):
+        entries.append(f'{_TOKEN_RE.sub("_", s["name"])}-{index};dur={s["duration_ms"]:.1f};desc="{s["name"]}"')
+    return ", ".join(entries)
+
+
+# ----- export -----
+_export_queue = queue.SimpleQueue()
+_exporter = None
+_exporter_lock = threading.Lock()
+
+
+def _write_exports():
+    while True:
+        line = _export_queue.get()
+        try:
+            with open(TRACE_EXPORT_FILE, "a", encoding="utf-8") as handle:
+                handle.write(line + "\n")
+        except OSError as e:
+            logger.warning(f"Could not export trace to {TRACE_EXPORT_FILE}: {e}")
+
+
+def _export(trace: Trace):
+    global _exporter
+    if _exporter is None:
+        with _exporter_lock:
+            if _exporter is None:
+                _exporter = threading.Thread(target=_write_exports, name="trace-exporter", daemon=True)
+                _exporter.start()
+    _export_queue.put(json.dumps({
+        "name": trace.name,
+        "started_at": trace.started_at,
+        "duration_ms": round((time.perf_counter() - trace.started) * 1000, 3),
+        "spans": trace.finished_spans(),
+    }))
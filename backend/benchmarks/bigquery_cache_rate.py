@@ -0,0 +1,79 @@
+"""
+BigQuery result-cache hit rate, before and after parameterized periods.
+
+For each period, runs the dashboard query the way /latest_state used to
+build it (CURRENT_TIMESTAMP()/CURRENT_DATE() and the plant inlined as a
+literal) and the way it builds it now (bucketed bounds and the plant as
+query parameters), `--repeat` times each, and reports the share of jobs
+answered from BigQuery's cache and the bytes billed.
+
+Needs Google credentials with access to the dataset; every run is billed
+as a normal query unless it is a cache hit.
+
+Usage (from backend/):
+    python benchmarks/bigquery_cache_rate.py --repeat 5 --plant PlantA
+"""
+import os
+import sys
+import json
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.routers.public_router import REFINEMENT_TABLE, build_aggregated_query  # noqa: E402
+from app.utils.providers import bigquery_client  # noqa: E402
+
+LEGACY_FILTERS = {
+    "lastHour": "timestamp >= TIMESTAMP_SUB(CURRENT_TIMESTAMP(), INTERVAL 1 HOUR)",
+    "today": "DATE(timestamp) = CURRENT_DATE()",
+    "currentShift": "timestamp >= TIMESTAMP_SUB(CURRENT_TIMESTAMP(), INTERVAL 8 HOUR)",
+    "thisWeek": "timestamp >= TIMESTAMP_SUB(CURRENT_TIMESTAMP(), INTERVAL 7 DAY)",
+}
+
+
+def legacy_query(period: str, plant: str) -> str:
+    return f"""
+        SELECT AVG(energy_use) AS energy_use, COUNT(*) AS record_count
+        FROM {REFINEMENT_TABLE}
+        WHERE {LEGACY_FILTERS[period]}
+          AND timestamp <= CURRENT_TIMESTAMP()
+          AND plant_id = '{plant}'
+    """
+
+
+def run(query: str, job_config=None) -> tuple:
+    job = bigquery_client().query(query, job_config=job_config)
+    job.result()
+    return bool(job.cache_hit), job.total_bytes_billed or 0
+
+
+def measure(jobs: list) -> dict:
+    hits = sum(1 for hit, _ in jobs if hit)
+    return {
+        "queries": len(jobs),
+        "cache_hits": hits,
+        "hit_rate": round(hits / len(jobs), 3) if jobs else 0.0,
+        "bytes_billed": sum(billed for _, billed in jobs),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--plant", default="PlantA")
+    args = parser.parse_args()
+
+    report = {}
+    for period in LEGACY_FILTERS:
+        before = [run(legacy_query(period, args.plant)) for _ in range(args.repeat)]
+        after = []
+        for _ in range(args.repeat):
+            query, job_config = build_aggregated_query(period, args.plant)
+            after.append(run(query, job_config))
+        report[period] = {"before": measure(before), "after": measure(after)}
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
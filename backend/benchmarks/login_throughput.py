@@ -0,0 +1,112 @@
+"""
+Login throughput benchmark.
+
+Fires concurrent POST /auth/login requests at a running backend while a
+probe keeps calling GET /health, then reports login throughput and the
+probe latency with and without the login burst. With bcrypt offloaded to
+the hashing process pool, /health latency should stay flat under load.
+
+Every login must return 200: the run fails fast if a single login is
+rejected (wrong credentials or role), and exits non-zero if any login in
+the burst did not succeed, e.g. 503s from a saturated hashing pool.
+
+Usage (backend running locally, test user already created):
+    python benchmarks/login_throughput.py --email ops@example.com --password secret \
+        --role operator --concurrency 32 --requests 200
+"""
+import sys
+import json
+import time
+import argparse
+import threading
+import urllib.request
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _request(url: str, body: dict = None) -> tuple:
+    """Returns (HTTP status, seconds)."""
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=60) as resp:
+            resp.read()
+            status = resp.status
+    except urllib.error.HTTPError as e:
+        e.read()
+        status = e.code
+    return status, time.perf_counter() - started
+
+
+def _percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))] * 1000
+
+
+def _probe(base_url: str, stop: threading.Event, samples: list, interval: float):
+    while not stop.is_set():
+        samples.append(_request(f"{base_url}/health")[1])
+        time.sleep(interval)
+
+
+def _summary(samples: list) -> str:
+    if not samples:
+        return "no samples"
+    return f"p50 {_percentile(samples, 0.5):.1f} ms, p95 {_percentile(samples, 0.95):.1f} ms, max {max(samples) * 1000:.1f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Login throughput under concurrency")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--role", default="operator")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--probe-interval", type=float, default=0.05)
+    args = parser.parse_args()
+
+    credentials = {"email": args.email, "password": args.password, "role": args.role}
+
+    status, _ = _request(f"{args.base_url}/auth/login", credentials)
+    if status != 200:
+        sys.exit(f"Login with the given credentials returned {status}; fix them before benchmarking")
+
+    # Baseline: health probe with no login traffic
+    idle_samples = [_request(f"{args.base_url}/health")[1] for _ in range(50)]
+
+    stop = threading.Event()
+    loaded_samples = []
+    probe = threading.Thread(target=_probe, args=(args.base_url, stop, loaded_samples, args.probe_interval))
+    probe.start()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        logins = list(pool.map(lambda _: _request(f"{args.base_url}/auth/login", credentials),
+                               range(args.requests)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    probe.join()
+
+    login_times = [seconds for status, seconds in logins if status == 200]
+    statuses = {}
+    for status, _ in logins:
+        statuses[status] = statuses.get(status, 0) + 1
+
+    print("=" * 60)
+    print(f"Logins: {args.requests} at concurrency {args.concurrency} in {elapsed:.2f}s "
+          f"({args.requests / elapsed:.1f} logins/s)")
+    print(f"Login statuses:         {dict(sorted(statuses.items()))}")
+    print(f"Login latency (200s):   {_summary(login_times)}")
+    print(f"/health idle latency:   {_summary(idle_samples)}")
+    print(f"/health during logins:  {_summary(loaded_samples)}")
+    print("=" * 60)
+
+    failed = args.requests - statuses.get(200, 0)
+    if failed:
+        sys.exit(f"{failed} of {args.requests} logins did not return 200")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Response serialization benchmark.
+
+Builds the largest payloads the API returns: /history at its 1000-row cap,
+a 200-alert /alerts/recent page and a /latest_state/batch map. It reports:
+- CPU time per response for FastAPI's default path (jsonable_encoder, then
+  Starlette's JSONResponse json.dumps) and for FastJSONResponse (orjson),
+- bytes on the wire uncompressed, with gzip and with brotli at the levels
+  CompressionMiddleware uses, plus the CPU time each compression costs.
+
+Usage (from backend/):
+    python benchmarks/serialization.py --iterations 200
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import datetime
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from app.utils.serialization import dumps  # noqa: E402
+from app.middleware.compression import compress, brotli  # noqa: E402
+
+NOW = datetime.datetime.now(datetime.timezone.utc)
+
+
+def reading(index: int, plant: str) -> dict:
+    return {
+        "timestamp": NOW - datetime.timedelta(minutes=5 * index),
+        "plant_id": plant,
+        "raw1_frac": random.uniform(0.6, 0.8),
+        "raw2_frac": random.uniform(0.2, 0.4),
+        "grinding_efficiency": random.uniform(70, 95),
+        "kiln_temp": random.uniform(1350, 1500),
+        "fan_speed": random.uniform(60, 100),
+        "mill_speed": random.uniform(10, 20),
+        "feed_rate": random.uniform(80, 120),
+        "clinker_rate": random.uniform(0.6, 0.9),
+        "alt_fuel_pct": random.uniform(0, 40),
+        "fuel_type": random.choice(["fossil", "biomass", "rdf"]),
+        "energy_use": random.uniform(90, 130),
+        "emissions_CO2": random.uniform(700, 900),
+        "product_quality_index": Decimal(f"{random.uniform(0.8, 1.0):.4f}"),
+        "anomaly_flag": random.random() < 0.05,
+        "notes": None,
+    }
+
+
+def payloads() -> dict:
+    history = [reading(i, "PlantA") for i in range(1000)]
+    alerts = {
+        "success": True,
+        "count": 200,
+        "alerts": [
+            {
+                "id": f"alert-{i}",
+                "timestamp": NOW - datetime.timedelta(minutes=10 * i),
+                "severity": random.choice(["critical", "warning"]),
+                "plant_id": random.choice(["PlantA", "PlantB", "PlantC"]),
+                "anomalies": ["High kiln temperature", "Low grinding efficiency"][: random.randint(1, 2)],
+                "acknowledged": False,
+            }
+            for i in range(200)
+        ],
+        "next_cursor": "eyJ0cyI6IDE3MDAwMDAwMDB9",
+    }
+    batch = {
+        "period": "today",
+        "source_table": "xement_ai_refinement_data",
+        "plants": {
+            plant: {"latest": reading(0, plant), "aggregates": {**reading(0, plant), "record_count": 288}}
+            for plant in ("PlantA", "PlantB", "PlantC")
+        },
+    }
+    return {"history_1000": history, "alerts_recent_200": alerts, "latest_state_batch": batch}
+
+
+def default_render(content) -> bytes:
+    # What FastAPI does for a plain dict return with JSONResponse
+    return json.dumps(
+        jsonable_encoder(content), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def cpu_ms(fn, content, iterations: int) -> float:
+    started = time.process_time()
+    for _ in range(iterations):
+        fn(content)
+    return (time.process_time() - started) * 1000 / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    report = {}
+    for name, content in payloads().items():
+        body = dumps(content)
+        entry = {
+            "cpu_ms_default": round(cpu_ms(default_render, content, args.iterations), 3),
+            "cpu_ms_orjson": round(cpu_ms(dumps, content, args.iterations), 3),
+            "bytes_default": len(default_render(content)),
+            "bytes_orjson": len(body),
+            "bytes_gzip": len(compress(body, "gzip")),
+            "cpu_ms_gzip": round(cpu_ms(lambda b: compress(b, "gzip"), body, args.iterations), 3),
+        }
+        if brotli is not None:
+            entry["bytes_br"] = len(compress(body, "br"))
+            entry["cpu_ms_br"] = round(cpu_ms(lambda b: compress(b, "br"), body, args.iterations), 3)
+        report[name] = entry
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Startup profiling.
+
+Imports `app.main` in fresh interpreters and reports:
+- the heaviest modules by cumulative import time (from `python -X importtime`),
+- the median cold import time of `app.main` with providers left lazy,
+- the same with every provider created eagerly, which is what importing
+  the app used to cost, and the difference between the two.
+
+Creating providers needs working Google credentials; without them the
+eager run reports the providers that failed instead.
+
+Usage (from backend/):
+    python benchmarks/startup_profile.py --runs 5 --top 25
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LAZY_SNIPPET = """
+import json, time
+started = time.perf_counter()
+import app.main
+print(json.dumps({"seconds": time.perf_counter() - started}))
+"""
+
+EAGER_SNIPPET = """
+import json, time
+started = time.perf_counter()
+import app.main
+from app.utils import providers
+failed = []
+for name in providers.names():
+    try:
+        providers.get(name)
+    except Exception as e:
+        failed.append(f"{name}: {type(e).__name__}")
+print(json.dumps({"seconds": time.perf_counter() - started, "providers_ms": providers.loaded(), "failed": failed}))
+"""
+
+
+def _run(snippet: str, extra_args=()) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *extra_args, "-c", snippet],
+        cwd=BACKEND_DIR, capture_output=True, text=True
+    )
+
+
+def _measure(snippet: str, runs: int):
+    samples, last = [], None
+    for _ in range(runs):
+        result = _run(snippet)
+        if result.returncode != 0:
+            sys.exit(f"Import failed:\n{result.stderr[-2000:]}")
+        last = json.loads(result.stdout.strip().splitlines()[-1])
+        samples.append(last["seconds"])
+    return statistics.median(samples), last
+
+
+def import_time_report(top: int):
+    """Parse `-X importtime` output into (cumulative_us, self_us, module), heaviest first."""
+    result = _run("import app.main", extra_args=("-X", "importtime"))
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|", 2)
+        entries.append((int(cumulative_us), int(self_us), module.rstrip()))
+    return sorted(entries, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile backend import and cold-start cost")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=25)
+    args = parser.parse_args()
+
+    heaviest = import_time_report(args.top)
+    print("=" * 72)
+    print(f"Heaviest modules imported by app.main (cumulative, top {args.top})")
+    print("=" * 72)
+    for cumulative_us, self_us, module in heaviest:
+        print(f"{cumulative_us / 1000:9.1f} ms  (self {self_us / 1000:7.1f} ms)  {module.strip()}")
+
+    lazy_seconds, _ = _measure(LAZY_SNIPPET, args.runs)
+    eager_seconds, eager = _measure(EAGER_SNIPPET, args.runs)
+
+    print("=" * 72)
+    print(f"Cold import of app.main, lazy providers:   {lazy_seconds * 1000:8.1f} ms (median of {args.runs})")
+    print(f"Cold import + all providers created:       {eager_seconds * 1000:8.1f} ms (median of {args.runs})")
+    print(f"Cold-start reduction:                      {(eager_seconds - lazy_seconds) * 1000:8.1f} ms "
+          f"({100 * (eager_seconds - lazy_seconds) / eager_seconds:.0f}%)")
+    for name, ms in eager["providers_ms"].items():
+        print(f"  provider {name:<12} {ms:8.1f} ms")
+    for failure in eager["failed"]:
+        print(f"  provider failed: {failure}")
+    print("=" * 72)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,7 +9,8 @@ Configurable:
  - TABLE: BigQuery table name (will be created if not exists)
  - NUM_ROWS: total number of simulated rows
  - PLANTS: list of plant ids/names to simulate
- - MODE: 'bulk' (single dataframe load) or 'stream' (periodic small inserts to simulate streaming)
+ - MODE: 'bulk' (single dataframe load) or 'stream' (periodic small inserts to simulate streaming),
+   or 'migrate' to copy an existing table into the partitioned/clustered layout
 """
 
 import os
@@ -27,11 +28,12 @@ PROJECT = os.getenv("GCP_PROJECT_ID", "xement-ai")
 BQ_DATASET = os.getenv("BQ_DATASET", "xement_ai_dataset")
 BQ_DATASET_LOCATION = os.getenv("BQ_DATASET_LOCATION", "US")
 BQ_TABLE = os.getenv("BQ_TABLE", "xement_ai_refinement_data")
+BQ_LATEST_TABLE = os.getenv("BQ_LATEST_TABLE", "plant_latest_state")  # one row per plant, kept by MERGE
 NUM_ROWS = int(os.getenv("NUM_ROWS", "10"))
 PLANTS = os.getenv("PLANTS", "PlantA,PlantB,PlantC").split(",")
 START_TS = os.getenv("START_TS")  # optional ISO string if None, now - NUM_ROWS*interval
 FREQ_MINUTES = int(os.getenv("SIMULATE_FREQ_MINUTES", "5"))
-MODE = os.getenv("SIMULATE_MODE", "bulk")  # mode can be bulk or stream
+MODE = os.getenv("SIMULATE_MODE", "bulk")  # mode can be bulk, stream or migrate
 BATCH_SIZE = int(os.getenv("SIMULATE_BATCH_SIZE", "500"))  # used in stream mode
 # ----------------------------------------
 
@@ -43,6 +45,41 @@ ALT_FUEL_TYPES = ["biomass", "rdf"]
 # BigQuery client
 client = bigquery.Client(project=PROJECT)
 
+SCHEMA = [
+    bigquery.SchemaField("timestamp", "TIMESTAMP"),
+    bigquery.SchemaField("plant_id", "STRING"),
+    bigquery.SchemaField("raw1_frac", "FLOAT"),
+    bigquery.SchemaField("raw2_frac", "FLOAT"),
+    bigquery.SchemaField("grinding_efficiency", "FLOAT"),
+    bigquery.SchemaField("kiln_temp", "FLOAT"),
+    bigquery.SchemaField("fan_speed", "FLOAT"),
+    bigquery.SchemaField("mill_speed", "FLOAT"),
+    bigquery.SchemaField("feed_rate", "FLOAT"),
+    bigquery.SchemaField("clinker_rate", "FLOAT"),
+    bigquery.SchemaField("alt_fuel_pct", "FLOAT"),
+    bigquery.SchemaField("fuel_type", "STRING"),
+    bigquery.SchemaField("energy_use", "FLOAT"),
+    bigquery.SchemaField("emissions_CO2", "FLOAT"),
+    bigquery.SchemaField("product_quality_index", "FLOAT"),
+    bigquery.SchemaField("anomaly_flag", "BOOLEAN"),
+    bigquery.SchemaField("notes", "STRING"),
+]
+
+# Daily partitions on the reading time plus clustering on the plant, so period
+# filters in public_router only scan the days (and plant blocks) they ask for
+PARTITION_FIELD = "timestamp"
+CLUSTER_FIELDS = ["plant_id"]
+
+
+def is_partitioned(table):
+    partitioning = table.time_partitioning
+    return (
+        partitioning is not None
+        and partitioning.field == PARTITION_FIELD
+        and list(table.clustering_fields or []) == CLUSTER_FIELDS
+    )
+
+
 def ensure_dataset_and_table():
     dataset_ref = client.dataset(BQ_DATASET)
     try:
@@ -54,34 +91,115 @@ def ensure_dataset_and_table():
         client.create_dataset(dataset)
     table_ref = dataset_ref.table(BQ_TABLE)
     try:
-        client.get_table(table_ref)
+        table = client.get_table(table_ref)
         print(f"Table {BQ_DATASET}.{BQ_TABLE} exists.")
+        if not is_partitioned(table):
+            print(f"Table {BQ_DATASET}.{BQ_TABLE} is not partitioned by DATE({PARTITION_FIELD}) "
+                  f"and clustered on {', '.join(CLUSTER_FIELDS)}; run with SIMULATE_MODE=migrate to convert it.")
     except NotFound:
-        print(f"Table {BQ_DATASET}.{BQ_TABLE} not found. Creating table with schema.")
-        schema = [
-            bigquery.SchemaField("timestamp", "TIMESTAMP"),
-            bigquery.SchemaField("plant_id", "STRING"),
-            bigquery.SchemaField("raw1_frac", "FLOAT"),
-            bigquery.SchemaField("raw2_frac", "FLOAT"),
-            bigquery.SchemaField("grinding_efficiency", "FLOAT"),
-            bigquery.SchemaField("kiln_temp", "FLOAT"),
-            bigquery.SchemaField("fan_speed", "FLOAT"),
-            bigquery.SchemaField("mill_speed", "FLOAT"),
-            bigquery.SchemaField("feed_rate", "FLOAT"),
-            bigquery.SchemaField("clinker_rate", "FLOAT"),
-            bigquery.SchemaField("alt_fuel_pct", "FLOAT"),
-            bigquery.SchemaField("fuel_type", "STRING"),
-            bigquery.SchemaField("energy_use", "FLOAT"),
-            bigquery.SchemaField("emissions_CO2", "FLOAT"),
-            bigquery.SchemaField("product_quality_index", "FLOAT"),
-            bigquery.SchemaField("anomaly_flag", "BOOLEAN"),
-            bigquery.SchemaField("notes", "STRING"),
-        ]
-        table = bigquery.Table(table_ref, schema=schema)
+        print(f"Table {BQ_DATASET}.{BQ_TABLE} not found. Creating partitioned table with schema.")
+        table = bigquery.Table(table_ref, schema=SCHEMA)
+        table.time_partitioning = bigquery.TimePartitioning(
+            type_=bigquery.TimePartitioningType.DAY, field=PARTITION_FIELD
+        )
+        table.clustering_fields = CLUSTER_FIELDS
         client.create_table(table)
         print(f"Created table {BQ_DATASET}.{BQ_TABLE}")
 
 
+def ensure_latest_table(project=PROJECT, dataset=BQ_DATASET, table=BQ_TABLE, latest_table=BQ_LATEST_TABLE):
+    """Create the one-row-per-plant latest-state table, seeded from the full history on creation."""
+    latest_id = f"{project}.{dataset}.{latest_table}"
+    try:
+        client.get_table(latest_id)
+        return
+    except NotFound:
+        print(f"Table {dataset}.{latest_table} not found. Creating it from {dataset}.{table}.")
+    client.create_table(bigquery.Table(latest_id, schema=SCHEMA))
+    client.query(f"""
+        INSERT INTO `{latest_id}`
+        SELECT * FROM `{project}.{dataset}.{table}`
+        WHERE TRUE
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY plant_id ORDER BY timestamp DESC) = 1
+    """).result()
+    print(f"Created table {dataset}.{latest_table}")
+
+
+def merge_latest(df, project=PROJECT, dataset=BQ_DATASET, table=BQ_TABLE, latest_table=BQ_LATEST_TABLE):
+    """
+    MERGE the batch's newest row per plant into the latest-state table.
+
+    The source rows are read back from the main table within the batch's own
+    time range (a few daily partitions), and a plant's row is only replaced by
+    a newer reading, so out-of-order or replayed batches never move it back.
+    """
+    if df.empty:
+        return
+    columns = [field.name for field in SCHEMA]
+    job_config = bigquery.QueryJobConfig(query_parameters=[
+        bigquery.ScalarQueryParameter("batch_start", "TIMESTAMP", df["timestamp"].min().to_pydatetime()),
+        bigquery.ScalarQueryParameter("batch_end", "TIMESTAMP", df["timestamp"].max().to_pydatetime()),
+        bigquery.ArrayQueryParameter("plants", "STRING", sorted(df["plant_id"].unique().tolist())),
+    ])
+    job = client.query(f"""
+        MERGE `{project}.{dataset}.{latest_table}` AS latest
+        USING (
+          SELECT * FROM `{project}.{dataset}.{table}`
+          WHERE timestamp BETWEEN @batch_start AND @batch_end AND plant_id IN UNNEST(@plants)
+          QUALIFY ROW_NUMBER() OVER (PARTITION BY plant_id ORDER BY timestamp DESC) = 1
+        ) AS batch
+        ON latest.plant_id = batch.plant_id
+        WHEN MATCHED AND batch.timestamp > latest.timestamp THEN
+          UPDATE SET {", ".join(f"{c} = batch.{c}" for c in columns if c != "plant_id")}
+        WHEN NOT MATCHED THEN
+          INSERT ROW
+    """, job_config=job_config)
+    job.result()
+    print(f"Merged latest rows for {df['plant_id'].nunique()} plants into {dataset}.{latest_table} "
+          f"({job.num_dml_affected_rows or 0} changed).")
+
+
+def migrate_table(project=PROJECT, dataset=BQ_DATASET, table=BQ_TABLE):
+    """
+    Copy an existing unpartitioned table into the partitioned, clustered layout.
+
+    The data is copied with CREATE TABLE ... AS SELECT into `<table>_partitioned`,
+    row counts are compared, then the old table is renamed to `<table>_unpartitioned`
+    (kept as a backup, drop it once satisfied) and the new one takes its name.
+    Pause the simulator while this runs: rows written in between are not copied,
+    and tables with rows still in the streaming buffer cannot be renamed.
+    """
+    table_id = f"{project}.{dataset}.{table}"
+    staging = f"{table}_partitioned"
+    backup = f"{table}_unpartitioned"
+
+    existing = client.get_table(table_id)
+    if is_partitioned(existing):
+        print(f"{table_id} already uses the partitioned layout; nothing to migrate.")
+        return
+
+    print(f"Copying {table_id} into {dataset}.{staging} ...")
+    client.query(f"""
+        CREATE TABLE `{project}.{dataset}.{staging}`
+        PARTITION BY DATE({PARTITION_FIELD})
+        CLUSTER BY {", ".join(CLUSTER_FIELDS)}
+        AS SELECT * FROM `{table_id}`
+    """).result()
+
+    source_rows = list(client.query(f"SELECT COUNT(*) AS n FROM `{table_id}`").result())[0].n
+    copied_rows = list(client.query(f"SELECT COUNT(*) AS n FROM `{project}.{dataset}.{staging}`").result())[0].n
+    if source_rows != copied_rows:
+        raise RuntimeError(
+            f"Row count mismatch ({source_rows} in {table_id}, {copied_rows} copied); "
+            f"{dataset}.{staging} left in place for inspection"
+        )
+
+    client.query(f"ALTER TABLE `{table_id}` RENAME TO `{backup}`").result()
+    client.query(f"ALTER TABLE `{project}.{dataset}.{staging}` RENAME TO `{table}`").result()
+    print(f"Migrated {copied_rows} rows; {table_id} is now partitioned by DATE({PARTITION_FIELD}) "
+          f"and clustered on {', '.join(CLUSTER_FIELDS)}. Old data kept in {dataset}.{backup}.")
+
+
 def simulate_row(ts, plant_id):
     """
     Generate a realistic plant state row.
@@ -244,6 +362,9 @@ def stream_to_bq(df, project=PROJECT, dataset=BQ_DATASET, table=BQ_TABLE, batch_
 
 
 def main():
+    if MODE == "migrate":
+        migrate_table()
+        return
     print("Starting simulation & upload process...")
     ensure_dataset_and_table()
     print("Generating dataframe ...")
@@ -254,6 +375,8 @@ def main():
         upload_dataframe_to_bq(df)
     else:
         stream_to_bq(df)
+    ensure_latest_table()
+    merge_latest(df)
     print("Done.")
 
 
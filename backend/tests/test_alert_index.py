@@ -0,0 +1,66 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import alert_index
+
+T = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def change(kind: str, alert_id: str, data: dict = None):
+    document = SimpleNamespace(id=alert_id, to_dict=lambda: dict(data or {}))
+    return SimpleNamespace(type=SimpleNamespace(name=kind), document=document)
+
+
+@pytest.fixture(autouse=True)
+def empty_index(monkeypatch):
+    monkeypatch.setattr(alert_index, "_recent", {})
+    monkeypatch.setattr(alert_index, "_open", {})
+    monkeypatch.setattr(alert_index, "_version", 0)
+
+
+def test_open_alerts_are_projected_and_applied_incrementally():
+    alert = {"timestamp": T, "severity": "warning", "anomalies": ["x"], "plant_state": {"plant_id": "PlantA", "kiln_temp": 1500}}
+    alert_index._on_open(None, [change("ADDED", "a", alert), change("ADDED", "b", alert)], None)
+    assert set(alert_index._open) == {"a", "b"}
+    assert "plant_state" not in alert_index._open["a"]
+    assert alert_index._open["a"]["plant_id"] == "PlantA"
+
+    alert_index._on_open(None, [change("REMOVED", "a")], None)
+    assert set(alert_index._open) == {"b"}
+
+
+def test_version_ignores_changes_to_unversioned_fields():
+    alert = {"timestamp": T, "severity": "warning", "anomalies": ["x"]}
+    alert_index._on_open(None, [change("ADDED", "a", alert)], None)
+    assert alert_index.version() == 1
+
+    alert_index._on_open(None, [change("MODIFIED", "a", {**alert, "notified": True})], None)
+    alert_index._on_recent(None, [change("ADDED", "a", alert)], None)
+    assert alert_index.version() == 1
+
+    alert_index._on_open(None, [change("MODIFIED", "a", {**alert, "severity": "critical"})], None)
+    assert alert_index.version() == 2
+
+
+def test_acknowledging_an_alert_that_is_not_open_keeps_the_version():
+    alert_index.mark_acknowledged(["missing"], "ops@example.com", T)
+    assert alert_index.version() == 0
+
+
+def test_start_backs_off_after_a_failed_attach(monkeypatch):
+    attempts = []
+
+    class FailingClient:
+        def collection(self, name):
+            attempts.append(name)
+            raise RuntimeError("unavailable")
+
+    monkeypatch.setattr(alert_index, "ALERT_INDEX_ENABLED", True)
+    monkeypatch.setattr(alert_index, "fs_client", FailingClient())
+    monkeypatch.setattr(alert_index, "_last_start_attempt", None)
+
+    for _ in range(5):
+        alert_index.start()
+    assert attempts == ["alerts"]
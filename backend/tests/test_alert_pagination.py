@@ -0,0 +1,56 @@
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from app.services import alert_index
+from app.services.anomaly_detector import encode_alert_cursor, decode_alert_cursor
+
+T1 = datetime(2025, 1, 1, 12, 0, tzinfo=timezone.utc)
+T0 = datetime(2025, 1, 1, 11, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def mirrored(monkeypatch):
+    alerts = {
+        "a": {"timestamp": T1, "severity": "warning"},
+        "b": {"timestamp": T1, "severity": "critical"},
+        "c": {"timestamp": T1, "severity": "warning"},
+        "d": {"timestamp": T0, "severity": "warning"},
+    }
+    monkeypatch.setattr(alert_index, "start", lambda: None)
+    monkeypatch.setattr(alert_index, "is_active", lambda: True)
+    monkeypatch.setattr(alert_index, "_recent", alerts)
+    monkeypatch.setattr(alert_index, "_recent_ready", True)
+    return alerts
+
+
+def test_cursor_round_trip():
+    cursor = encode_alert_cursor(T1.isoformat(), "abc")
+    assert decode_alert_cursor(cursor) == (T1, "abc")
+
+
+def test_naive_cursor_timestamp_is_utc():
+    cursor = encode_alert_cursor("2025-01-01T12:00:00", "abc")
+    assert decode_alert_cursor(cursor)[0] == T1
+
+
+@pytest.mark.parametrize("cursor", ["not-base64!", "bm90IGpzb24=", encode_alert_cursor("yesterday", "abc")])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as exc:
+        decode_alert_cursor(cursor)
+    assert exc.value.status_code == 400
+
+
+def test_pages_do_not_skip_alerts_sharing_a_timestamp(mirrored):
+    first = alert_index.recent(2)
+    assert [alert_id for alert_id, _ in first] == ["c", "b"]
+
+    last_id, last = first[-1]
+    second = alert_index.recent(2, after=(last["timestamp"], last_id))
+    assert [alert_id for alert_id, _ in second] == ["a", "d"]
+
+
+def test_severity_filter_with_cursor(mirrored):
+    page = alert_index.recent(5, severity="warning", after=(T1, "c"))
+    assert [alert_id for alert_id, _ in page] == ["a", "d"]
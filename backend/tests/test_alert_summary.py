@@ -0,0 +1,74 @@
+from google.cloud import firestore
+
+from app.services import alert_summary
+
+
+class FakeSnapshot:
+    def __init__(self, data):
+        self._data = data
+        self.exists = data is not None
+
+    def to_dict(self):
+        return self._data
+
+
+class FakeSummaryRef:
+    def __init__(self, data=None):
+        self.data = data
+        self.reads = 0
+
+    def get(self):
+        self.reads += 1
+        return FakeSnapshot(self.data)
+
+
+def _increments(payload: dict) -> dict:
+    return {key: value.value for key, value in payload.items() if isinstance(value, firestore.Increment)}
+
+
+def test_new_alert_increments_severity_total_and_plant():
+    changes = alert_summary.new_alert_changes("a1", {"severity": "critical", "plant_id": "PlantA", "anomalies": ["x", "y"]})
+    assert changes["unacknowledged"]["critical"].value == 1
+    assert changes["unacknowledged_total"].value == 1
+    assert changes["by_plant"]["PlantA"]["critical"].value == 1
+    assert changes["latest_alert_id"] == "a1"
+    assert changes["latest_alert_anomaly_count"] == 2
+
+
+def test_acknowledged_changes_decrement_per_severity_and_plant():
+    alerts = [
+        {"severity": "critical", "plant_id": "PlantA"},
+        {"severity": "warning", "plant_state": {"plant_id": "PlantB"}},
+        {"severity": "warning"},
+    ]
+    changes = alert_summary.acknowledged_changes(alerts)
+    assert _increments(changes) == {"unacknowledged_total": -3}
+    assert {s: inc.value for s, inc in changes["unacknowledged"].items()} == {"critical": -1, "warning": -2}
+    assert changes["by_plant"]["PlantB"]["warning"].value == -1
+    assert changes["by_plant"][alert_summary.UNKNOWN_PLANT]["warning"].value == -1
+
+
+def test_ensure_summary_seeds_missing_document_once(monkeypatch):
+    ref = FakeSummaryRef(data=None)
+    rebuilds = []
+    monkeypatch.setattr(alert_summary, "_seeded", False)
+    monkeypatch.setattr(alert_summary, "summary_ref", lambda: ref)
+    monkeypatch.setattr(alert_summary, "rebuild_summary", lambda create_only=False: rebuilds.append(create_only))
+
+    alert_summary.ensure_summary()
+    alert_summary.ensure_summary()
+
+    assert rebuilds == [True]
+    assert ref.reads == 1
+
+
+def test_ensure_summary_keeps_existing_document(monkeypatch):
+    ref = FakeSummaryRef(data={"unacknowledged_total": 4})
+    monkeypatch.setattr(alert_summary, "_seeded", False)
+    monkeypatch.setattr(alert_summary, "summary_ref", lambda: ref)
+    rebuilds = []
+    monkeypatch.setattr(alert_summary, "rebuild_summary", lambda create_only=False: rebuilds.append(create_only))
+
+    alert_summary.ensure_summary()
+
+    assert rebuilds == []
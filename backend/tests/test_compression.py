@@ -0,0 +1,75 @@
+import gzip
+import asyncio
+
+import pytest
+
+from app.middleware import compression
+from app.middleware.compression import CompressionMiddleware, add_vary, choose_encoding
+
+BODY = b'{"rows":[' + b'{"kiln_temp":1450.0},' * 200 + b"{}]}"
+
+
+def _run(body=BODY, accept=None, headers=None, more_body=False):
+    response_headers = headers if headers is not None else [(b"content-type", b"application/json")]
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": response_headers + [(b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+    request_headers = [(b"accept-encoding", accept)] if accept is not None else []
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(CompressionMiddleware(app)({"type": "http", "headers": request_headers}, None, send))
+    start, message = sent
+    return {name.lower(): value for name, value in start["headers"]}, start["headers"], message["body"]
+
+
+def test_choose_encoding_prefers_brotli_and_honours_q_zero(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", object())
+    assert choose_encoding("gzip, deflate, br") == "br"
+    assert choose_encoding("br;q=0, gzip") == "gzip"
+    assert choose_encoding("identity") is None
+
+
+def test_gzip_response_is_compressed_with_vary(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    names, _, body = _run(accept=b"gzip")
+    assert names[b"content-encoding"] == b"gzip"
+    assert names[b"content-length"] == str(len(body)).encode()
+    assert names[b"vary"] == b"Accept-Encoding"
+    assert gzip.decompress(body) == BODY
+
+
+def test_uncompressed_negotiated_response_still_varies():
+    names, _, body = _run(accept=None)
+    assert body == BODY
+    assert b"content-encoding" not in names
+    assert names[b"vary"] == b"Accept-Encoding"
+
+
+def test_existing_vary_is_merged_not_duplicated(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    _, headers, _ = _run(accept=b"gzip", headers=[(b"content-type", b"application/json"), (b"vary", b"Origin")])
+    assert [value for name, value in headers if name.lower() == b"vary"] == [b"Origin, Accept-Encoding"]
+
+
+def test_add_vary_keeps_listed_fields():
+    headers = [(b"Vary", b"origin, accept-encoding")]
+    assert add_vary(headers) == headers
+    assert add_vary([(b"vary", b"*")]) == [(b"vary", b"*")]
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"body": b"{}"},
+    {"headers": [(b"content-type", b"image/png")]},
+    {"headers": [(b"content-type", b"application/json"), (b"content-encoding", b"br")]},
+    {"more_body": True},
+])
+def test_ineligible_responses_pass_through(kwargs):
+    names, _, body = _run(accept=b"gzip", **kwargs)
+    assert body == kwargs.get("body", BODY)
+    assert b"vary" not in names
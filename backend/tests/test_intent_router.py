@@ -0,0 +1,51 @@
+import pytest
+
+from app.services import intent_router
+
+PLANT = {"timestamp": "2025-01-01T00:00:00", "kiln_temp": 1450, "energy_use": 120}
+
+
+@pytest.mark.parametrize("message", [
+    "kiln temp yesterday",
+    "average energy last week",
+    "energy compared to last shift",
+    "how does kiln temp compare with PlantB",
+    "what was the peak kiln temperature since Monday",
+    "show the energy history",
+    "emissions over the past 24 hours",
+    "why is energy high",
+    "recommendations to reduce emissions",
+    "kiln temperatures trending up?",
+    "energy at 3pm",
+])
+def test_time_aggregate_and_reasoning_questions_escalate(message):
+    assert intent_router.classify(message) is None
+
+
+@pytest.mark.parametrize("message, intent", [
+    ("what is the kiln temp", "metric"),
+    ("current kiln temperatures", "metric"),
+    ("energy use?", "metric"),
+    ("show open alerts", "open_alerts"),
+    ("any anomalies", "open_alerts"),
+    ("what are the kiln thresholds", "thresholds"),
+    ("give me the plant status", "kpi_overview"),
+    ("", None),
+])
+def test_latest_value_lookups_stay_local(message, intent):
+    assert intent_router.classify(message) == intent
+
+
+def test_inflected_metric_names_are_recognised():
+    metrics = intent_router._mentioned_metrics("temperatures and emissions")
+    assert [m[0] for m in metrics] == ["emissions_CO2", "kiln_temp"]
+
+
+def test_escalated_messages_get_no_local_answer():
+    assert intent_router.answer_locally("kiln temp yesterday", PLANT, []) == (None, None)
+
+
+def test_metric_answer_uses_latest_reading():
+    intent, response = intent_router.answer_locally("kiln temp", PLANT, [])
+    assert intent == "metric"
+    assert "1450°C" in response
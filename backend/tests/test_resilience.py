@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from app.utils.resilience import Dependency, CircuitOpenError, HALF_OPEN, CLOSED
+
+
+def _half_open() -> Dependency:
+    dependency = Dependency("test_breaker", timeout=5.0, max_concurrency=2, failure_threshold=1, reset_timeout=0.0)
+
+    async def fail():
+        raise RuntimeError("down")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(dependency.call_async(fail))
+    return dependency
+
+
+def test_cancelled_half_open_trial_frees_the_slot():
+    dependency = _half_open()
+
+    async def scenario():
+        started = asyncio.Event()
+
+        async def hang():
+            started.set()
+            await asyncio.sleep(60)
+
+        trial = asyncio.create_task(dependency.call_async(hang))
+        await started.wait()
+        assert dependency.stats()["state"] == HALF_OPEN
+        with pytest.raises(CircuitOpenError):
+            await dependency.call_async(hang)
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+
+        async def ok():
+            return "ok"
+
+        return await dependency.call_async(ok)
+
+    assert asyncio.run(scenario()) == "ok"
+    stats = dependency.stats()
+    assert stats["state"] == CLOSED
+    assert stats["in_flight"] == 0
+
+
+def test_cancellation_is_not_counted_as_a_failure():
+    dependency = Dependency("test_cancel", timeout=5.0, max_concurrency=2, failure_threshold=1)
+
+    async def scenario():
+        task = asyncio.create_task(dependency.call_async(asyncio.sleep, 60))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(scenario())
+    stats = dependency.stats()
+    assert stats["state"] == CLOSED
+    assert stats["failures"] == 0
+    assert stats["in_flight"] == 0
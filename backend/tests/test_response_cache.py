@@ -0,0 +1,38 @@
+import pytest
+
+from app.services import prompt_builder, response_cache
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    monkeypatch.setattr(response_cache, "CHAT_CACHE_ENABLED", True)
+    monkeypatch.setattr(response_cache, "CHAT_CACHE_SEMANTIC", False)
+    monkeypatch.setattr(response_cache, "_entries", response_cache.OrderedDict())
+    monkeypatch.setattr(response_cache, "_version", None)
+
+
+def test_normalize_keeps_word_order():
+    assert response_cache.normalize("Is kiln temp higher than fuel limit?") == "kiln temp higher than fuel limit"
+    assert response_cache.normalize("is kiln temp higher than fuel limit") != \
+        response_cache.normalize("is fuel limit higher than kiln temp")
+
+
+def test_reordered_question_misses():
+    response_cache.store("is kiln temp higher than fuel limit", "v1", "yes")
+    assert response_cache.lookup("Is kiln temp higher than fuel limit?", "v1") == "yes"
+    assert response_cache.lookup("is fuel limit higher than kiln temp", "v1") is None
+
+
+def test_new_context_version_clears_entries():
+    response_cache.store("current energy use", "v1", "120 kWh/t")
+    assert response_cache.lookup("current energy use", "v2") is None
+
+
+def test_has_history_only_after_a_turn(monkeypatch):
+    monkeypatch.setattr(prompt_builder, "_conversations", prompt_builder.OrderedDict())
+    assert not prompt_builder.has_history("u1", "c1")
+    prompt_builder.build_prompt("prefix", "context", "hello", "u1", "c1")
+    assert not prompt_builder.has_history("u1", "c1")
+    prompt_builder.remember_turn("u1", "hello", "hi", "c1")
+    assert prompt_builder.has_history("u1", "c1")
+    assert not prompt_builder.has_history("u2", "c1")
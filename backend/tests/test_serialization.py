@@ -0,0 +1,59 @@
+import sys
+import json
+import datetime
+import importlib
+from decimal import Decimal
+
+import pytest
+
+from app.utils import serialization
+
+PAYLOAD = {
+    "timestamp": datetime.datetime(2025, 1, 1, 12, 0, tzinfo=datetime.timezone.utc),
+    "day": datetime.date(2025, 1, 1),
+    "quality": Decimal("0.9125"),
+    "plants": {"PlantB", "PlantA"},
+    "pair": (1, 2),
+    "missing": float("nan"),
+    "peak": float("inf"),
+    "nested": [{"value": float("-inf")}, {"value": 1.5}],
+}
+
+
+@pytest.fixture(params=["orjson", "stdlib"])
+def dumps(request, monkeypatch):
+    if request.param == "orjson":
+        pytest.importorskip("orjson")
+        yield serialization.dumps
+        return
+    with monkeypatch.context() as patch:
+        patch.setitem(sys.modules, "orjson", None)
+        yield importlib.reload(serialization).dumps
+    importlib.reload(serialization)
+
+
+def test_defaults_cover_router_types(dumps):
+    data = json.loads(dumps(PAYLOAD))
+    assert data["timestamp"] == "2025-01-01T12:00:00+00:00"
+    assert data["day"] == "2025-01-01"
+    assert data["quality"] == 0.9125
+    assert sorted(data["plants"]) == ["PlantA", "PlantB"]
+    assert data["pair"] == [1, 2]
+
+
+def test_non_finite_floats_render_as_null(dumps):
+    body = dumps(PAYLOAD)
+    assert b"NaN" not in body and b"Infinity" not in body
+    data = json.loads(body)
+    assert data["missing"] is None
+    assert data["peak"] is None
+    assert data["nested"] == [{"value": None}, {"value": 1.5}]
+
+
+def test_non_finite_values_from_default_render_as_null(dumps):
+    assert json.loads(dumps({"value": Decimal("NaN")})) == {"value": None}
+
+
+def test_unknown_types_still_fail(dumps):
+    with pytest.raises(TypeError):
+        dumps({"value": object()})
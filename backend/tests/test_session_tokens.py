@@ -0,0 +1,100 @@
+import pytest
+
+from app.models.user_model import UserUpdate
+from app.services import session_tokens, user_management_service
+
+EXISTING = {"email": "operator@example.com", "full_name": "Op", "role": "operator", "is_active": True}
+
+
+class FakeSnapshot:
+    def __init__(self, data):
+        self._data = data
+        self.exists = data is not None
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class FakeUserRef:
+    def __init__(self, data):
+        self.data = dict(data)
+
+    def get(self):
+        return FakeSnapshot(self.data)
+
+    def update(self, changes):
+        self.data.update(changes)
+
+
+class FakeClient:
+    def __init__(self, ref):
+        self.ref = ref
+
+    def collection(self, name):
+        return self
+
+    def document(self, doc_id):
+        return self.ref
+
+
+@pytest.fixture
+def revoked(monkeypatch):
+    revoked = []
+    monkeypatch.setattr(user_management_service.session_tokens, "revoke_user", revoked.append)
+    monkeypatch.setattr(user_management_service.recipient_directory, "invalidate", lambda: None)
+    monkeypatch.setattr(user_management_service, "hash_password", lambda password: "hashed")
+    return revoked
+
+
+def _update(monkeypatch, existing: dict, **changes):
+    monkeypatch.setattr(user_management_service, "fs_client", FakeClient(FakeUserRef(existing)))
+    return user_management_service.update_user("u1", UserUpdate(**changes))
+
+
+def test_resending_current_role_and_status_keeps_sessions(monkeypatch, revoked):
+    _update(monkeypatch, EXISTING, full_name="Operator", role="operator", is_active=True)
+    assert revoked == []
+
+
+def test_role_change_revokes(monkeypatch, revoked):
+    _update(monkeypatch, EXISTING, role="admin", is_active=True)
+    assert revoked == ["u1"]
+
+
+def test_new_password_revokes(monkeypatch, revoked):
+    _update(monkeypatch, EXISTING, role="operator", is_active=True, new_password="secret123")
+    assert revoked == ["u1"]
+
+
+def test_blank_password_does_not_revoke(monkeypatch, revoked):
+    _update(monkeypatch, EXISTING, role="operator", is_active=True, new_password="  ")
+    assert revoked == []
+
+
+def test_deactivation_revokes(monkeypatch, revoked):
+    _update(monkeypatch, EXISTING, role="operator", is_active=False)
+    assert revoked == ["u1"]
+
+
+def test_saving_an_inactive_user_does_not_revoke_again(monkeypatch, revoked):
+    _update(monkeypatch, {**EXISTING, "is_active": False}, role="operator", is_active=False)
+    assert revoked == []
+
+
+def test_reactivation_does_not_revoke(monkeypatch, revoked):
+    _update(monkeypatch, {**EXISTING, "is_active": False}, role="operator", is_active=True)
+    assert revoked == []
+
+
+def test_is_revoked_never_reads_firestore(monkeypatch):
+    def unavailable(*args, **kwargs):
+        raise AssertionError("is_revoked must not query Firestore")
+
+    monkeypatch.setattr(session_tokens, "refresh", unavailable)
+    monkeypatch.setattr(session_tokens, "_active_revocations_query", unavailable)
+    monkeypatch.setattr(session_tokens, "_revoked_ids", {"jti-1": 0.0})
+    monkeypatch.setattr(session_tokens, "_users_not_before", {"u1": 100.0})
+
+    assert session_tokens.is_revoked({"jti": "jti-1", "sub": "u2", "iat": 50})
+    assert session_tokens.is_revoked({"jti": "jti-2", "sub": "u1", "iat": 50})
+    assert not session_tokens.is_revoked({"jti": "jti-2", "sub": "u1", "iat": 150})
@@ -0,0 +1,78 @@
+import base64
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from app.services import user_management_service
+
+
+class FakeCount:
+    def __init__(self, value):
+        self.value = value
+
+    def get(self):
+        return [[self]]
+
+
+class FakeQuery:
+    def __init__(self, counts, with_field=None):
+        self.counts = counts
+        self.with_field = with_field
+
+    def count(self):
+        self.counts.append(self.with_field)
+        return FakeCount(3)
+
+    def order_by(self, field, direction=None):
+        return FakeQuery(self.counts, with_field=field)
+
+    def start_after(self, values):
+        return self
+
+    def select(self, fields):
+        return self
+
+    def limit(self, limit):
+        return self
+
+    def document(self, doc_id):
+        return doc_id
+
+    def stream(self):
+        return iter([])
+
+
+class FakeClient:
+    def __init__(self, query):
+        self.query = query
+
+    def collection(self, name):
+        return self.query
+
+
+@pytest.fixture
+def users(monkeypatch):
+    counts = []
+    monkeypatch.setattr(user_management_service, "fs_client", FakeClient(FakeQuery(counts)))
+    monkeypatch.setattr(user_management_service, "_complete_fields", set())
+    monkeypatch.setattr(user_management_service, "_incomplete_checked", {})
+    return counts
+
+
+def _cursor(value, doc_id="u1") -> str:
+    return base64.urlsafe_b64encode(json.dumps([value, doc_id]).encode()).decode()
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", _cursor("yesterday"), _cursor(12)])
+def test_malformed_cursor_is_rejected(users, cursor):
+    with pytest.raises(HTTPException) as exc:
+        user_management_service.get_all_users(limit=10, cursor=cursor)
+    assert exc.value.status_code == 400
+
+
+def test_field_completeness_is_checked_once(users):
+    user_management_service.get_all_users(limit=10, cursor=_cursor("2025-01-01T00:00:00"))
+    user_management_service.get_all_users(limit=10, cursor=_cursor("2025-01-01T00:00:00"))
+    # total + with-field counts for the first call only
+    assert users == [None, "created_at"]
@@ -355,6 +355,26 @@ export const useRecentAlerts = (options = {}) => {
   });
 };
 
+// Hook to fetch unacknowledged alert counts and the latest alert id (single document read)
+export const useAlertSummary = (options = {}) => {
+  const { refetchInterval = 30000 } = options;
+
+  return useQuery({
+    queryKey: ['alertSummary'],
+    queryFn: async () => {
+      try {
+        const { data } = await api?.get('/alerts/summary');
+        return data?.summary || null;
+      } catch (error) {
+        return null;
+      }
+    },
+    refetchInterval: refetchInterval,
+    staleTime: 25000,
+    retry: 2,
+  });
+};
+
 // Hook to acknowledge an alert
 export const useAcknowledgeAlert = () => {
   const queryClient = useQueryClient();
@@ -369,6 +389,29 @@ export const useAcknowledgeAlert = () => {
     },
     onSuccess: () => {
       queryClient.invalidateQueries(['recentAlerts']);
+      queryClient.invalidateQueries(['alertSummary']);
+    },
+  });
+};
+
+// Hook to acknowledge many alerts at once, by ids or by filter (plant_id, severity, before)
+export const useBulkAcknowledgeAlerts = () => {
+  const queryClient = useQueryClient();
+  
+  return useMutation({
+    mutationFn: async ({ acknowledged_by, alert_ids = null, plant_id = null, severity = null, before = null }) => {
+      const { data } = await api?.post('/alerts/acknowledge/bulk', {
+        acknowledged_by,
+        alert_ids,
+        plant_id,
+        severity,
+        before
+      });
+      return data;
+    },
+    onSuccess: () => {
+      queryClient.invalidateQueries(['recentAlerts']);
+      queryClient.invalidateQueries(['alertSummary']);
     },
   });
 };
@@ -1,5 +1,5 @@
 import React, { useEffect, useRef, useState } from 'react';
-import { useRecentAlerts } from '../api/hooks';
+import { useAlertSummary } from '../api/hooks';
 import { playAlertSound, requestNotificationPermission, showBrowserNotification } from '../utils/alertSound';
 import Icon from './AppIcon';
 
@@ -16,10 +16,11 @@ const AlertNotificationManager = () => {
   const [isExpanded, setIsExpanded] = useState(false);
   const hasInitialized = useRef(false);
 
-  const { data: alerts = [] } = useRecentAlerts({
-    limit: 10,
+  const { data: summary } = useAlertSummary({
     refetchInterval: 600000 // 10 minutes (600,000 ms)
   });
+  const latestAlertId = summary?.latest_alert_id || null;
+  const unacknowledgedCount = summary?.unacknowledged_total || 0;
 
   useEffect(() => {
     const checkPermission = async () => {
@@ -30,34 +31,32 @@ const AlertNotificationManager = () => {
   }, []);
 
   useEffect(() => {
-    if (!alerts || alerts.length === 0) return;
+    if (!latestAlertId) return;
 
     if (!hasInitialized.current) {
       hasInitialized.current = true;
-      if (alerts.length > 0) {
-        setLastAlertId(alerts[0].id);
-      }
+      setLastAlertId(latestAlertId);
       return;
     }
 
-    const latestAlert = alerts[0];
-    if (latestAlert && latestAlert.id !== lastAlertId) {
+    if (latestAlertId !== lastAlertId) {
+      const severity = summary?.latest_alert_severity || 'warning';
       if (soundEnabled) {
-        playAlertSound(latestAlert.severity);
+        playAlertSound(severity);
       }
 
       if (notificationPermission) {
-        const anomalyCount = latestAlert.anomalies?.length || 0;
+        const anomalyCount = summary?.latest_alert_anomaly_count || 0;
         showBrowserNotification(
-          `${latestAlert.severity.toUpperCase()}: Anomaly Detected`,
+          `${severity.toUpperCase()}: Anomaly Detected`,
           `${anomalyCount} anomal${anomalyCount === 1 ? 'y' : 'ies'} detected in production system. Check the Alerts page for details.`,
-          latestAlert.severity
+          severity
         );
       }
 
-      setLastAlertId(latestAlert.id);
+      setLastAlertId(latestAlertId);
     }
-  }, [alerts, lastAlertId, soundEnabled, notificationPermission]);
+  }, [summary, latestAlertId, lastAlertId, soundEnabled, notificationPermission]);
 
   const toggleSound = () => {
     setSoundEnabled(!soundEnabled);
@@ -76,7 +75,7 @@ const AlertNotificationManager = () => {
       <div className="flex items-center justify-between gap-3 mb-2">
         <div className="flex items-center gap-2">
           <div className={`w-3 h-3 rounded-full ${
-            alerts.length > 0 ? 'bg-green-500 animate-pulse' : 'bg-gray-400'
+            summary ? 'bg-green-500 animate-pulse' : 'bg-gray-400'
           }`}></div>
           <span className="text-text-primary font-medium">Alert Monitor</span>
         </div>
@@ -125,13 +124,13 @@ const AlertNotificationManager = () => {
           </button>
         </div>
 
-        {/* Recent alerts count */}
+        {/* Unacknowledged alerts count */}
         <div className="flex items-center justify-between">
-          <span className="text-text-secondary">Recent alerts</span>
+          <span className="text-text-secondary">Open alerts</span>
           <span className={`font-medium ${
-            alerts.length > 0 ? 'text-orange-600 dark:text-orange-400' : 'text-text-secondary'
+            unacknowledgedCount > 0 ? 'text-orange-600 dark:text-orange-400' : 'text-text-secondary'
           }`}>
-            {alerts.length}
+            {unacknowledgedCount}
           </span>
         </div>
       </div>
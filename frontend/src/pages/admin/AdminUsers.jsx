@@ -1,7 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { useAuth } from '../../contexts/AuthContext';
 import { useNavigate } from 'react-router-dom';
-import { Plus, Edit2, Trash2, AlertCircle, Loader } from 'lucide-react';
+import { Plus, Edit2, Trash2, AlertCircle, Loader, Search } from 'lucide-react';
 import CreateUserModal from '../../components/admin/CreateUserModal';
 import EditUserModal from '../../components/admin/EditUserModal';
 import axios from 'axios';
@@ -16,6 +16,11 @@ const AdminUsers = () => {
   const [showEditModal, setShowEditModal] = useState(false);
   const [selectedUser, setSelectedUser] = useState(null);
   const [successMessage, setSuccessMessage] = useState('');
+  const [search, setSearch] = useState('');
+  const [searchBy, setSearchBy] = useState('email');
+  const [nextCursor, setNextCursor] = useState(null);
+  const [totalUsers, setTotalUsers] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     if (user && user.role !== 'admin') {
@@ -24,27 +29,40 @@ const AdminUsers = () => {
   }, [user, navigate]);
 
   useEffect(() => {
-    fetchUsers();
-  }, [authToken]);
+    // Debounce search so typing doesn't fire a request per keystroke
+    const timer = setTimeout(() => fetchUsers(), search ? 300 : 0);
+    return () => clearTimeout(timer);
+  }, [authToken, search, searchBy]);
 
-  const fetchUsers = async () => {
+  const fetchUsers = async (cursor = null) => {
     try {
-      setLoading(true);
+      cursor ? setLoadingMore(true) : setLoading(true);
       setError('');
+      const params = { limit: 50 };
+      if (cursor) params.cursor = cursor;
+      if (search.trim()) {
+        params.search = search.trim();
+        params.search_by = searchBy;
+      }
       const response = await axios.get(
         `${import.meta.env.VITE_API_BASE_URL}/admin/users`,
         {
+          params,
           headers: {
             Authorization: `Bearer ${authToken}`,
           },
         }
       );
-      setUsers(response.data.users || []);
+      const page = response.data.users || [];
+      setUsers((prev) => (cursor ? [...prev, ...page] : page));
+      setNextCursor(response.data.next_cursor || null);
+      if (!cursor) setTotalUsers(response.data.total ?? null);
     } catch (err) {
       setError(err.response?.data?.detail || 'Failed to fetch users');
       console.error('Error fetching users:', err);
     } finally {
       setLoading(false);
+      setLoadingMore(false);
     }
   };
 
@@ -174,6 +192,31 @@ const AdminUsers = () => {
           </div>
         )}
 
+        {/* Search */}
+        <div className="mb-4 flex flex-col sm:flex-row gap-3">
+          <div className="relative flex-1">
+            <Search className="w-4 h-4 text-text-secondary absolute left-3 top-1/2 -translate-y-1/2" />
+            <input
+              type="text"
+              value={search}
+              onChange={(e) => setSearch(e.target.value)}
+              placeholder={searchBy === 'email' ? 'Search by email prefix' : 'Search by name prefix'}
+              className="w-full pl-9 pr-3 py-2 rounded-lg border border-border-light bg-surface text-text-primary"
+            />
+          </div>
+          <select
+            value={searchBy}
+            onChange={(e) => setSearchBy(e.target.value)}
+            className="px-3 py-2 rounded-lg border border-border-light bg-surface text-text-primary"
+          >
+            <option value="email">Email</option>
+            <option value="name">Name</option>
+          </select>
+          {totalUsers !== null && !search && (
+            <span className="self-center text-sm text-text-secondary">{totalUsers} users</span>
+          )}
+        </div>
+
         {/* Users Table */}
         <div className="bg-surface rounded-2xl shadow-lg border border-border-light overflow-hidden">
           {loading ? (
@@ -253,6 +296,18 @@ const AdminUsers = () => {
                   ))}
                 </tbody>
               </table>
+              {nextCursor && (
+                <div className="flex justify-center py-4 border-t border-border-light">
+                  <button
+                    onClick={() => fetchUsers(nextCursor)}
+                    disabled={loadingMore}
+                    className="flex items-center gap-2 text-sm font-semibold text-primary hover:underline disabled:opacity-50"
+                  >
+                    {loadingMore && <Loader className="w-4 h-4 animate-spin" />}
+                    Load more
+                  </button>
+                </div>
+              )}
             </div>
           )}
         </div>